@@ -21,27 +21,52 @@ then
     echo $LF 1>&2
     if python structure_test.py
     then
-        cd ya_news
-        export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanews.settings"}"
-        if pytest --tb=line 1>&2;
+        # Fast tests of both projects run at the same time, each in its own
+        # process; with pytest-xdist installed every suite is also spread over
+        # all cores, pytest-django gives each worker its own test database.
+        # Performance tests load a snapshot of about half a gigabyte into the
+        # test database, so they run afterwards in a single process, one
+        # project after the other.
+        parallel=""
+        if python -c "import xdist" 2>/dev/null; then parallel="-n auto"; fi
+        news_settings="${DJANGO_SETTINGS_MODULE:-yanews.settings}"
+        note_perf="notes/tests/test_performance.py"
+        news_log=$(mktemp)
+        note_log=$(mktemp)
+        (cd ya_news && DJANGO_SETTINGS_MODULE="$news_settings" \
+            pytest --tb=line $parallel -m "not perf") > "$news_log" 2>&1 &
+        news_pid=$!
+        (cd ya_note && DJANGO_SETTINGS_MODULE="yanote.settings" \
+            pytest --tb=line $parallel --ignore="$note_perf") > "$note_log" 2>&1 &
+        note_pid=$!
+        wait $news_pid
+        news_status=$?
+        wait $note_pid
+        note_status=$?
+        if [[ $news_status -eq 0 ]]; then
+            (cd ya_news && DJANGO_SETTINGS_MODULE="$news_settings" \
+                pytest --tb=line -m perf) >> "$news_log" 2>&1
+            news_status=$?
+        fi
+        if [[ $note_status -eq 0 ]]; then
+            (cd ya_note && DJANGO_SETTINGS_MODULE="yanote.settings" \
+                pytest --tb=line "$note_perf") >> "$note_log" 2>&1
+            note_status=$?
+        fi
+        cat "$news_log" "$note_log" 1>&2
+        rm -f "$news_log" "$note_log"
+        if [[ $news_status -ne 0 ]];
         then
-            cd ../ya_note
-            unset DJANGO_SETTINGS_MODULE
-            export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanote.settings"}"
-            if pytest --tb=line 1>&2;
-            then
-                exit 0
-            else
-                status=$?
-                print_message " При запуске упали ваши тесты для проекта YaNote. Проверьте тесты этого проекта " "=" 1
-                echo \`\`\` 1>&2
-                exit $status
-            fi
-        else
-            status=$?
             print_message " При запуске упали ваши тесты для проекта YaNews. Проверьте тесты этого проекта " "=" 1
             echo \`\`\` 1>&2
-            exit $status
+            exit $news_status
+        elif [[ $note_status -ne 0 ]];
+        then
+            print_message " При запуске упали ваши тесты для проекта YaNote. Проверьте тесты этого проекта " "=" 1
+            echo \`\`\` 1>&2
+            exit $note_status
+        else
+            exit 0
         fi
     else
         status=$?
@@ -0,0 +1,113 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+from django.http import Http404
+
+from .cache import get_version
+from .models import News, NewsMonthCount
+
+ARCHIVE_VERSION = 'news:archive:version'
+# Наибольшее целое в SQLite; больших первичных ключей не бывает.
+MAX_PK = 2 ** 63 - 1
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def change_month_count(day, delta):
+    """Меняет счётчик месяца одним UPDATE, создавая строку при нужде."""
+    month = month_start(day)
+    updated = NewsMonthCount.objects.filter(
+        month=month, count__gte=-delta
+    ).update(count=F('count') + delta)
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            NewsMonthCount.objects.create(month=month, count=delta)
+    except IntegrityError:
+        # Строку этого месяца успели создать параллельно.
+        change_month_count(day, delta)
+
+
+def recount_months():
+    """Пересчитывает таблицу месяцев по новостям целиком."""
+    with transaction.atomic():
+        NewsMonthCount.objects.all().delete()
+        NewsMonthCount.objects.bulk_create(
+            NewsMonthCount(month=row['month'], count=row['count'])
+            for row in News.objects.order_by().values(
+                month=TruncMonth('date')
+            ).annotate(count=Count('pk'))
+        )
+
+
+def get_months():
+    """
+    Месяцы, в которых есть новости, от новых к старым.
+
+    Список читается из NewsMonthCount и кэшируется до следующего
+    изменения новостей.
+    """
+    key = f'news:archive:months:{get_version(ARCHIVE_VERSION)}'
+    months = cache.get(key)
+    if months is None:
+        months = list(NewsMonthCount.objects.filter(count__gt=0))
+        cache.set(key, months, settings.ARCHIVE_CACHE_TIMEOUT)
+    return months
+
+
+def encode_cursor(news):
+    """Курсор указывает на последнюю показанную новость."""
+    return f'{news.date:%Y%m%d}-{news.pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        day, pk = cursor.split('-')
+        day, pk = date(int(day[:4]), int(day[4:6]), int(day[6:])), int(pk)
+    except (ValueError, OverflowError):
+        raise Http404('Некорректный курсор.')
+    if pk > MAX_PK:
+        # Такое число SQLite не примет как параметр запроса.
+        raise Http404('Некорректный курсор.')
+    return day, pk
+
+
+def get_month_queryset(month, cursor=None):
+    """
+    Новости месяца после курсора в порядке индекса news_date_id_idx.
+
+    Диапазон по date и сортировка (-date, id) читаются из индекса,
+    поэтому стоимость страницы не зависит от размера таблицы.
+    """
+    news = News.objects.filter(
+        date__gte=month, date__lt=next_month(month)
+    ).only('id', 'title', 'date', 'comments_count').order_by('-date', 'id')
+    if cursor:
+        day, pk = decode_cursor(cursor)
+        news = news.filter(
+            Q(date__lt=day) | Q(date=day, pk__gt=pk), date__lte=day
+        )
+    return news
+
+
+def get_month_page(month, cursor=None, page_size=None):
+    page_size = page_size or settings.ARCHIVE_PAGE_SIZE
+    page = list(get_month_queryset(month, cursor)[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1])
+    return page, next_cursor
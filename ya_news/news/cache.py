@@ -0,0 +1,26 @@
+import time
+
+from django.core.cache import caches
+
+HOME_PAGE_VERSION = 'news:home:version'
+# Кэш версий общий для всех процессов сервера (см. CACHES в настройках),
+# а данные под этими версиями каждый процесс хранит у себя.
+VERSIONS_CACHE = 'versions'
+
+
+def get_version(key):
+    """Версия закэшированных данных — время их последнего изменения."""
+    return caches[VERSIONS_CACHE].get_or_set(key, time.time_ns, None)
+
+
+def bump_version(key):
+    """Делает устаревшими все записи кэша, построенные на прежней версии."""
+    caches[VERSIONS_CACHE].set(key, time.time_ns(), None)
+
+
+def thread_version_key(news_id):
+    return f'news:thread:{news_id}:version'
+
+
+def home_page_key():
+    return f'news:home:{get_version(HOME_PAGE_VERSION)}'
@@ -0,0 +1,69 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from .cache import get_version, thread_version_key
+from .models import News
+from .pagination import get_comments_page
+
+# Место для ссылок «Редактировать | Удалить», которые видит только автор.
+ACTIONS_MARKER = re.compile(r'<!--comment-actions (\d+) (\d+)-->')
+ACTIONS_TEMPLATE = (
+    '<a href="{edit}">Редактировать</a> |\n'
+    '<a href="{delete}">Удалить</a>'
+)
+
+
+def render_comments(news_id, cursor=None, news_checked=False):
+    """
+    Возвращает HTML страницы комментариев без ссылок для автора.
+
+    Результат кэшируется по версии ветки комментариев,
+    поэтому шаблон рендерится только после её изменения.
+    Для несуществующей новости — 404, и в кэш ничего не попадает.
+    Проверка нужна, только если комментариев на странице нет и новость
+    не загружена вызывающим кодом (news_checked).
+    """
+    version = get_version(thread_version_key(news_id))
+    key = f'news:thread:{news_id}:{version}:{cursor or ""}'
+    html = cache.get(key)
+    if html is None:
+        comments, next_cursor = get_comments_page(news_id, cursor)
+        if not (comments or news_checked or News.objects.filter(
+            pk=news_id
+        ).exists()):
+            raise Http404('Новость не найдена.')
+        html = render_to_string('includes/comments.html', {
+            'comments': comments,
+            'cursor': cursor,
+            'next_cursor': next_cursor,
+            'news_pk': news_id,
+        })
+        cache.set(key, html, settings.COMMENTS_CACHE_TIMEOUT)
+    return html
+
+
+def add_comment_actions(html, user):
+    """Подставляет ссылки редактирования и удаления в комментарии user."""
+
+    def replace(match):
+        pk, author_id = match.groups()
+        if int(author_id) != user.pk:
+            return ''
+        return ACTIONS_TEMPLATE.format(
+            edit=reverse('news:edit', args=[pk]),
+            delete=reverse('news:delete', args=[pk]),
+        )
+
+    return mark_safe(ACTIONS_MARKER.sub(replace, html))
+
+
+def get_comments_html(news_id, user, cursor=None, news_checked=False):
+    return add_comment_actions(
+        render_comments(news_id, cursor, news_checked), user
+    )
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import cycle, islice
+from statistics import quantiles
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from news.models import Comment, News
+
+User = get_user_model()
+BENCH_USERNAME = 'bench_asgi'
+SERVERS = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность главной и страниц новостей '
+        'под WSGI и ASGI при большом числе медленных клиентов. WSGI-сервер '
+        'моделируется пулом из --threads потоков, которые заняты, пока '
+        'клиент читает ответ; ASGI — одним циклом событий. Каждый сервер '
+        'запускается в отдельном процессе, ASGI — с NEWS_ASYNC_VIEWS=1.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=SERVERS)
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--client-delay', type=float, default=0.05,
+            help='Сколько секунд клиент читает ответ.'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Потоки WSGI-сервера.'
+        )
+        parser.add_argument('--news', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options['server'] is None:
+            for server in SERVERS:
+                self.spawn(server, options)
+            return
+        author = User.objects.create(username=BENCH_USERNAME)
+        news = [
+            News.objects.create(title=f'Новость {index}', text='Текст')
+            for index in range(options['news'])
+        ]
+        for item in news:
+            for index in range(10):
+                Comment.objects.create(
+                    news=item, author=author, text=f'Комментарий {index}'
+                )
+        paths = ['/'] + [f'/news/{item.pk}/' for item in news]
+        paths = list(islice(cycle(paths), options['requests']))
+        # Соединения к SQLite из других потоков не должны видеть
+        # незакрытую транзакцию этого.
+        connections.close_all()
+        try:
+            if options['server'] == 'wsgi':
+                elapsed, latencies = self.run_wsgi(paths, options)
+            else:
+                elapsed, latencies = asyncio.run(
+                    self.run_asgi(paths, options)
+                )
+        finally:
+            for item in news:
+                item.delete()
+            author.delete()
+        p50, _, _, p95 = quantiles(latencies, n=20)[9::3]
+        self.stdout.write(
+            f'{options["server"]}: клиентов {options["clients"]}, '
+            f'запросов {len(latencies)}, '
+            f'{len(latencies) / elapsed:.0f} запросов/с, '
+            f'p50 {p50 * 1000:.0f} мс, p95 {p95 * 1000:.0f} мс'
+        )
+
+    def spawn(self, server, options):
+        env = dict(os.environ, NEWS_ASYNC_VIEWS=str(int(server == 'asgi')))
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'),
+            'bench_asgi', f'--server={server}',
+            f'--clients={options["clients"]}',
+            f'--requests={options["requests"]}',
+            f'--client-delay={options["client_delay"]}',
+            f'--threads={options["threads"]}',
+            f'--news={options["news"]}',
+        ]
+        if options['settings']:
+            command.append(f'--settings={options["settings"]}')
+        subprocess.run(command, env=env, check=True)
+
+    @staticmethod
+    def run_wsgi(paths, options):
+        handler = WSGIHandler()
+        host = settings.ALLOWED_HOSTS[0]
+        delay = options['client_delay']
+        clients = threading.BoundedSemaphore(options['clients'])
+
+        def request(path, sent):
+            """Поток сервера занят до конца отправки ответа."""
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'QUERY_STRING': '',
+                'SERVER_NAME': host,
+                'SERVER_PORT': '80',
+                'HTTP_HOST': host,
+                'wsgi.input': BytesIO(),
+                'wsgi.url_scheme': 'http',
+                'wsgi.errors': sys.stderr,
+            }
+            response = handler(environ, lambda status, headers: None)
+            try:
+                for _ in response:
+                    time.sleep(delay)
+            finally:
+                response.close()
+                clients.release()
+            return time.perf_counter() - sent
+
+        # Клиентов больше, чем потоков: их запросы ждут свободный поток,
+        # и это ожидание входит во время ответа.
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as pool:
+            futures = []
+            for path in paths:
+                clients.acquire()
+                futures.append(
+                    pool.submit(request, path, time.perf_counter())
+                )
+            latencies = [future.result() for future in futures]
+        return time.perf_counter() - start, latencies
+
+    @staticmethod
+    async def run_asgi(paths, options):
+        handler = ASGIHandler()
+        host = settings.ALLOWED_HOSTS[0]
+        delay = options['client_delay']
+        limit = asyncio.Semaphore(options['clients'])
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                await asyncio.sleep(delay)
+
+        async def request(path):
+            async with limit:
+                start = time.perf_counter()
+                await handler({
+                    'type': 'http',
+                    'asgi': {'version': '3.0'},
+                    'http_version': '1.1',
+                    'method': 'GET',
+                    'scheme': 'http',
+                    'path': path,
+                    'raw_path': path.encode(),
+                    'query_string': b'',
+                    'headers': [(b'host', host.encode())],
+                    'client': ('127.0.0.1', 0),
+                    'server': (host, 80),
+                }, receive, send)
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*map(request, paths))
+        return time.perf_counter() - start, latencies
@@ -0,0 +1,59 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from news.moderation import BadWordMatcher
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+
+def naive_search(words, text):
+    """Прежняя проверка из CommentForm.clean_text."""
+    lowered_text = text.lower()
+    for word in words:
+        if word in lowered_text:
+            return word
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость проверки одного комментария на запрещённые '
+        'слова для перебора списка и скомпилированного матчера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000]
+        )
+        parser.add_argument('--text-length', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def random_word():
+            return ''.join(rng.choices(ALPHABET, k=rng.randint(5, 10)))
+
+        text = ' '.join(
+            random_word() for _ in range(options['text_length'] // 8)
+        )
+        repeat = options['repeat']
+        self.stdout.write(f'{"слов":>8} {"перебор, мкс":>14} '
+                          f'{"матчер, мкс":>14} {"сборка, мс":>12}')
+        for size in options['sizes']:
+            words = [random_word() for _ in range(size)]
+            build = timeit.timeit(lambda: BadWordMatcher(words), number=1)
+            matcher = BadWordMatcher(words)
+            naive = timeit.timeit(
+                lambda: naive_search(words, text), number=repeat
+            )
+            compiled = timeit.timeit(
+                lambda: matcher.search(text), number=repeat
+            )
+            self.stdout.write(
+                f'{size:>8} {naive / repeat * 1e6:>14.1f} '
+                f'{compiled / repeat * 1e6:>14.1f} {build * 1e3:>12.1f}'
+            )
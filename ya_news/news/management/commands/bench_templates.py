@@ -0,0 +1,115 @@
+import time
+import timeit
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils.safestring import mark_safe
+
+from news.forms import CommentForm
+from news.models import News
+from yanews.templating import warm_up
+
+User = get_user_model()
+FILE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+TEXT = 'Слово ' * 60
+COMMENT = '<div><b>Автор</b>, 1 января 2024 г. 12:00<p>Текст</p></div>\n'
+
+
+def engine(backend, name, **params):
+    """Отдельный от проекта экземпляр движка со своим кэшем."""
+    return backend({
+        'NAME': name, 'DIRS': params['DIRS'], 'APP_DIRS': False,
+        'OPTIONS': params['OPTIONS'],
+    })
+
+
+def django_engine(name, loaders):
+    params, = (
+        params for params in settings.TEMPLATES
+        if params['BACKEND'].endswith('DjangoTemplates')
+    )
+    return engine(
+        DjangoTemplates, name, DIRS=params['DIRS'],
+        OPTIONS={**params['OPTIONS'], 'loaders': loaders},
+    )
+
+
+def jinja2_engine():
+    from django.template.backends.jinja2 import Jinja2
+
+    return engine(Jinja2, 'jinja2', **settings.JINJA2_ENGINE)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время отрисовки главной и страницы новости для '
+        'шаблонов Django без кэша, с кэширующим загрузчиком и для Jinja2. '
+        'База не нужна: объекты в контексте не сохраняются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=50)
+
+    def pages(self, comments):
+        request = RequestFactory().get('/')
+        request.user = User(pk=1, username='bench')
+        news_list = [
+            News(pk=pk, title=f'Новость {pk}', text=TEXT,
+                 date=date(2024, 1, pk), comments_count=pk)
+            for pk in range(1, settings.NEWS_COUNT_ON_HOME_PAGE + 1)
+        ]
+        news = news_list[0]
+        return request, {
+            'news/home.html': {'object_list': news_list},
+            'news/detail.html': {
+                'object': news, 'news': news, 'form': CommentForm(),
+                'comment_list': mark_safe(COMMENT * comments),
+                'pending_comments': [],
+            },
+        }
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        request, pages = self.pages(options['comments'])
+        engines = {
+            'Django': django_engine('plain', FILE_LOADERS),
+            'Django, кэш': django_engine('cached', [
+                ('django.template.loaders.cached.Loader', FILE_LOADERS)
+            ]),
+        }
+        try:
+            engines['Jinja2'] = jinja2_engine()
+        except ImportError:
+            self.stderr.write('Jinja2 не установлен, его замер пропущен.')
+        self.stdout.write(f'{"движок":<14}' + ''.join(
+            f'{name:>20}' for name in pages
+        ) + '  (мкс на отрисовку)')
+        for label, engine in engines.items():
+            timings = []
+            for name, context in pages.items():
+                # Первая отрисовка заполняет кэши и в замер не входит.
+                engine.get_template(name).render(context, request)
+                total = timeit.timeit(
+                    lambda: engine.get_template(name).render(
+                        context, request
+                    ),
+                    number=repeat,
+                )
+                timings.append(total / repeat * 1e6)
+            self.stdout.write(f'{label:<14}' + ''.join(
+                f'{timing:>20.0f}' for timing in timings
+            ))
+        start = time.perf_counter()
+        count = warm_up()
+        self.stdout.write(
+            f'Прогрев шаблонов проекта: {count} файлов, '
+            f'{(time.perf_counter() - start) * 1000:.0f} мс'
+        )
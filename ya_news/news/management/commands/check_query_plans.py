@@ -0,0 +1,74 @@
+import re
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+from news.archive import get_month_queryset
+from news.models import News
+from news.pagination import get_comments_queryset
+from news.views import CommentUpdate, NewsList
+
+# Признаки полного просмотра таблицы и сортировки без индекса.
+BAD_PLAN_PATTERNS = {
+    'sqlite': (
+        re.compile(r'\bSCAN (TABLE )?\w+$', re.MULTILINE),
+        re.compile(r'TEMP B-TREE'),
+    ),
+    'postgresql': (
+        re.compile(r'Seq Scan'),
+        re.compile(r'\bSort\b'),
+    ),
+}
+
+
+def get_view_queries():
+    """Запросы, которые выполняют вьюхи приложения, по именам URL."""
+    request = RequestFactory().get('/')
+    request.user = get_user_model()(pk=1)
+    comment_view = CommentUpdate()
+    comment_view.setup(request, pk=1)
+    return {
+        'news:home': NewsList().get_queryset(),
+        'news:detail': News.objects.filter(pk=1),
+        'news:comments': get_comments_queryset(1)[:1],
+        'news:comments?cursor': get_comments_queryset(1, '0-1')[:1],
+        'news:archive_month': get_month_queryset(date(2020, 1, 1))[:1],
+        'news:archive_month?cursor': get_month_queryset(
+            date(2020, 1, 1), '20200115-1'
+        )[:1],
+        # get_object вызывает get(), а тот сбрасывает сортировку.
+        'news:edit': comment_view.get_queryset().filter(pk=1).order_by(),
+        'comments of author': comment_view.get_queryset(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запросов вьюх и завершается ошибкой, '
+        'если какой-то из них читает всю таблицу или сортирует без индекса.'
+    )
+
+    def handle(self, *args, **options):
+        patterns = BAD_PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(
+                f'Планы запросов для {connection.vendor} не поддерживаются.'
+            )
+        failed = []
+        for name, queryset in get_view_queries().items():
+            plan = queryset.explain()
+            if any(pattern.search(plan) for pattern in patterns):
+                failed.append(name)
+                self.stderr.write(f'{name}:\n{plan}')
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'{name}:\n{plan}')
+        if failed:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(failed)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Все запросы используют индексы.')
+        )
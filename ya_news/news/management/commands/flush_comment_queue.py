@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from news.write_behind import close_queue, get_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Сохраняет комментарии из журналов очереди, оставшихся '
+        'от завершившихся процессов.'
+    )
+
+    def handle(self, *args, **options):
+        saved = get_queue().flush()
+        close_queue()
+        self.stdout.write(
+            self.style.SUCCESS(f'Сохранено комментариев: {saved}')
+        )
@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client
+from django.urls import reverse
+
+from news.models import Comment, News
+from news.write_behind import close_queue
+
+User = get_user_model()
+LOAD_USERNAME = 'load_comments'
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет комментарии к одной новости из нескольких потоков '
+        'через NewsDetailView и сообщает пропускную способность. Запустите '
+        'с настройками по умолчанию и с --settings=yanews.'
+        'settings_production, чтобы сравнить профили.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--comments', type=int, default=50)
+        parser.add_argument(
+            '--write-behind', action='store_true',
+            help='Включить отложенную запись комментариев на время теста.'
+        )
+
+    def handle(self, *args, **options):
+        if options['write_behind']:
+            settings.COMMENTS_WRITE_BEHIND = True
+        # Своё имя на каждый запуск: остатки прерванного запуска
+        # не мешают следующему.
+        prefix = f'{LOAD_USERNAME}_{uuid4().hex[:8]}_'
+        news = None
+        try:
+            news = News.objects.create(title='Нагрузка', text='Текст')
+            users = [
+                User.objects.create(username=f'{prefix}{index}')
+                for index in range(options['threads'])
+            ]
+            statuses, elapsed = self.post_comments(
+                reverse('news:detail', args=(news.pk,)), users,
+                options['comments']
+            )
+            if options['write_behind']:
+                close_queue()
+            saved = Comment.objects.filter(news=news).count()
+        finally:
+            if options['write_behind']:
+                close_queue()
+            if news is not None:
+                news.delete()
+            User.objects.filter(username__startswith=prefix).delete()
+
+        failed = sum(status != HTTPStatus.FOUND for status in statuses)
+        journal_mode = connection.cursor().execute(
+            'PRAGMA journal_mode'
+        ).fetchone()[0] if connection.vendor == 'sqlite' else '-'
+        self.stdout.write(
+            f'journal_mode={journal_mode}, '
+            f'write_behind={settings.COMMENTS_WRITE_BEHIND}, '
+            f'CONN_MAX_AGE={connection.settings_dict["CONN_MAX_AGE"]}: '
+            f'комментариев {saved}, ошибок {failed}, '
+            f'{len(statuses) / elapsed:.0f} комментариев/с'
+        )
+
+    @staticmethod
+    def post_comments(url, users, count):
+        """Статусы ответов и время, за которое потоки отправили всё."""
+
+        def post(user):
+            """Каждый поток — отдельный клиент со своим соединением."""
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            client.force_login(user)
+            statuses = []
+            try:
+                for index in range(count):
+                    try:
+                        statuses.append(client.post(
+                            url, {'text': f'Комментарий {index}'}
+                        ).status_code)
+                    except OperationalError:
+                        statuses.append(None)
+            finally:
+                connection.close()
+            return statuses
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(users)) as pool:
+            statuses = [
+                status
+                for result in pool.map(post, users)
+                for status in result
+            ]
+        return statuses, time.perf_counter() - start
@@ -0,0 +1,131 @@
+import asyncio
+from http import HTTPStatus
+from itertools import accumulate
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from news.models import News
+from yanews.loadtest import HttpClient, run_load
+
+User = get_user_model()
+# Действие: вес. Читатели анонимны, авторы вошли на сайт и ещё пишут.
+READER_PROFILE = {
+    'home': 30, 'detail': 45, 'comments': 5, 'search': 10, 'archive': 10,
+}
+WRITER_PROFILE = {**READER_PROFILE, 'comment': 25}
+# Сколько новостей брать в выборку: популярность — по числу комментариев.
+SAMPLE_NEWS = 10_000
+SAMPLE_USERS = 10_000
+
+
+class Traffic:
+    """Действия профиля нагрузки; новости — по числу комментариев."""
+
+    def __init__(self, news):
+        self.news = news
+        self.weights = list(accumulate(count + 1 for *_, count in news))
+
+    def pick_news(self, rng):
+        return rng.choices(self.news, cum_weights=self.weights)[0]
+
+    def profile(self, writer):
+        weights = WRITER_PROFILE if writer else READER_PROFILE
+        return {
+            action: (weight, getattr(self, action))
+            for action, weight in weights.items()
+        }
+
+    @staticmethod
+    async def get(client, url):
+        status, _ = await client.request('GET', url)
+        return status == HTTPStatus.OK
+
+    async def home(self, client, rng):
+        return await self.get(client, reverse('news:home'))
+
+    async def detail(self, client, rng):
+        return await self.get(
+            client, reverse('news:detail', args=(self.pick_news(rng)[0],))
+        )
+
+    async def comments(self, client, rng):
+        return await self.get(
+            client, reverse('news:comments', args=(self.pick_news(rng)[0],))
+        )
+
+    async def search(self, client, rng):
+        word = rng.choice(self.pick_news(rng)[1].split())
+        return await self.get(
+            client, reverse('news:search') + '?' + urlencode({'q': word})
+        )
+
+    async def archive(self, client, rng):
+        day = self.pick_news(rng)[2]
+        return await self.get(client, reverse(
+            'news:archive_month', args=(day.year, day.month)
+        ))
+
+    async def comment(self, client, rng):
+        status, _ = await client.request(
+            'POST', reverse('news:detail', args=(self.pick_news(rng)[0],)),
+            client.with_csrf({'text': f'Нагрузка {rng.random()}'})
+        )
+        return status == HTTPStatus.FOUND
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер YaNews смешанным трафиком: '
+        'анонимные читатели и вошедшие авторы комментариев. Новости '
+        'выбираются пропорционально числу комментариев. Пользователей '
+        'и данные создаёт команда seed. Выводит p50/p95/p99 по действиям.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument(
+            '--writers', type=float, default=0.2,
+            help='Доля клиентов, которые входят на сайт и комментируют.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default='seed-password')
+
+    def handle(self, *args, **options):
+        news = list(News.objects.order_by('-comments_count').values_list(
+            'pk', 'title', 'date', 'comments_count'
+        )[:SAMPLE_NEWS])
+        usernames = list(User.objects.filter(
+            username__startswith=options['prefix']
+        ).order_by('pk').values_list('username', flat=True)[:SAMPLE_USERS])
+        if not news or not usernames:
+            raise CommandError('Сначала наполните базу командой seed.')
+        traffic = Traffic(news)
+        login_url = reverse('users:login')
+        writers = round(options['clients'] * options['writers'])
+
+        async def start_client(number, rng):
+            client = HttpClient(options['url'])
+            if number < writers and not await client.login(
+                login_url, rng.choice(usernames), options['password']
+            ):
+                raise CommandError(
+                    'Не удалось войти: проверьте --prefix и --password.'
+                )
+            return client, traffic.profile(writer=number < writers)
+
+        stats, elapsed = asyncio.run(run_load(
+            start_client, options['clients'], options['duration'],
+            options['seed']
+        ))
+        self.stdout.write(
+            f'{options["clients"]} клиентов, из них авторов {writers}, '
+            f'{elapsed:.0f} с'
+        )
+        for line in stats.report(elapsed):
+            self.stdout.write(line)
@@ -0,0 +1,38 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from yanews.querylog import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных и повторяющихся запросов '
+        '(QUERY_LOG_FILE): находки сгруппированы по виду, имени URL '
+        'и запросу, первыми — с наибольшим суммарным временем.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            help='Файл журнала, по умолчанию QUERY_LOG_FILE.'
+        )
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--kind', choices=('slow', 'duplicate'))
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.QUERY_LOG_FILE
+        if not path:
+            raise CommandError('Укажите файл журнала или QUERY_LOG_FILE.')
+        try:
+            with open(path, encoding='utf-8') as file:
+                entries = [json.loads(line) for line in file if line.strip()]
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать журнал: {error}')
+        if options['kind']:
+            entries = [
+                entry for entry in entries if entry['kind'] == options['kind']
+            ]
+        for line in summarize(entries, options['top']):
+            self.stdout.write(line)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news.search import get_search
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает поисковый индекс новостей и комментариев, '
+        'например после массовой загрузки в обход сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            get_search().rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
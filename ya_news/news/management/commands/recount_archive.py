@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from news.archive import ARCHIVE_VERSION, recount_months
+from news.cache import bump_version
+from news.models import NewsMonthCount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает число новостей по месяцам для архива. Нужен после '
+        'bulk_create и QuerySet.update новостей: они не шлют сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        recount_months()
+        bump_version(ARCHIVE_VERSION)
+        self.stdout.write(self.style.SUCCESS(
+            f'Месяцев в архиве: {NewsMonthCount.objects.count()}'
+        ))
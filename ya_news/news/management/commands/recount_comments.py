@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from news.cache import HOME_PAGE_VERSION, bump_version
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованный счётчик комментариев у новостей.'
+
+    def handle(self, *args, **options):
+        updated = News.objects.recount_comments()
+        bump_version(HOME_PAGE_VERSION)
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено новостей: {updated}')
+        )
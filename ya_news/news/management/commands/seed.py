@@ -0,0 +1,163 @@
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from news.models import Comment, News
+
+User = get_user_model()
+SYLLABLES = (
+    'ба', 'ве', 'го', 'ду', 'же', 'за', 'ки', 'ло', 'ма', 'ны',
+    'по', 'ре', 'са', 'ту', 'фе', 'хо', 'цу', 'че', 'ша', 'эр',
+)
+VOCABULARY_SIZE = 20000
+# Комментарий появляется в среднем через столько часов после новости.
+COMMENT_DELAY_HOURS = 12
+
+
+def zipf_cum_weights(size):
+    """Накопленные веса закона Ципфа: k-й по популярности — в k раз реже."""
+    return list(accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу пользователями, новостями и комментариями. '
+        'Данные зависят только от --seed. Комментарии распределены по '
+        'закону Ципфа: немногие новости собирают большую часть '
+        'обсуждения, немногие пользователи пишут большую часть '
+        'комментариев. Строки вставляются пачками по --batch-size, '
+        'после чего пересчитываются счётчики, архив и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--news', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument(
+            '--days', type=int, default=3650,
+            help='За сколько последних дней создаются новости.'
+        )
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Начало имён создаваемых пользователей.'
+        )
+        parser.add_argument(
+            '--password', default='seed-password',
+            help='Пароль всех создаваемых пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с именами на «{prefix}» уже есть, '
+                'укажите другой --prefix.'
+            )
+        rng = random.Random(options['seed'])
+        words = set()
+        while len(words) < VOCABULARY_SIZE:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        self.words = sorted(words)
+        self.word_weights = zipf_cum_weights(len(self.words))
+        self.batch_size = options['batch_size']
+        start = time.perf_counter()
+        user_ids = self.seed_users(
+            rng, options['users'], prefix, options['password']
+        )
+        news = self.seed_news(rng, options['news'], options['days'])
+        self.seed_comments(rng, options['comments'], news, user_ids)
+        for command in (
+            'recount_comments', 'recount_archive', 'rebuild_search_index'
+        ):
+            call_command(command, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, новостей: '
+            f'{len(news)}, комментариев: {options["comments"]} за '
+            f'{time.perf_counter() - start:.0f} с'
+        ))
+
+    def text(self, rng, length):
+        return ' '.join(rng.choices(
+            self.words, cum_weights=self.word_weights, k=length
+        ))
+
+    def batches(self, count):
+        for start in range(0, count, self.batch_size):
+            yield range(start, min(start + self.batch_size, count))
+
+    def seed_users(self, rng, count, prefix, password):
+        """Хэш пароля считается один раз: он медленный намеренно."""
+        password = make_password(password)
+        for batch in self.batches(count):
+            User.objects.bulk_create(
+                User(username=f'{prefix}{number}', password=password)
+                for number in batch
+            )
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+        # Самые активные пользователи — случайные, а не первые по id.
+        rng.shuffle(user_ids)
+        return user_ids
+
+    def seed_news(self, rng, count, days):
+        """Возвращает пары (id, дата) в порядке популярности."""
+        first_id = News.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        today = timezone.localdate()
+        for batch in self.batches(count):
+            News.objects.bulk_create(
+                News(
+                    title=self.text(rng, 4)[:50],
+                    text=self.text(rng, 80),
+                    date=today - timedelta(days=rng.randrange(days)),
+                )
+                for _ in batch
+            )
+        news = list(News.objects.filter(pk__gt=first_id).order_by(
+            'pk'
+        ).values_list('pk', 'date'))
+        rng.shuffle(news)
+        return news
+
+    def seed_comments(self, rng, count, news, user_ids):
+        """
+        Вставляет комментарии SQL-запросом: bulk_create заменил бы
+        created текущим временем из-за auto_now_add.
+        """
+        news_weights = zipf_cum_weights(len(news))
+        user_weights = zipf_cum_weights(len(user_ids))
+        now = timezone.now()
+        sql = (
+            f'INSERT INTO {Comment._meta.db_table} '
+            '(news_id, author_id, text, created) VALUES (%s, %s, %s, %s)'
+        )
+        for batch in self.batches(count):
+            threads = rng.choices(news, cum_weights=news_weights, k=len(batch))
+            authors = rng.choices(
+                user_ids, cum_weights=user_weights, k=len(batch)
+            )
+            rows = []
+            for (news_id, day), author_id in zip(threads, authors):
+                created = min(now, timezone.make_aware(
+                    datetime.combine(day, datetime.min.time())
+                ) + timedelta(
+                    hours=rng.expovariate(1 / COMMENT_DELAY_HOURS)
+                ))
+                rows.append((
+                    news_id, author_id, self.text(rng, rng.randint(3, 30)),
+                    connection.ops.adapt_datetimefield_value(created),
+                ))
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
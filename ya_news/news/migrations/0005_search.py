@@ -0,0 +1,48 @@
+from django.db import OperationalError, migrations
+
+FOLD_YO = "REPLACE(REPLACE({}, 'ё', 'е'), 'Ё', 'Е')"
+TABLES = (
+    (
+        'news_news_fts', 'title, text',
+        'INSERT INTO news_news_fts (rowid, title, text) '
+        f'SELECT id, {FOLD_YO.format("title")}, {FOLD_YO.format("text")} '
+        'FROM news_news',
+    ),
+    (
+        'news_comment_fts', 'news_id UNINDEXED, text',
+        'INSERT INTO news_comment_fts (rowid, news_id, text) '
+        f'SELECT id, news_id, {FOLD_YO.format("text")} FROM news_comment',
+    ),
+)
+
+
+def create_fts_tables(apps, schema_editor):
+    """Создаёт и заполняет таблицы FTS5, если они поддерживаются базой."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns, fill in TABLES:
+        try:
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {table} USING fts5({columns}, '
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        except OperationalError:
+            return
+        schema_editor.execute(fill)
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for table, _, _ in TABLES:
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_bannedword'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def count_months(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    NewsMonthCount = apps.get_model('news', 'NewsMonthCount')
+    NewsMonthCount.objects.bulk_create(
+        NewsMonthCount(month=row['month'], count=row['count'])
+        for row in News.objects.order_by().values(
+            month=TruncMonth('date')
+        ).annotate(count=Count('pk'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsMonthCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Месяц')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Новостей')),
+            ],
+            options={
+                'verbose_name': 'Новости за месяц',
+                'verbose_name_plural': 'Новости по месяцам',
+                'ordering': ('-month',),
+            },
+        ),
+        migrations.RunPython(count_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+from importlib import import_module
+
+from django.db import OperationalError, migrations
+
+FOLD_YO = "REPLACE(REPLACE({}, 'ё', 'е'), 'Ё', 'Е')"
+# Индекс FTS5 строится по текстам с заменой ё на е, а сниппеты и
+# подсветку SQLite берёт из таблицы-источника с исходными текстами.
+# Триггеры источника поддерживают индекс в актуальном состоянии.
+TABLES = (
+    (
+        'news_news_fts', 'title, text',
+        'id INTEGER PRIMARY KEY, title TEXT, text TEXT',
+        'news_news',
+    ),
+    (
+        'news_comment_fts', 'news_id UNINDEXED, text',
+        'id INTEGER PRIMARY KEY, news_id INTEGER, text TEXT',
+        'news_comment',
+    ),
+)
+TRIGGERS = (
+    ('insert', 'INSERT', ('new',)),
+    ('delete', 'DELETE', ('old',)),
+    ('update', 'UPDATE', ('old', 'new')),
+)
+
+
+def column_names(columns):
+    return [column.split()[0] for column in columns.split(', ')]
+
+
+def folded(row, names):
+    return ', '.join(
+        f'{row}.{name}' if name == 'news_id'
+        else FOLD_YO.format(f'{row}.{name}')
+        for name in names
+    )
+
+
+def index_statement(table, names, row):
+    """Вставка строки в индекс или, для old, удаление из него."""
+    if row == 'old':
+        return (
+            f"INSERT INTO {table} ({table}, rowid, {', '.join(names)}) "
+            f"VALUES ('delete', old.id, {folded(row, names)});"
+        )
+    return (
+        f"INSERT INTO {table} (rowid, {', '.join(names)}) "
+        f'VALUES (new.id, {folded(row, names)});'
+    )
+
+
+def drop_tables(schema_editor):
+    for table, *_ in TABLES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}_source')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def create_fts_tables(apps, schema_editor):
+    """Пересоздаёт таблицы FTS5 с внешним содержимым."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    drop_tables(schema_editor)
+    for table, columns, source_columns, model_table in TABLES:
+        try:
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {table} USING fts5({columns}, '
+                f"content='{table}_source', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        except OperationalError:
+            return
+        names = column_names(columns)
+        schema_editor.execute(
+            f'CREATE TABLE {table}_source ({source_columns})'
+        )
+        for name, event, rows in TRIGGERS:
+            schema_editor.execute(
+                f'CREATE TRIGGER {table}_{name} AFTER {event} '
+                f'ON {table}_source BEGIN ' + ' '.join(
+                    index_statement(table, names, row) for row in rows
+                ) + ' END'
+            )
+        schema_editor.execute(
+            f"INSERT INTO {table}_source (id, {', '.join(names)}) "
+            f"SELECT id, {', '.join(names)} FROM {model_table}"
+        )
+
+
+def restore_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        drop_tables(schema_editor)
+        import_module(
+            'news.migrations.0005_search'
+        ).create_fts_tables(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_newsmonthcount'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, restore_fts_tables),
+    ]
@@ -2,21 +2,53 @@ from datetime import datetime
 
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def recount_comments(self):
+        """Пересчитывает счётчик комментариев одним запросом UPDATE."""
+        comments = Comment.objects.filter(
+            news=OuterRef('pk')
+        ).order_by().values('news').annotate(
+            count=Count('pk')
+        ).values('count')
+        return self.update(
+            comments_count=Coalesce(Subquery(comments), 0)
+        )
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('-date', 'id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Запоминает дату из базы: по ней news.signals переносит новость
+        между месяцами архива без лишнего SELECT перед сохранением.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_date = instance.__dict__.get('date')
+        return instance
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
@@ -32,6 +64,41 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created'), name='comment_news_created_idx'
+            ),
+            models.Index(
+                fields=('author', 'created'),
+                name='comment_author_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+
+class NewsMonthCount(models.Model):
+    """Число новостей за месяц, обновляется сигналами (см. news.archive)."""
+    month = models.DateField('Месяц', unique=True)
+    count = models.PositiveIntegerField('Новостей', default=0)
+
+    class Meta:
+        ordering = ('-month',)
+        verbose_name_plural = 'Новости по месяцам'
+        verbose_name = 'Новости за месяц'
+
+    def __str__(self):
+        return f'{self.month:%Y-%m}: {self.count}'
+
+
+class BannedWord(models.Model):
+    word = models.CharField('Слово', max_length=100, unique=True)
+
+    class Meta:
+        ordering = ('word',)
+        verbose_name_plural = 'Запрещённые слова'
+        verbose_name = 'Запрещённое слово'
+
+    def __str__(self):
+        return self.word
@@ -0,0 +1,131 @@
+import re
+
+from django.conf import settings
+
+from .cache import get_version
+from .models import BannedWord
+
+BAD_WORDS = (
+    'редиска',
+    'негодяй',
+    # Дополните список на своё усмотрение.
+)
+
+BANNED_WORDS_VERSION = 'news:banned_words:version'
+
+# Латинские буквы, которые пишут вместо похожих кириллических.
+HOMOGLYPHS = tuple(zip('aceopxyk', 'асеорхук'))
+# До этого размера списка поиск подстрок на C быстрее регулярного
+# выражения (см. manage.py bench_bad_words).
+SUBSTRING_SEARCH_LIMIT = 200
+
+
+def build_trie_pattern(words):
+    """
+    Собирает регулярное выражение по префиксному дереву слов.
+
+    В отличие от простого перечисления через «|», такой шаблон
+    проверяет каждую позицию текста за время, зависящее от длины
+    слов, а не от их количества.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    alternatives = [
+        re.escape(char) + _node_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1 and '' not in node:
+        return alternatives[0]
+    pattern = '(?:' + '|'.join(alternatives) + ')'
+    return pattern + '?' if '' in node else pattern
+
+
+class BadWordMatcher:
+    """Ищет в тексте запрещённые слова одним скомпилированным выражением."""
+
+    def __init__(
+            self, words, whole_words=False, fold_yo=True, homoglyphs=True
+    ):
+        self.fold_yo = fold_yo
+        self.homoglyphs = homoglyphs
+        self.words = frozenset(
+            self.normalize(word.strip()) for word in words if word.strip()
+        )
+        self.regex = None
+        if whole_words or len(self.words) > SUBSTRING_SEARCH_LIMIT:
+            pattern = build_trie_pattern(self.words)
+            if whole_words:
+                pattern = rf'(?<!\w)(?:{pattern})(?!\w)'
+            self.regex = re.compile(pattern)
+
+    def normalize(self, text):
+        text = text.lower()
+        if self.fold_yo:
+            text = text.replace('ё', 'е')
+        if self.homoglyphs:
+            # Цепочка replace заметно быстрее str.translate на кириллице.
+            for latin, cyrillic in HOMOGLYPHS:
+                text = text.replace(latin, cyrillic)
+        return text
+
+    def search(self, text):
+        """Возвращает первое найденное запрещённое слово или None."""
+        text = self.normalize(text)
+        if self.regex is None:
+            return next((word for word in self.words if word in text), None)
+        match = self.regex.search(text)
+        return match.group() if match else None
+
+
+def read_words(path):
+    """Читает слова из файла: по одному в строке, # — комментарий."""
+    with open(path, encoding='utf-8') as file:
+        return [line.split('#', 1)[0] for line in file]
+
+
+def load_words():
+    """Встроенный список, слова из BAD_WORDS_FILE и таблицы BannedWord."""
+    words = list(BAD_WORDS)
+    if settings.BAD_WORDS_FILE:
+        words.extend(read_words(settings.BAD_WORDS_FILE))
+    words.extend(BannedWord.objects.values_list('word', flat=True))
+    return words
+
+
+_matcher = None
+_matcher_version = None
+
+
+def get_matcher():
+    """
+    Возвращает матчер, актуальный для всех процессов.
+
+    Версия списка слов хранится в общем для процессов кэше версий
+    (см. news.cache) и меняется при правке BannedWord в любом из них
+    (см. news.signals). На каждый запрос приходится одно чтение версии,
+    а к базе — только после изменений.
+    """
+    version = get_version(BANNED_WORDS_VERSION)
+    if _matcher is None or version != _matcher_version:
+        return reload_matcher(version)
+    return _matcher
+
+
+def reload_matcher(version=None):
+    """Перестраивает матчер, например после правки файла со словами."""
+    global _matcher, _matcher_version
+    _matcher_version = version or get_version(BANNED_WORDS_VERSION)
+    _matcher = BadWordMatcher(
+        load_words(), whole_words=settings.BAD_WORDS_WHOLE_WORDS
+    )
+    return _matcher
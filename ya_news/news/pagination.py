@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+
+from .archive import MAX_PK
+from .models import Comment
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(comment):
+    """Курсор указывает на последний показанный комментарий."""
+    return f'{(comment.created - EPOCH) // MICROSECOND}-{comment.pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        micros, pk = (int(part) for part in cursor.split('-'))
+        created = EPOCH + micros * MICROSECOND
+    except (ValueError, OverflowError):
+        raise Http404('Некорректный курсор.')
+    if pk > MAX_PK:
+        raise Http404('Некорректный курсор.')
+    return created, pk
+
+
+def get_comments_queryset(news_id, cursor=None):
+    """Комментарии к новости, идущие после курсора, в порядке показа."""
+    comments = Comment.objects.filter(
+        news_id=news_id
+    ).select_related('author').order_by('created', 'id')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        comments = comments.filter(
+            Q(created__gt=created) | Q(created=created, pk__gt=pk),
+            created__gte=created,
+        )
+    return comments
+
+
+def get_comments_page(news_id, cursor=None, page_size=None):
+    """
+    Возвращает страницу комментариев к новости и курсор следующей.
+
+    Используется keyset-пагинация по (created, id): стоимость запроса
+    не зависит от того, насколько далеко пролистана ветка.
+    """
+    page_size = page_size or settings.COMMENTS_PAGE_SIZE
+    page = list(get_comments_queryset(news_id, cursor)[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1])
+    return page, next_cursor
@@ -1,65 +1,178 @@
+from copy import copy
 from datetime import datetime, timedelta
 
 import pytest
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client
+from django.core.cache import cache, caches
+from django.test import Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
+from news.cache import VERSIONS_CACHE
 from news.models import News, Comment
+from news.write_behind import PENDING_CACHE, close_queue, get_queue
 
 User = get_user_model()
+# Кэши в файлах, общих для процессов сервера; ключ — переменная
+# окружения с путём к файлу.
+SHARED_CACHES = {
+    VERSIONS_CACHE: 'VERSIONS_CACHE_FILE',
+    PENDING_CACHE: 'PENDING_CACHE_FILE',
+}
+
+
+@pytest.fixture(scope='session', autouse=True)
+def shared_caches(tmp_path_factory):
+    """
+    Свои файлы общих для процессов кэшей у каждого процесса
+    pytest-xdist: иначе параллельные тесты сбрасывали бы их друг другу.
+    Возвращает переменные окружения с этими файлами для manage.py.
+    """
+    locations = {
+        alias: str(tmp_path_factory.mktemp(alias) / 'cache.db')
+        for alias in SHARED_CACHES
+    }
+    with override_settings(CACHES={
+        **settings.CACHES, **{
+            alias: {**settings.CACHES[alias], 'LOCATION': location}
+            for alias, location in locations.items()
+        }
+    }):
+        yield {
+            SHARED_CACHES[alias]: location
+            for alias, location in locations.items()
+        }
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш страниц и общие кэши не должны переживать тест."""
+    cache.clear()
+    for alias in SHARED_CACHES:
+        caches[alias].clear()
+
+
+@pytest.fixture
+def comment_queue(settings, tmp_path):
+    """Очередь отложенной записи, которую тест сохраняет сам."""
+    settings.COMMENTS_WRITE_BEHIND = True
+    settings.COMMENTS_QUEUE_DIR = tmp_path
+    settings.COMMENTS_QUEUE_INTERVAL = 60
+    yield get_queue()
+    close_queue()
 
 
 # Пользователи
+USERNAMES = {
+    'user': 'Мимо Крокодил',
+    'author': 'Автор комментария',
+    'reader': 'Читатель',
+    'not_author': 'Не автор',
+}
+
+
+@pytest.fixture(scope='session')
+def accounts(django_db_setup, django_db_blocker):
+    """
+    Пользователи и их сессии создаются один раз за прогон, а не
+    в каждом тесте: тесты работают в транзакциях, которые откатываются,
+    поэтому общие строки видны всем и не меняются. pytest-django
+    запускает тесты с transaction=True последними, и их очистка базы
+    остальным не мешает; pytest-xdist в режиме по умолчанию (--dist
+    load) этот порядок на каждом процессе сохраняет. Порядок проверяет
+    pytest_collection_modifyitems.
+    """
+    accounts = {}
+    with django_db_blocker.unblock():
+        for name, username in USERNAMES.items():
+            user = User.objects.create(username=username)
+            client = Client()
+            client.force_login(user)
+            accounts[name] = (
+                user, client.cookies[settings.SESSION_COOKIE_NAME].value
+            )
+    return accounts
+
+
+def is_transactional(item):
+    """Тест, после которого pytest-django очищает базу целиком."""
+    marker = item.get_closest_marker('django_db')
+    return bool(
+        marker is not None and marker.kwargs.get('transaction')
+        or {'transactional_db', 'live_server'} & set(item.fixturenames)
+    )
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    """
+    Общие пользователи accounts живут до первой очистки базы, поэтому
+    тесты с ними должны идти раньше тестов с transaction=True.
+    """
+    dist = config.getoption('dist', 'no')
+    if dist not in ('no', 'load'):
+        raise pytest.UsageError(
+            f'--dist {dist} меняет порядок тестов, а общим пользователям '
+            f'нужен порядок pytest-django: используйте --dist load.'
+        )
+    flushed = None
+    for item in items:
+        if flushed is not None and 'accounts' in item.fixturenames:
+            raise pytest.UsageError(
+                f'{item.nodeid} использует общих пользователей после '
+                f'{flushed.nodeid}, который очищает базу.'
+            )
+        if flushed is None and is_transactional(item):
+            flushed = item
+
+
+def logged_in(session_key):
+    """Клиент с готовой сессией: force_login писал бы её в базу."""
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    return client
+
+
 @pytest.fixture
-def user():
-    return User.objects.create(username='Мимо Крокодил')
+def user(accounts):
+    return copy(accounts['user'][0])
 
 
 @pytest.fixture
-def author():
-    return User.objects.create(username='Автор комментария')
+def author(accounts):
+    return copy(accounts['author'][0])
 
 
 @pytest.fixture
-def reader():
-    return User.objects.create(username='Читатель')
+def reader(accounts):
+    return copy(accounts['reader'][0])
 
 
 @pytest.fixture
-def not_author(django_user_model):
-    return django_user_model.objects.create(username='Не автор')
+def not_author(accounts):
+    return copy(accounts['not_author'][0])
 
 
 # Клиенты
 @pytest.fixture
-def auth_client(user):
-    client = Client()
-    client.force_login(user)
-    return client
+def auth_client(accounts):
+    return logged_in(accounts['user'][1])
 
 
 @pytest.fixture
-def author_client(author):
-    client = Client()
-    client.force_login(author)
-    return client
+def author_client(accounts):
+    return logged_in(accounts['author'][1])
 
 
 @pytest.fixture
-def reader_client(reader):
-    client = Client()
-    client.force_login(reader)
-    return client
+def reader_client(accounts):
+    return logged_in(accounts['reader'][1])
 
 
 @pytest.fixture
-def not_author_client(not_author):
-    client = Client()
-    client.force_login(not_author)
-    return client
+def not_author_client(accounts):
+    return logged_in(accounts['not_author'][1])
 
 
 # Страницы
@@ -68,11 +181,38 @@ def home_url():
     return reverse('news:home')
 
 
+@pytest.fixture
+def search_url():
+    return reverse('news:search')
+
+
+@pytest.fixture
+def archive_url():
+    return reverse('news:archive')
+
+
+@pytest.fixture
+def archive_year_url(news):
+    return reverse('news:archive_year', args=[news.date.year])
+
+
+@pytest.fixture
+def archive_month_url(news):
+    return reverse(
+        'news:archive_month', args=[news.date.year, news.date.month]
+    )
+
+
 @pytest.fixture
 def news_detail(news):
     return reverse('news:detail', args=[news.pk])
 
 
+@pytest.fixture
+def news_comments(news):
+    return reverse('news:comments', args=[news.pk])
+
+
 @pytest.fixture
 def comment_edit(comment):
     return reverse('news:edit', args=[comment.pk])
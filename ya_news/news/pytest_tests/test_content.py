@@ -1,8 +1,22 @@
+import re
+from datetime import date
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import Http404, QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
+from news import views
 from news.forms import CommentForm
+from news.models import News
 from yanews import settings
 
+COMMENT_TEXT = re.compile(r'<p class="mb-0">(.*?)</p>')
+NEXT_CURSOR = re.compile(r'\?cursor=([\d-]+)')
+
 
 @pytest.mark.django_db
 def test_news_count(client, create_news, home_url):
@@ -23,6 +37,46 @@ def test_news_order(client, create_news, home_url):
     assert all_dates == sorted_dates
 
 
+@pytest.mark.django_db
+def test_home_page_uses_comments_counter(
+        client, create_news, home_url, django_assert_num_queries
+):
+    """Главная страница не загружает комментарии ради их количества."""
+    News.objects.update(comments_count=3)
+    with django_assert_num_queries(1):
+        response = client.get(home_url)
+    assert 'Комментариев: 3' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_home_page_cached_for_anonymous(
+        client, create_news, home_url, django_assert_num_queries
+):
+    """Повторный запрос главной страницы не обращается к базе."""
+    first = client.get(home_url)
+    with django_assert_num_queries(0):
+        second = client.get(home_url)
+    assert second.content == first.content
+
+
+@pytest.mark.django_db
+def test_home_page_cache_invalidated_by_changes(client, news, home_url):
+    """Изменение новости сбрасывает кэш главной страницы."""
+    client.get(home_url)
+    news.title = 'Новый заголовок'
+    news.save()
+    response = client.get(home_url)
+    assert news.title in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_home_page_not_cached_for_authorized(auth_client, news, home_url):
+    """Авторизованный пользователь всегда получает свежую страницу."""
+    auth_client.get(home_url)
+    response = auth_client.get(home_url)
+    assert 'object_list' in response.context
+
+
 @pytest.mark.django_db
 def test_comments_order(client, create_comments, news_detail, news):
     """
@@ -36,6 +90,63 @@ def test_comments_order(client, create_comments, news_detail, news):
     assert all_timestamps == sorted_timestamps
 
 
+@pytest.mark.django_db
+def test_comments_keyset_pagination(
+        client, settings, create_comments, news, news_detail, news_comments
+):
+    """
+    Проверяет, что комментарии отдаются страницами,
+    а «Показать ещё» догружает оставшиеся без повторов.
+    """
+    settings.COMMENTS_PAGE_SIZE = 3
+    content = client.get(news_detail).content.decode()
+    assert len(COMMENT_TEXT.findall(content)) == settings.COMMENTS_PAGE_SIZE
+
+    shown = []
+    while True:
+        shown.extend(COMMENT_TEXT.findall(content))
+        cursor = NEXT_CURSOR.search(content)
+        if cursor is None:
+            break
+        content = client.get(
+            news_comments, {'cursor': cursor.group(1)}
+        ).content.decode()
+
+    assert shown == [
+        comment.text for comment in news.comment_set.order_by('created', 'id')
+    ]
+
+
+@pytest.mark.django_db
+def test_comments_thread_cached(
+        client, create_comments, news_detail, django_assert_num_queries
+):
+    """Повторный показ ветки не запрашивает комментарии из базы."""
+    client.get(news_detail)
+    with django_assert_num_queries(1):
+        client.get(news_detail)
+
+
+@pytest.mark.django_db
+def test_comment_actions_only_for_author(
+        author_client, reader_client, comment, news_detail, comment_edit
+):
+    """Ссылки на правку видит только автор, хотя ветка общая в кэше."""
+    assert comment_edit in author_client.get(news_detail).content.decode()
+    assert comment_edit not in reader_client.get(news_detail).content.decode()
+
+
+@pytest.mark.django_db
+def test_comments_thread_invalidated_on_edit(
+        author_client, comment, news_detail, comment_edit
+):
+    """Правка комментария сбрасывает кэш ветки."""
+    author_client.get(news_detail)
+    author_client.post(comment_edit, data={'text': 'Исправленный текст'})
+    content = author_client.get(news_detail).content.decode()
+    assert 'Исправленный текст' in content
+
+
 @pytest.mark.django_db
 def test_anonymous_client_has_no_form(client, news, news_detail):
     """Проверяет отсутствие формы для анонимного пользователя."""
@@ -49,3 +160,108 @@ def test_authorized_client_has_form(auth_client, news, news_detail):
     response = auth_client.get(news_detail)
     assert 'form' in response.context
     assert isinstance(response.context['form'], CommentForm)
+
+
+@pytest.mark.django_db
+def test_async_views(
+        async_rf, news, comment, author, home_url, news_detail,
+        django_assert_num_queries
+):
+    """
+    Асинхронные главная и страница новости показывают те же данные
+    и используют тот же кэш.
+    """
+    request = async_rf.get(home_url)
+    request.user = AnonymousUser()
+    home = async_to_sync(views.news_list)(request)
+    assert news.title in home.content.decode()
+    with django_assert_num_queries(0):
+        cached = async_to_sync(views.news_list)(request)
+    assert cached.content == home.content
+
+    request = async_rf.get(news_detail)
+    request.user = author
+    content = async_to_sync(views.news_detail)(
+        request, pk=news.pk
+    ).content.decode()
+    assert comment.text in content
+    assert 'csrfmiddlewaretoken' in content
+    with pytest.raises(Http404):
+        async_to_sync(views.news_detail)(request, pk=news.pk + 1)
+
+
+@pytest.mark.django_db
+def test_search_snippets_highlighted(client, news, comment, search_url):
+    """
+    Совпадения подсвечиваются, остальной текст экранируется,
+    комментарии ищутся только по запросу.
+    """
+    News.objects.create(title='Ёлки <script>', text='Ёлку поставили.')
+    response = client.get(search_url, {'q': 'ёлка'})
+    hits = response.context['hits']
+    assert [hit.title for hit in hits] == ['<mark>Ёлки</mark> &lt;script&gt;']
+    assert hits[0].snippet == '<mark>Ёлку</mark> поставили.'
+    response = client.get(search_url, {'q': 'комментарии'})
+    assert response.context['hits'] == []
+    response = client.get(search_url, {'q': 'комментарии', 'comments': 1})
+    assert [
+        (hit.news_id, hit.comment_id) for hit in response.context['hits']
+    ] == [(news.pk, comment.pk)]
+
+
+@pytest.mark.django_db
+def test_search_pagination(client, settings, search_url):
+    """Результаты поиска выводятся страницами по SEARCH_PAGE_SIZE."""
+    settings.SEARCH_PAGE_SIZE = 2
+    for index in range(3):
+        News.objects.create(title=f'Новость {index}', text='Текст')
+    seen = []
+    params = {'q': 'новости'}
+    while True:
+        response = client.get(search_url, params)
+        seen.extend(hit.news_id for hit in response.context['hits'])
+        if not response.context['next_query']:
+            break
+        params = QueryDict(response.context['next_query'])
+    assert sorted(seen) == sorted(News.objects.values_list('pk', flat=True))
+
+
+@pytest.mark.django_db
+def test_archive_month_keyset_pagination(client, settings):
+    """Новости месяца выводятся страницами по курсору, без текста."""
+    settings.ARCHIVE_PAGE_SIZE = 2
+    for day in (3, 1, 3, 2, 5):
+        News.objects.create(
+            title='Новость', text='Текст', date=date(2020, 2, day)
+        )
+    News.objects.create(title='Новость', text='Текст', date=date(2020, 3, 1))
+    url = reverse('news:archive_month', args=(2020, 2))
+    shown = []
+    params = {}
+    while True:
+        response = client.get(url, params)
+        page = response.context['object_list']
+        assert len(page) <= 2
+        assert all('text' in news.get_deferred_fields() for news in page)
+        shown.extend(page)
+        if not response.context['next_cursor']:
+            break
+        params = {'cursor': response.context['next_cursor']}
+    assert shown == list(
+        News.objects.filter(date__month=2).order_by('-date', 'id')
+    )
+
+
+@pytest.mark.django_db
+def test_archive_months_from_counts(client, archive_url):
+    """Навигация строится по счётчикам месяцев и кэшируется."""
+    for day in (date(2020, 2, 1), date(2020, 2, 9), date(2021, 1, 1)):
+        News.objects.create(title='Новость', text='Текст', date=day)
+    expected = [(date(2021, 1, 1), 1), (date(2020, 2, 1), 2)]
+    response = client.get(archive_url)
+    assert [
+        (item.month, item.count) for item in response.context['months']
+    ] == expected
+    with CaptureQueriesContext(connection) as queries:
+        client.get(archive_url)
+    assert len(queries) == 0
@@ -1,11 +1,59 @@
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
 from http import HTTPStatus
+from datetime import date
+from io import StringIO
 
-import pytest
+from unittest import mock
 
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.template import Context, Template, engines
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from news.cache import (
+    HOME_PAGE_VERSION, home_page_key, thread_version_key
+)
 from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.fragments import render_comments
+from news.models import BannedWord, Comment, News, NewsMonthCount
+from news.moderation import (
+    BANNED_WORDS_VERSION, BadWordMatcher, get_matcher, reload_matcher
+)
+from news.search import LikeSearch, search
+from news.signals import apply_sqlite_pragmas
+from news.write_behind import CommentQueue, save_comments
+from yanews.metrics import registry, summarize
+from yanews.querylog import (
+    QueryLogMiddleware, fingerprint, instrument_connections
+)
+from yanews.replicas import (
+    PIN_COOKIE, PrimaryReplicaRouter, ReplicaMiddleware, replica_reads
+)
+from yanews.sqlitecache import SQLiteCache
+from yanews.templating import warm_up
 
 FORM_DATA = {'text': 'Текст комментария'}
+BAD_FORM_DATA = {'text': f'Текст, {BAD_WORDS[0]}'}
+CLIENT = pytest.lazy_fixture('client')
+AUTHOR_CLIENT = pytest.lazy_fixture('author_client')
+NEWS_DETAIL_URL = pytest.lazy_fixture('news_detail')
+COMMENT_EDIT_URL = pytest.lazy_fixture('comment_edit')
+COMMENT_DELETE_URL = pytest.lazy_fixture('comment_delete')
+CSRF_INPUT = re.compile(r'<input [^>]*name="csrfmiddlewaretoken"[^>]*>')
 
 
 @pytest.mark.django_db
@@ -67,6 +115,64 @@ def test_user_cant_use_bad_words(auth_client, news, news_detail):
         text=bad_words_data['text']).exists()
 
 
+@pytest.mark.parametrize(
+    'text',
+    (
+        'Ну ты и РЕДИСКА!',
+        'Ну ты и рeдискa!',  # латинские «e» и «a»
+        'Негодяй, ещё и с ё: негодЯЙ',
+    ),
+)
+@pytest.mark.django_db
+def test_bad_words_are_normalized(auth_client, news, news_detail, text):
+    """Регистр и латинские двойники букв не обходят фильтр."""
+    response = auth_client.post(news_detail, data={'text': text})
+    assert response.context['form'].errors['text'] == [WARNING]
+
+
+def test_bad_word_matcher_options():
+    """Проверяет сопоставление целых слов и замену ё на е."""
+    long_list = ['ёж'] + [f'слово{index}' for index in range(1000)]
+    whole_words = BadWordMatcher(['ёж'], whole_words=True)
+
+    assert BadWordMatcher(['ёж']).search('ежевика') == 'еж'
+    assert BadWordMatcher(long_list).search('ежевика') == 'еж'
+    assert whole_words.search('ежевика') is None
+    assert whole_words.search('колючий ёж') == 'еж'
+
+
+@pytest.mark.django_db
+def test_bad_words_reloaded_from_file(settings, tmp_path):
+    """Слова из BAD_WORDS_FILE добавляются к встроенному списку."""
+    words_file = tmp_path / 'bad_words.txt'
+    words_file.write_text('# модерация\nбяка\n', encoding='utf-8')
+    settings.BAD_WORDS_FILE = words_file
+    try:
+        assert reload_matcher().search('Бяка!') == 'бяка'
+    finally:
+        settings.BAD_WORDS_FILE = None
+        reload_matcher()
+    assert get_matcher().search('Бяка!') is None
+
+
+@pytest.mark.django_db
+def test_banned_words_from_database(
+        auth_client, news, news_detail, django_assert_num_queries
+):
+    """Слова из админки применяются без перезапуска и без лишних запросов."""
+    get_matcher()
+    with django_assert_num_queries(0):
+        get_matcher()
+
+    BannedWord.objects.create(word='бяка')
+    response = auth_client.post(news_detail, data={'text': 'Сам бяка'})
+    assert response.context['form'].errors['text'] == [WARNING]
+
+    BannedWord.objects.all().delete()
+    response = auth_client.post(news_detail, data={'text': 'Сам бяка'})
+    assert response.status_code == HTTPStatus.FOUND
+
+
 @pytest.mark.django_db
 def test_author_can_delete_comment(
         author_client, comment, comment_delete, news_detail
@@ -159,3 +265,721 @@ def test_user_cant_edit_comment_of_another_user(
 
     comments_count_after = Comment.objects.count()
     assert comments_count_after == comments_count_before
+
+
+@pytest.mark.django_db
+def test_comments_count_follows_create_and_delete(
+        author_client, news, news_detail
+):
+    """Проверяет, что счётчик комментариев обновляется во вьюхах."""
+    author_client.post(news_detail, data=FORM_DATA)
+    news.refresh_from_db()
+    assert news.comments_count == 1
+
+    comment = Comment.objects.get(news=news)
+    author_client.post(reverse('news:delete', args=[comment.pk]))
+    news.refresh_from_db()
+    assert news.comments_count == 0
+
+
+@pytest.mark.django_db
+def test_recount_comments_command(create_comments, news):
+    """Проверяет, что команда восстанавливает счётчик комментариев."""
+    News.objects.update(comments_count=0)
+
+    call_command('recount_comments', stdout=StringIO())
+
+    news.refresh_from_db()
+    assert news.comments_count == Comment.objects.filter(news=news).count()
+
+
+@pytest.mark.django_db
+def test_load_comments_cleans_up_after_failure():
+    """Прерванный замер не оставляет в базе пользователей и новость."""
+    with mock.patch(
+        'news.management.commands.load_comments.Command.post_comments',
+        side_effect=RuntimeError,
+    ), pytest.raises(RuntimeError):
+        call_command('load_comments', threads=2, stdout=StringIO())
+    assert not get_user_model().objects.filter(
+        username__startswith='load_comments'
+    ).exists()
+    assert not News.objects.filter(title='Нагрузка').exists()
+
+
+@pytest.mark.django_db
+def test_view_queries_use_indexes():
+    """Проверяет, что запросы вьюх не читают таблицы целиком."""
+    call_command('check_query_plans', stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_search_index_follows_changes(news, comment):
+    """Проверяет, что индекс обновляется сигналами моделей."""
+    assert [hit.news_id for hit in search('заголовок')] == [news.pk]
+    news.title = 'Новый заголовок'
+    news.save()
+    assert '<mark>Новый</mark>' in search('новый')[0].title
+    comment.text = 'Исправленный комментарий'
+    comment.save()
+    assert [hit.comment_id for hit in search('исправлен', True)] == [
+        comment.pk
+    ]
+    news.delete()
+    assert search('новый', True) == []
+    assert search('исправлен', True) == []
+
+
+@pytest.mark.django_db
+def test_search_keeps_yo_in_snippets(news, comment):
+    """Проверяет, что ё ищется как е, а в выдаче остаётся ё."""
+    news.title = 'Ёжик в тумане'
+    news.text = 'Ещё один ёжик вышел на дорогу.'
+    news.save()
+    comment.text = 'Ёлки зелёные!'
+    comment.save()
+    hit, = search('ежик')
+    assert hit.title == '<mark>Ёжик</mark> в тумане'
+    assert hit.snippet == 'Ещё один <mark>ёжик</mark> вышел на дорогу.'
+    hit, = search('зеленые', True)
+    assert hit.snippet == 'Ёлки <mark>зелёные</mark>!'
+    call_command('rebuild_search_index', stdout=StringIO())
+    assert search('ёлки', True)[0].snippet == '<mark>Ёлки</mark> зелёные!'
+    news.delete()
+    assert search('ежик', True) == []
+
+
+@pytest.mark.django_db
+def test_like_search_fallback(news, comment):
+    """Проверяет поиск без FTS5: совпадения, сниппеты и подсветку."""
+    with mock.patch('news.search.get_search', return_value=LikeSearch()):
+        hits = search('Text', True)
+        assert hits == []
+        News.objects.create(title='Other', text='Some <b>text</b> here')
+        comment.text = 'Text of comment'
+        comment.save()
+        hits = search('text', True)
+    assert sorted(hit.snippet for hit in hits) == [
+        '<mark>Text</mark> of comment',
+        'Some &lt;b&gt;<mark>text</mark>&lt;/b&gt; here',
+    ]
+
+
+@pytest.mark.django_db
+def test_month_counts_follow_news_changes():
+    """Проверяет счётчики месяцев при создании, переносе и удалении."""
+    def counts():
+        return dict(NewsMonthCount.objects.filter(
+            count__gt=0
+        ).values_list('month', 'count'))
+
+    news = News.objects.create(
+        title='Новость', text='Текст', date=date(2020, 2, 3)
+    )
+    News.objects.create(title='Новость', text='Текст', date=date(2020, 2, 5))
+    assert counts() == {date(2020, 2, 1): 2}
+    news.date = date(2020, 3, 1)
+    news.save()
+    assert counts() == {date(2020, 2, 1): 1, date(2020, 3, 1): 1}
+    news.delete()
+    assert counts() == {date(2020, 2, 1): 1}
+
+    news = News.objects.get()
+    news.date = date(2020, 4, 1)
+    with CaptureQueriesContext(connection) as queries:
+        news.save()
+    assert counts() == {date(2020, 4, 1): 1}
+    # Прежняя дата известна с загрузки, перед сохранением её не читают.
+    assert not [
+        query for query in queries.captured_queries
+        if query['sql'].startswith('SELECT') and 'news_news' in query['sql']
+    ]
+
+
+@pytest.mark.django_db
+def test_recount_archive_command(create_news):
+    """Проверяет пересчёт месяцев для новостей из bulk_create."""
+    call_command('recount_archive', stdout=StringIO())
+
+    assert sum(
+        NewsMonthCount.objects.values_list('count', flat=True)
+    ) == News.objects.count()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'user, url, method, data, queries',
+    (
+        # Новость и ветка комментариев.
+        (CLIENT, NEWS_DETAIL_URL, 'get', None, 2),
+        # Плюс сессия и пользователь.
+        (AUTHOR_CLIENT, NEWS_DETAIL_URL, 'get', None, 4),
+        # Сессия, пользователь, новость и запрещённые слова: clear_cache
+        # стирает версии перед тестом, и список читается заново. Затем
+        # SAVEPOINT, INSERT комментария, INSERT … ON CONFLICT в
+        # news_comment_fts_source (индекс обновляют триггеры), UPDATE
+        # счётчика новости и RELEASE.
+        (AUTHOR_CLIENT, NEWS_DETAIL_URL, 'post', FORM_DATA, 9),
+        # Ошибка в форме: страница с веткой комментариев.
+        (AUTHOR_CLIENT, NEWS_DETAIL_URL, 'post', BAD_FORM_DATA, 5),
+        # Комментарий вместе с новостью.
+        (AUTHOR_CLIENT, COMMENT_EDIT_URL, 'get', None, 3),
+        (AUTHOR_CLIENT, COMMENT_EDIT_URL, 'post', FORM_DATA, 6),
+        (AUTHOR_CLIENT, COMMENT_DELETE_URL, 'post', None, 8),
+    ),
+)
+def test_comment_flow_query_count(
+        user, url, method, data, queries, comment, django_assert_num_queries
+):
+    """Каждый объект загружается не больше одного раза за запрос."""
+    with django_assert_num_queries(queries):
+        getattr(user, method)(url, data)
+
+
+def test_router_reads_from_replica_only_when_allowed(settings):
+    """Чтение с реплики — только в разрешённом запросе и не для auth."""
+    settings.REPLICA_DATABASE = 'replica'
+    router = PrimaryReplicaRouter()
+    assert router.db_for_read(News) == 'default'
+    token = replica_reads.set(True)
+    try:
+        assert router.db_for_read(News) == 'replica'
+        assert router.db_for_read(get_user_model()) == 'default'
+        assert router.db_for_write(News) == 'default'
+    finally:
+        replica_reads.reset(token)
+    settings.REPLICA_DATABASE = None
+    assert router.db_for_read(News) == 'default'
+
+
+def test_replica_pinned_after_post(settings, rf):
+    """После POST клиент какое-то время читает из основной базы."""
+    settings.REPLICA_DATABASE = 'replica'
+    seen = []
+
+    def view(request):
+        seen.append(replica_reads.get())
+        return HttpResponse()
+
+    middleware = ReplicaMiddleware(view)
+    middleware(rf.get('/'))
+    response = middleware(rf.post('/'))
+    pinned_request = rf.get('/')
+    pinned_request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+    middleware(pinned_request)
+    assert seen == [True, False, False]
+    assert replica_reads.get() is False
+
+
+def test_replica_middleware_async(settings, async_rf):
+    """Под ASGI middleware остаётся асинхронным и ставит тот же флаг."""
+    settings.REPLICA_DATABASE = 'replica'
+    seen = []
+
+    async def view(request):
+        seen.append(replica_reads.get())
+        return HttpResponse()
+
+    middleware = ReplicaMiddleware(view)
+    assert asyncio.iscoroutinefunction(middleware)
+    async_to_sync(middleware)(async_rf.get('/'))
+    response = async_to_sync(middleware)(async_rf.post('/'))
+    assert seen == [True, False]
+    assert PIN_COOKIE in response.cookies
+
+
+def test_sync_replica_requires_replica(settings):
+    settings.REPLICA_DATABASE = None
+    with pytest.raises(CommandError):
+        call_command('sync_replica', stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas_applied(settings):
+    """Проверяет, что PRAGMA из настроек выполняются для соединения."""
+    with connection.cursor() as cursor:
+        default = cursor.execute('PRAGMA cache_size').fetchone()[0]
+        settings.SQLITE_PRAGMAS = {'cache_size': -1234}
+        apply_sqlite_pragmas(connection=connection)
+        try:
+            assert cursor.execute('PRAGMA cache_size').fetchone()[0] == -1234
+        finally:
+            cursor.execute(f'PRAGMA cache_size = {default}')
+
+
+@pytest.mark.django_db
+def test_write_behind_comment(
+        auth_client, user, news, news_detail, comment_queue
+):
+    """
+    Комментарий в очереди виден только автору, а после сохранения
+    пачки попадает в ветку и счётчик.
+    """
+    response = auth_client.post(news_detail, data=FORM_DATA)
+
+    assert response.status_code == HTTPStatus.FOUND
+    assert Comment.objects.count() == 0
+    pending = auth_client.get(news_detail).context['pending_comments']
+    assert [entry['text'] for entry in pending] == [FORM_DATA['text']]
+    assert comment_queue.flush() == 1
+    comment = Comment.objects.get()
+    assert (comment.text, comment.author, comment.news) == (
+        FORM_DATA['text'], user, news
+    )
+    news.refresh_from_db()
+    assert news.comments_count == 1
+    response = auth_client.get(news_detail)
+    assert response.context['pending_comments'] == []
+    assert FORM_DATA['text'] in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_pending_comments_across_processes(
+        settings, shared_caches, auth_client, user, news, news_detail
+):
+    """
+    Автор видит комментарии из очереди другого процесса, а одинаковые
+    комментарии исчезают из ожидающих по одному.
+    """
+    entries = [{
+        'key': key, 'news_id': news.pk, 'author_id': user.pk,
+        'text': 'Дважды', 'queued': timezone.now().isoformat(),
+    } for key in ('first', 'second')]
+    in_other_process(settings, shared_caches, (
+        f'from news.write_behind import remember_pending\n'
+        f'for entry in {entries!r}: remember_pending(entry)'
+    ))
+
+    pending = auth_client.get(news_detail).context['pending_comments']
+    assert [entry['key'] for entry in pending] == ['first', 'second']
+    save_comments(entries[:1])
+    pending = auth_client.get(news_detail).context['pending_comments']
+    assert [entry['key'] for entry in pending] == ['second']
+
+
+@pytest.mark.django_db
+def test_comment_queue_recovers_journal(news, author, tmp_path):
+    """Комментарии из журнала упавшего процесса сохраняются."""
+    crashed = CommentQueue(tmp_path, batch_size=10, interval=60)
+    crashed.put(news.pk, author.pk, 'Из журнала')
+    crashed.stopped.set()
+    crashed.wakeup.set()
+    crashed.journal.close()
+
+    CommentQueue(tmp_path, batch_size=10, interval=60).close()
+
+    assert list(Comment.objects.values_list('text', flat=True)) == [
+        'Из журнала'
+    ]
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.django_db
+def test_comment_queue_leaves_live_journals(news, author, tmp_path):
+    """
+    Журнал живой очереди другие не забирают, а пропавший журнал
+    пропускается без ошибки.
+    """
+    queue = CommentQueue(tmp_path, batch_size=10, interval=60)
+    queue.put(news.pk, author.pk, 'Из живой очереди')
+    assert list(tmp_path.iterdir()) == [queue.path]
+
+    other = CommentQueue(tmp_path, batch_size=10, interval=60)
+    other.adopt(tmp_path / 'adopted.jsonl')
+
+    assert other.pending == []
+    other.close()
+    queue.close()
+    assert Comment.objects.count() == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_project_imports_without_fcntl(settings):
+    """Без очереди проекту flock не нужен, например в Windows."""
+    subprocess.run(
+        [sys.executable, '-c', (
+            'import sys; sys.modules["fcntl"] = None\n'
+            'import django; django.setup()\n'
+            'import news.views'
+        )],
+        cwd=settings.BASE_DIR, check=True, env={
+            **os.environ, 'DJANGO_SETTINGS_MODULE': 'yanews.settings'
+        },
+    )
+
+
+SEED_OPTIONS = {
+    'users': 50, 'news': 200, 'comments': 5000, 'days': 60,
+    'batch_size': 1000, 'seed': 1,
+}
+
+
+@pytest.mark.django_db
+def test_seed_is_skewed_and_deterministic():
+    """
+    Комментарии достаются немногим новостям и авторам, счётчики
+    пересчитаны, а тот же --seed даёт те же данные.
+    """
+    call_command('seed', stdout=StringIO(), **SEED_OPTIONS)
+
+    assert get_user_model().objects.filter(
+        username__startswith='seed'
+    ).count() == SEED_OPTIONS['users']
+    counts = sorted(
+        News.objects.values_list('comments_count', flat=True), reverse=True
+    )
+    assert sum(counts) == Comment.objects.count() == SEED_OPTIONS['comments']
+    assert sum(counts[:len(counts) // 10]) > sum(counts) / 3
+    assert search(Comment.objects.first().text.split()[0])
+    titles = list(News.objects.order_by('pk').values_list('title', flat=True))
+
+    call_command('seed', prefix='again', stdout=StringIO(), **SEED_OPTIONS)
+
+    assert list(News.objects.order_by('pk').values_list(
+        'title', flat=True
+    ))[len(titles):] == titles
+    with pytest.raises(CommandError):
+        call_command('seed', stdout=StringIO(), **SEED_OPTIONS)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_against_live_server(live_server):
+    """Прогон смешанного трафика проходит без ошибок."""
+    call_command('seed', stdout=StringIO(), **SEED_OPTIONS)
+    out = StringIO()
+
+    call_command(
+        'load_test', url=live_server.url, clients=1, duration=1,
+        writers=1, stdout=out,
+    )
+
+    assert re.search(r'всего .*ошибок\s+0, .*p99', out.getvalue())
+    assert re.search(r'comment .*ошибок\s+0,', out.getvalue())
+
+
+@pytest.mark.django_db
+def test_metrics_middleware(settings, author, comment, news_detail):
+    """
+    Замер попадает в Server-Timing и в гистограмму по имени URL,
+    а команда metrics сводит гистограмму в таблицу.
+    """
+    settings.METRICS_SAMPLE_RATE = 1
+    registry.reset()
+    client = Client()
+    client.force_login(author)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(news_detail)
+
+    count = len(queries)
+    timing = response['Server-Timing']
+    assert f'desc="{count} queries"' in timing
+    assert f'desc="{len(response.content)} bytes"' in timing
+    assert 'tpl;dur=' in timing and 'total;dur=' in timing
+    text = client.get(reverse('metrics')).content.decode()
+    assert 'django_view_duration_seconds_count{view="news:detail"} 1' in text
+    assert (
+        f'django_view_queries_total{{view="news:detail"}} {count}'
+    ) in text
+    assert client.get(
+        reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+    ).status_code == HTTPStatus.NOT_FOUND
+    out = StringIO()
+    with mock.patch(
+        'news.management.commands.metrics.urlopen',
+        return_value=mock.MagicMock(**{
+            '__enter__.return_value.read.return_value': text.encode()
+        })
+    ):
+        call_command('metrics', stdout=out)
+    note, *table = out.getvalue().splitlines()
+    assert note.startswith(f'Процесс {os.getpid()}: ')
+    assert table == summarize(text)
+    assert any(line.startswith('news:detail ') for line in summarize(text))
+    registry.reset()
+
+
+@pytest.mark.django_db
+def test_metrics_middleware_asgi(settings, news, news_detail):
+    """Под ASGI запросы к базе считаются и в потоке sync_to_async."""
+    settings.METRICS_SAMPLE_RATE = 1
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    async_to_sync(ASGIHandler())({
+        'type': 'http', 'method': 'GET', 'path': news_detail,
+        'query_string': b'', 'headers': [(b'host', b'testserver')],
+    }, receive, send)
+
+    assert messages[0]['status'] == HTTPStatus.OK
+    headers = dict(messages[0]['headers'])
+    assert b'desc="2 queries"' in headers[b'Server-Timing']
+    registry.reset()
+
+
+@pytest.mark.django_db
+def test_metrics_disabled(settings, news_detail):
+    """Без выборки middleware не подключается и заголовка нет."""
+    settings.METRICS_SAMPLE_RATE = 0
+    registry.reset()
+
+    response = Client().get(news_detail)
+
+    assert 'Server-Timing' not in response
+    assert registry.views == {}
+
+
+def test_query_fingerprint():
+    assert fingerprint(
+        'SELECT "a" FROM "t" WHERE "id" IN (%s, %s, %s) AND "s" = \'x\' '
+        'LIMIT 21'
+    ) == 'SELECT "a" FROM "t" WHERE "id" IN (...) AND "s" = ? LIMIT ?'
+
+
+@pytest.mark.django_db
+def test_query_log_finds_n_plus_one(settings, tmp_path, rf, create_news):
+    """
+    Счётчик комментариев в цикле шаблона попадает в журнал одной
+    записью со строкой шаблона и местом в коде.
+    """
+    settings.QUERY_LOG_FILE = tmp_path / 'queries.jsonl'
+    settings.QUERY_LOG_SLOW_MS = 10_000
+    template = Template(
+        '{% for news in object_list %}\n'
+        '{{ news.comment_set.count }}{% endfor %}'
+    )
+
+    def view(request):
+        return HttpResponse(template.render(Context({
+            'object_list': News.objects.all()
+        })))
+
+    middleware = QueryLogMiddleware(view)
+    # Обработчик Django вызывает это по сигналу request_started.
+    instrument_connections()
+    middleware(rf.get('/'))
+
+    entries = [
+        json.loads(line)
+        for line in settings.QUERY_LOG_FILE.read_text().splitlines()
+    ]
+    assert len(entries) == 1
+    entry = entries[0]
+    assert (entry['kind'], entry['count'], entry['template']) == (
+        'duplicate', News.objects.count(), '<unknown source>:2'
+    )
+    assert 'COUNT(*)' in entry['sql'] and '?' not in entry['sql']
+    assert entry['code'].startswith('news/pytest_tests/test_logic.py:')
+    out = StringIO()
+    call_command('query_log', stdout=out)
+    assert out.getvalue().startswith(
+        f'duplicate {entry["view"]}: записей 1, запросов {entry["count"]}'
+    )
+
+
+@pytest.mark.django_db
+def test_query_log_slow_queries(settings, tmp_path, news_detail):
+    """Медленные запросы пишутся с именем URL, по одной записи на запрос."""
+    settings.QUERY_LOG_FILE = tmp_path / 'queries.jsonl'
+    settings.QUERY_LOG_SLOW_MS = 0
+
+    Client().get(news_detail)
+
+    entries = [
+        json.loads(line)
+        for line in settings.QUERY_LOG_FILE.read_text().splitlines()
+    ]
+    assert {entry['kind'] for entry in entries} == {'slow'}
+    assert {entry['view'] for entry in entries} == {'news:detail'}
+    assert len(entries) == 2
+
+
+@pytest.mark.django_db
+def test_query_log_writes_off_event_loop(settings, tmp_path, async_rf, news):
+    """Под ASGI журнал пишется в потоке, цикл событий не блокируется."""
+    settings.QUERY_LOG_FILE = tmp_path / 'queries.jsonl'
+    settings.QUERY_LOG_SLOW_MS = 0
+    write = QueryLogMiddleware.write
+    in_event_loop = []
+
+    def spy(request, entries):
+        try:
+            in_event_loop.append(bool(asyncio.get_running_loop()))
+        except RuntimeError:
+            in_event_loop.append(False)
+        write(request, entries)
+
+    async def view(request):
+        await sync_to_async(News.objects.count)()
+        return HttpResponse()
+
+    with mock.patch.object(QueryLogMiddleware, 'write', staticmethod(spy)):
+        middleware = QueryLogMiddleware(view)
+        instrument_connections()
+        async_to_sync(middleware)(async_rf.get('/'))
+
+    assert in_event_loop == [False]
+    assert settings.QUERY_LOG_FILE.read_text().count('"slow"') == 1
+
+
+def normalize_html(html):
+    """Разметка без токена CSRF и без различий в пробелах."""
+    html = re.sub(r'\s+', ' ', CSRF_INPUT.sub('', html)).strip()
+    return html.replace('> <', '><')
+
+
+def test_template_warm_up(settings):
+    """Прогрев кладёт в кэш загрузчика все шаблоны проекта."""
+    engine, = settings.TEMPLATES
+    settings.TEMPLATES = [{
+        **engine, 'APP_DIRS': False,
+        'OPTIONS': {**engine['OPTIONS'], 'loaders': [(
+            'django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        )]},
+    }]
+
+    count = warm_up()
+
+    templates = [
+        path.relative_to(settings.BASE_DIR / 'templates').as_posix()
+        for path in (settings.BASE_DIR / 'templates').rglob('*.html')
+    ]
+    assert count == len(templates)
+    loader, = engines['django'].engine.template_loaders
+    assert set(templates) <= set(loader.get_template_cache)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, template', (
+    (pytest.lazy_fixture('home_url'), 'news/home.html'),
+    (NEWS_DETAIL_URL, 'news/detail.html'),
+))
+def test_jinja2_templates_match_django(
+    settings, author_client, comment, url, template
+):
+    """Шаблоны Jinja2 дают ту же разметку, что и шаблоны Django."""
+    pytest.importorskip('jinja2')
+    expected = author_client.get(url).content.decode()
+    settings.TEMPLATES = [settings.JINJA2_ENGINE, *settings.TEMPLATES]
+
+    response = author_client.get(url)
+
+    assert template not in {used.name for used in response.templates}
+    assert normalize_html(response.content.decode()) == normalize_html(
+        expected
+    )
+
+
+def in_other_process(settings, environ, code):
+    """Выполняет код так, как его выполнил бы другой процесс сервера."""
+    subprocess.run(
+        [sys.executable, 'manage.py', 'shell', '-c', code],
+        cwd=settings.BASE_DIR, check=True, env={**os.environ, **environ},
+    )
+
+
+def bump_in_other_process(settings, environ, *keys):
+    in_other_process(settings, environ, (
+        f'from news.cache import bump_version\n'
+        f'for key in {keys!r}: bump_version(key)'
+    ))
+
+
+def test_shared_cache_backend(tmp_path):
+    """Два экземпляра кэша над одним файлом видят записи друг друга."""
+    path = str(tmp_path / 'cache.db')
+    first, second = SQLiteCache(path, {}), SQLiteCache(path, {})
+    first.set('key', {'value': 1}, None)
+    assert second.get('key') == {'value': 1}
+    assert not second.add('key', 2)
+    assert second.get_or_set('other', 3, None) == 3
+    assert first.get('other') == 3
+    first.set('stale', 4, 0)
+    assert second.get('stale', 'нет') == 'нет'
+    assert second.add('stale', 5) and first.get('stale') == 5
+    assert first.touch('stale', 0) and second.get('stale') is None
+    assert second.delete('key') and 'key' not in first
+    first.clear()
+    assert second.get('other') is None
+
+
+def test_shared_cache_write_cost_does_not_grow(tmp_path):
+    """
+    Запись и промах версии стоят одинаково при десяти ключах и при
+    двадцати тысячах: таблица целиком не читается. Работу считает сама
+    SQLite — по инструкциям виртуальной машины, без замера времени.
+    """
+    def steps(size):
+        shared = SQLiteCache(str(tmp_path / f'{size}.db'), {})
+        connection = shared.connection()
+        connection.executemany(
+            'INSERT INTO cache (key, value) VALUES (?, ?)',
+            ((f':1:news:thread:{pk}:version', b'') for pk in range(size))
+        )
+        counter = []
+        connection.set_progress_handler(lambda: counter.append(1), 1)
+        shared.set(thread_version_key(size), time.time_ns(), None)
+        shared.get_or_set(thread_version_key(size + 1), time.time_ns, None)
+        return len(counter)
+
+    assert steps(20_000) == steps(10)
+
+
+@pytest.mark.django_db
+def test_home_page_version_shared_between_processes(settings, shared_caches):
+    """Правка в другом процессе сервера сбрасывает здесь кэш главной."""
+    home_key = home_page_key()
+    bump_in_other_process(settings, shared_caches, HOME_PAGE_VERSION)
+    assert home_page_key() != home_key
+
+
+@pytest.mark.django_db
+def test_comments_version_shared_between_processes(
+        settings, shared_caches, comment
+):
+    """Правка комментария в другом процессе видна здесь сразу."""
+    assert comment.text in render_comments(comment.news_id)
+    # update не шлёт сигналов: версию ветки поднимет «другой процесс».
+    Comment.objects.filter(pk=comment.pk).update(text='Исправленный текст')
+    assert comment.text in render_comments(comment.news_id)
+
+    bump_in_other_process(
+        settings, shared_caches, thread_version_key(comment.news_id)
+    )
+
+    assert 'Исправленный текст' in render_comments(comment.news_id)
+
+
+@pytest.mark.django_db
+def test_banned_words_version_shared_between_processes(
+        settings, shared_caches
+):
+    """Слово, добавленное через другой процесс, применяется и здесь."""
+    assert get_matcher().search('Сам бяка') is None
+    # bulk_create не шлёт сигналов: без новой версии матчер прежний.
+    BannedWord.objects.bulk_create([BannedWord(word='бяка')])
+    assert get_matcher().search('Сам бяка') is None
+
+    bump_in_other_process(settings, shared_caches, BANNED_WORDS_VERSION)
+
+    assert get_matcher().search('Сам бяка') == 'бяка'
+
+
+@pytest.mark.parametrize(
+    'name', ('loadtest', 'metrics', 'querylog', 'replicas', 'snapshots')
+)
+def test_shared_modules_match(settings, name):
+    """Общие модули ya_news и ya_note правятся в обоих проектах сразу."""
+    path = settings.BASE_DIR / 'yanews' / f'{name}.py'
+    twin = settings.BASE_DIR.parent / 'ya_note' / 'yanote' / f'{name}.py'
+    assert path.read_text(encoding='utf-8') == twin.read_text(
+        encoding='utf-8'
+    )
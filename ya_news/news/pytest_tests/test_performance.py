@@ -0,0 +1,207 @@
+"""
+Бюджеты SQL-запросов и времени ответа для всех именованных URL.
+
+Страницы открываются на объёме данных, близком к боевому, с пустым
+кэшем, поэтому N+1 или потерянный индекс заметны и по числу запросов,
+и по времени. Данные создаются около минуты и сохраняются в снимок
+(см. yanews.snapshots), следующие прогоны загружают его за секунды.
+Быстрый прогон без этих тестов — pytest -m "not perf". С pytest-xdist
+их запускают отдельно и в одном процессе (как в run_tests.sh): каждый
+процесс держал бы в памяти свою копию снимка.
+"""
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from http import HTTPStatus
+from itertools import accumulate
+from statistics import median
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from news.archive import recount_months
+from news.models import Comment, News
+from news.search import get_search
+from yanews.snapshots import DatabaseSnapshot
+
+pytestmark = [pytest.mark.django_db, pytest.mark.perf]
+
+User = get_user_model()
+NEWS_COUNT = 10_000
+COMMENTS_COUNT = 1_000_000
+AUTHORS_COUNT = 1000
+COMMENT_WORDS = 8
+FIRST_DAY = date(2020, 1, 1)
+VOCABULARY_SIZE = 5000
+SYLLABLES = (
+    'ба', 'ве', 'го', 'ду', 'же', 'за', 'ки', 'ло', 'ма', 'ны',
+    'по', 'ре', 'са', 'ту', 'фе', 'хо', 'цу', 'че', 'ша', 'эр',
+)
+# Слово, которое встречается примерно в одном комментарии из сотни.
+SEARCH_RANK = 50
+REPEATS = 3
+AUTHOR_URLS = ('news:edit', 'news:delete')
+
+# Имя URL: (SQL-запросов не больше, миллисекунд не больше).
+# Время — с запасом в несколько раз к замерам на машине разработчика;
+# оно зависит от загрузки машины, поэтому проверяется только при
+# PERF_CHECK_LATENCY=1, а число запросов — всегда.
+CHECK_LATENCY = os.environ.get('PERF_CHECK_LATENCY') == '1'
+BUDGETS = {
+    'news:home': (1, 30),
+    'news:search': (1, 400),
+    'news:archive': (1, 60),
+    'news:archive_year': (1, 30),
+    'news:archive_month': (2, 80),
+    'news:detail': (2, 80),
+    'news:comments': (1, 60),
+    'news:edit': (1, 30),
+    'news:delete': (1, 30),
+    'users:login': (0, 30),
+    'users:logout': (0, 30),
+    'users:signup': (0, 30),
+}
+
+
+def make_vocabulary(rng):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def build_volume():
+    """
+    10 тысяч новостей за несколько лет и миллион комментариев к ним.
+
+    Комментарии вставляются одним executemany, счётчики, месяцы архива
+    и поисковый индекс пересчитываются после вставки.
+    """
+    rng = random.Random(20)
+    words = make_vocabulary(rng)
+    # Частоты слов по закону Ципфа; все слова выбираются одним вызовом.
+    comment_words = rng.choices(words, cum_weights=list(accumulate(
+        1 / rank for rank in range(1, len(words) + 1)
+    )), k=COMMENT_WORDS * COMMENTS_COUNT)
+    User.objects.bulk_create(
+        User(username=f'perf{index}') for index in range(AUTHORS_COUNT)
+    )
+    authors = list(User.objects.filter(
+        username__startswith='perf'
+    ).order_by('pk').values_list('pk', flat=True))
+    News.objects.bulk_create(
+        News(
+            title=' '.join(rng.choices(words, k=3)),
+            text=' '.join(rng.choices(words, k=60)),
+            date=FIRST_DAY + timedelta(days=index // 7),
+            comments_count=COMMENTS_COUNT // NEWS_COUNT,
+        )
+        for index in range(NEWS_COUNT)
+    )
+    news = list(News.objects.order_by('pk').values_list('pk', flat=True))
+    start = datetime.combine(FIRST_DAY, datetime.min.time())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {Comment._meta.db_table} '
+            '(news_id, author_id, text, created) '
+            'VALUES (%s, %s, %s, %s)',
+            (
+                (
+                    news[index % NEWS_COUNT],
+                    authors[index % AUTHORS_COUNT],
+                    ' '.join(comment_words[
+                        index * COMMENT_WORDS:(index + 1) * COMMENT_WORDS
+                    ]),
+                    str(start + timedelta(seconds=index)),
+                )
+                for index in range(COMMENTS_COUNT)
+            )
+        )
+    recount_months()
+    get_search().rebuild()
+
+
+@pytest.fixture(scope='module')
+def volume(django_db_setup, django_db_blocker):
+    """
+    База с данными build_volume на время тестов модуля.
+
+    Данные берутся из снимка, если он уже есть, и строятся с нуля
+    (около минуты), если нет. После модуля база возвращается
+    к прежнему состоянию.
+    """
+    key = (NEWS_COUNT, COMMENTS_COUNT, AUTHORS_COUNT, COMMENT_WORDS)
+    with django_db_blocker.unblock(), DatabaseSnapshot(
+        'news-volume', key, build_volume
+    ):
+        news = list(News.objects.order_by('pk').values_list('pk', 'date'))
+        comment = Comment.objects.filter(news_id=news[-1][0]).first()
+        yield {
+            'news': news[-1][0],
+            'month': news[NEWS_COUNT // 2][1],
+            'comment': comment.pk,
+            'author': User.objects.get(pk=comment.author_id),
+            'query': make_vocabulary(random.Random(20))[SEARCH_RANK],
+        }
+
+
+def get_url(name, volume):
+    month = volume['month']
+    args = {
+        'news:archive_year': (month.year,),
+        'news:archive_month': (month.year, month.month),
+        'news:detail': (volume['news'],),
+        'news:comments': (volume['news'],),
+        'news:edit': (volume['comment'],),
+        'news:delete': (volume['comment'],),
+    }.get(name, ())
+    url = reverse(name, args=args)
+    if name == 'news:search':
+        url += f'?q={volume["query"]}&comments=1'
+    return url
+
+
+def test_every_url_has_budget():
+    """Новый URL без бюджета не должен проходить незамеченным."""
+    resolver = get_resolver()
+    names = {
+        f'{namespace}:{name}'
+        for namespace in ('news', 'users')
+        for name in resolver.namespace_dict[namespace][1].reverse_dict
+        if isinstance(name, str)
+    }
+    assert names == set(BUDGETS)
+
+
+@pytest.mark.parametrize('name', BUDGETS)
+def test_url_budget(name, volume):
+    max_queries, max_ms = BUDGETS[name]
+    client = Client()
+    if name in AUTHOR_URLS:
+        client.force_login(volume['author'])
+    url = get_url(name, volume)
+    timings = []
+    for _ in range(REPEATS):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == HTTPStatus.OK
+    # Сессия и пользователь — неизбежная цена входа, в бюджет не входят.
+    queries = [
+        query for query in queries.captured_queries
+        if 'django_session' not in query['sql']
+        and 'FROM "auth_user"' not in query['sql']
+    ]
+    assert len(queries) <= max_queries, '\n'.join(
+        query['sql'] for query in queries
+    )
+    if CHECK_LATENCY:
+        assert median(timings) <= max_ms
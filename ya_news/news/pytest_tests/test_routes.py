@@ -3,14 +3,25 @@ from http import HTTPStatus
 import pytest
 
 from pytest_django.asserts import assertRedirects
+from django.conf import settings
+from django.core.cache import cache
 from django.test.client import Client
+from django.urls import reverse
+
+from news.cache import get_version, thread_version_key
 
 
 pytestmark = pytest.mark.django_db
 
 client = Client()
+SEARCH_MAX_PAGES = settings.SEARCH_MAX_PAGES
 NEWS_DETAIL_URL = pytest.lazy_fixture('news_detail')
+NEWS_COMMENTS_URL = pytest.lazy_fixture('news_comments')
 NEWS_HOME_URL = pytest.lazy_fixture('home_url')
+NEWS_SEARCH_URL = pytest.lazy_fixture('search_url')
+ARCHIVE_URL = pytest.lazy_fixture('archive_url')
+ARCHIVE_YEAR_URL = pytest.lazy_fixture('archive_year_url')
+ARCHIVE_MONTH_URL = pytest.lazy_fixture('archive_month_url')
 NEWS_LOGIN_URL = pytest.lazy_fixture('login')
 NEWS_LOGOUT_URL = pytest.lazy_fixture('logout')
 NEWS_SIGNUP_URL = pytest.lazy_fixture('signup')
@@ -30,7 +41,12 @@ REDIRECT_URL_DELETE_COMMENT = (pytest
         (NEWS_LOGOUT_URL, client, HTTPStatus.OK, 'post'),
         (NEWS_SIGNUP_URL, client, HTTPStatus.OK, 'get'),
         (NEWS_DETAIL_URL, client, HTTPStatus.OK, 'get'),
+        (NEWS_COMMENTS_URL, client, HTTPStatus.OK, 'get'),
         (NEWS_HOME_URL, client, HTTPStatus.OK, 'get'),
+        (NEWS_SEARCH_URL, client, HTTPStatus.OK, 'get'),
+        (ARCHIVE_URL, client, HTTPStatus.OK, 'get'),
+        (ARCHIVE_YEAR_URL, client, HTTPStatus.OK, 'get'),
+        (ARCHIVE_MONTH_URL, client, HTTPStatus.OK, 'get'),
         (COMMENT_EDIT_URL, AUTHOR_CLIENT, HTTPStatus.OK, 'get'),
         (COMMENT_DELETE_URL, AUTHOR_CLIENT, HTTPStatus.FOUND, 'post'),
         (COMMENT_EDIT_URL, client, HTTPStatus.FOUND, 'get'),
@@ -56,3 +72,50 @@ def test_redirects(url, user, method, expected_redirect):
     request_method = getattr(user, method)
     response = request_method(url, follow=True)
     assertRedirects(response, expected_redirect)
+
+
+@pytest.mark.parametrize(
+    'url', (NEWS_DETAIL_URL, NEWS_COMMENTS_URL, ARCHIVE_MONTH_URL)
+)
+@pytest.mark.parametrize(
+    'cursor', ('not-a-cursor', f'1-{10 ** 20}', f'{10 ** 20}-1')
+)
+def test_malformed_cursor(url, cursor):
+    response = client.get(url, {'cursor': cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    'page', ('0', '-1', 'abc', '²', '9' * 19, str(SEARCH_MAX_PAGES + 1))
+)
+def test_malformed_search_page(search_url, page):
+    response = client.get(search_url, {'q': 'новость', 'page': page})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_comments_of_missing_news():
+    """Страница комментариев несуществующей новости — 404 без записи в кэш."""
+    pk = 10 ** 6
+    response = client.get(reverse('news:comments', args=[pk]))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    version = get_version(thread_version_key(pk))
+    assert cache.get(f'news:thread:{pk}:{version}:') is None
+
+
+@pytest.mark.parametrize('name, args', (
+    ('archive_year', (1999,)),
+    ('archive_month', (2020, 13)),
+    ('archive_month', (10 ** 20, 1)),
+))
+def test_missing_archive_pages(name, args):
+    response = client.get(reverse(f'news:{name}', args=args))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize('cursor', (
+    'abc', '20201301-1', f'20200101-{10 ** 20}', f'2020010{10 ** 20}-1',
+))
+def test_malformed_archive_cursor(cursor):
+    url = reverse('news:archive_month', args=(2020, 1))
+    response = client.get(url, {'cursor': cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,268 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from django.db import connection
+from django.db.models import DateTimeField, F, IntegerField, Q, Value
+from django.db.models.functions import (
+    Cast, Greatest, Lower, StrIndex, Substr
+)
+from django.utils.html import escape
+
+from .models import Comment, News
+
+NEWS_TABLE = 'news_news_fts'
+COMMENTS_TABLE = 'news_comment_fts'
+# Заголовок новости весомее текста.
+NEWS_RANK = f'bm25({NEWS_TABLE}, 2.0, 1.0)'
+# Границы совпадений, которые SQLite вставляет в сниппет. Это управляющие
+# символы, поэтому сниппет можно экранировать целиком и только потом
+# заменить их на теги.
+MARK_START, MARK_END = '\x02', '\x03'
+ELLIPSIS = '…'
+SNIPPET_TOKENS = 16
+SNIPPET_LENGTH = 160
+HIT_FIELDS = (
+    'hit_news', 'hit_comment', 'hit_title', 'hit_snippet', 'hit_created'
+)
+NEWS_COLUMNS = ('title', 'text')
+COMMENTS_COLUMNS = ('news_id', 'text')
+WORD = re.compile(r'\w+')
+MIN_STEM_LENGTH = 3
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ость', 'ости', 'ует', 'уют', 'ает', 'ают', 'яет', 'яют',
+    'ия', 'ие', 'ий', 'ый', 'ой', 'ая', 'яя', 'ое', 'ее', 'ые', 'ых',
+    'их', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев', 'ей', 'ок', 'ек',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+
+
+class Hit(NamedTuple):
+    """Найденная новость или комментарий к ней."""
+    news_id: int
+    comment_id: Optional[int]
+    title: str
+    snippet: str
+
+
+def get_terms(query):
+    """
+    Слова запроса без окончаний: они ищутся как префиксы, поэтому
+    «новости» находит и «новость», и «новостями».
+    """
+    terms = []
+    for word in WORD.findall(query.lower().replace('ё', 'е')):
+        for ending in ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= (
+                MIN_STEM_LENGTH
+            ):
+                word = word[:-len(ending)]
+                break
+        terms.append(word)
+    return list(dict.fromkeys(terms))
+
+
+def highlight(text):
+    """Экранирует сниппет и превращает метки совпадений в <mark>."""
+    return escape(text).replace(MARK_START, '<mark>').replace(
+        MARK_END, '</mark>'
+    )
+
+
+class FTS5Search:
+    """
+    Поиск по таблицам SQLite FTS5 (см. миграции 0005 и 0007).
+
+    Токенизатор unicode61 не считает ё буквой е с диакритикой, поэтому
+    индекс строится по текстам с заменой ё на е. Исходные тексты лежат
+    в таблицах-источниках *_source: из них SQLite строит сниппеты и
+    подсветку, и в Python попадают только короткие фрагменты с ё на
+    месте. Замена не сдвигает границы слов, так что позиции совпадений
+    в индексе и в исходном тексте одни и те же. Индекс обновляют
+    триггеры источника, поэтому здесь меняется только он.
+    """
+
+    def index_news(self, news):
+        self._replace(NEWS_TABLE, NEWS_COLUMNS, [
+            (item.pk, item.title, item.text) for item in news
+        ])
+
+    def index_comments(self, comments):
+        self._replace(COMMENTS_TABLE, COMMENTS_COLUMNS, [
+            (item.pk, item.news_id, item.text) for item in comments
+        ])
+
+    def remove_news(self, news_ids):
+        self._delete(NEWS_TABLE, news_ids)
+
+    def remove_comments(self, comment_ids):
+        self._delete(COMMENTS_TABLE, comment_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            for table, columns, model in (
+                (NEWS_TABLE, NEWS_COLUMNS, News),
+                (COMMENTS_TABLE, COMMENTS_COLUMNS, Comment),
+            ):
+                names = ', '.join(columns)
+                cursor.execute(f'DELETE FROM {table}_source')
+                # Индекс мог разойтись с источником, его очищают целиком.
+                cursor.execute(
+                    f"INSERT INTO {table} ({table}) VALUES ('delete-all')"
+                )
+                cursor.execute(
+                    f'INSERT INTO {table}_source (id, {names}) '
+                    f'SELECT id, {names} FROM {model._meta.db_table}'
+                )
+
+    def search(self, terms, comments, limit, offset=0):
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        marks = (MARK_START, MARK_END)
+        sql = (
+            f'SELECT rowid, NULL, highlight({NEWS_TABLE}, 0, %s, %s), '
+            f'snippet({NEWS_TABLE}, 1, %s, %s, %s, %s), {NEWS_RANK} AS score '
+            f'FROM {NEWS_TABLE} WHERE {NEWS_TABLE} MATCH %s'
+        )
+        params = [*marks, *marks, ELLIPSIS, SNIPPET_TOKENS, match]
+        if comments:
+            sql += (
+                f' UNION ALL SELECT fts.news_id, fts.rowid, news.title, '
+                f'snippet({COMMENTS_TABLE}, 1, %s, %s, %s, %s), '
+                f'bm25({COMMENTS_TABLE}) FROM {COMMENTS_TABLE} AS fts '
+                f'JOIN {News._meta.db_table} AS news ON news.id = fts.news_id '
+                f'WHERE {COMMENTS_TABLE} MATCH %s'
+            )
+            params += [*marks, ELLIPSIS, SNIPPET_TOKENS, match]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql + ' ORDER BY score LIMIT %s OFFSET %s',
+                params + [limit, offset]
+            )
+            return [
+                Hit(news_id, comment_id, highlight(title), highlight(snippet))
+                for news_id, comment_id, title, snippet, _ in cursor.fetchall()
+            ]
+
+    @staticmethod
+    def _replace(table, columns, rows):
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table}_source (id, {", ".join(columns)}) '
+                f'VALUES (%s{", %s" * len(columns)}) '
+                'ON CONFLICT (id) DO UPDATE SET ' + ', '.join(
+                    f'{column} = excluded.{column}' for column in columns
+                ),
+                rows
+            )
+
+    @staticmethod
+    def _delete(table, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {table}_source WHERE id = %s',
+                [(pk,) for pk in ids]
+            )
+
+
+class LikeSearch:
+    """
+    Поиск подстрок для СУБД без FTS5, новые записи выше.
+
+    Сниппет вырезается функциями СУБД вокруг первого вхождения,
+    полные тексты в Python не читаются.
+    """
+
+    def index_news(self, news):
+        pass
+
+    def index_comments(self, comments):
+        pass
+
+    def remove_news(self, news_ids):
+        pass
+
+    def remove_comments(self, comment_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, terms, comments, limit, offset=0):
+        # Поля разных моделей объединяются под общими именами.
+        queryset = self._filter(
+            News.objects, terms, ('title', 'text')
+        ).annotate(
+            hit_news=F('id'),
+            hit_comment=Value(None, output_field=IntegerField()),
+            hit_title=F('title'),
+            hit_snippet=self._snippet(terms[0]),
+            hit_created=Cast('date', DateTimeField()),
+        ).order_by().values_list(*HIT_FIELDS)
+        if comments:
+            queryset = queryset.union(self._filter(
+                Comment.objects, terms, ('text',)
+            ).annotate(
+                hit_news=F('news_id'),
+                hit_comment=F('id'),
+                hit_title=F('news__title'),
+                hit_snippet=self._snippet(terms[0]),
+                hit_created=F('created'),
+            ).order_by().values_list(*HIT_FIELDS), all=True)
+        pattern = re.compile(
+            '|'.join(re.escape(term) for term in terms), re.IGNORECASE
+        )
+        return [
+            Hit(news_id, comment_id, escape(title), self._mark(
+                pattern, snippet
+            ))
+            for news_id, comment_id, title, snippet, _ in queryset.order_by(
+                '-hit_created'
+            )[offset:offset + limit]
+        ]
+
+    @staticmethod
+    def _filter(queryset, terms, fields):
+        for term in terms:
+            queryset = queryset.filter(Q(*(
+                (f'{field}__icontains', term) for field in fields
+            ), _connector=Q.OR))
+        return queryset
+
+    @staticmethod
+    def _snippet(term):
+        start = Greatest(
+            StrIndex(Lower('text'), Value(term)) - SNIPPET_LENGTH // 2,
+            Value(1),
+        )
+        return Substr('text', start, SNIPPET_LENGTH)
+
+    @staticmethod
+    def _mark(pattern, snippet):
+        return highlight(pattern.sub(
+            lambda match: MARK_START + match.group() + MARK_END, snippet
+        ))
+
+
+@lru_cache(maxsize=None)
+def _has_fts_tables(database_name):
+    return NEWS_TABLE in connection.introspection.table_names()
+
+
+def get_search():
+    """FTS5, если миграция смогла создать таблицы, иначе LIKE."""
+    if connection.vendor == 'sqlite' and _has_fts_tables(
+        connection.settings_dict['NAME']
+    ):
+        return FTS5Search()
+    return LikeSearch()
+
+
+def search(query, comments=False, limit=10, offset=0):
+    """Новости и, если нужно, комментарии по запросу."""
+    terms = get_terms(query)
+    if not terms:
+        return []
+    return get_search().search(terms, comments, limit, offset)
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .archive import ARCHIVE_VERSION, change_month_count, month_start
+from .cache import HOME_PAGE_VERSION, bump_version, thread_version_key
+from .models import BannedWord, Comment, News
+from .moderation import BANNED_WORDS_VERSION
+from .search import get_search
+
+
+@receiver((post_save, post_delete), sender=News)
+@receiver((post_save, post_delete), sender=Comment)
+def invalidate_home_page(**kwargs):
+    """Главная страница показывает новости и число комментариев к ним."""
+    bump_version(HOME_PAGE_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def invalidate_comments_thread(instance, **kwargs):
+    bump_version(thread_version_key(instance.news_id))
+
+
+@receiver((post_save, post_delete), sender=BannedWord)
+def reload_banned_words(**kwargs):
+    bump_version(BANNED_WORDS_VERSION)
+
+
+@receiver(post_save, sender=News)
+def index_news(instance, **kwargs):
+    get_search().index_news([instance])
+
+
+@receiver(post_delete, sender=News)
+def unindex_news(instance, **kwargs):
+    get_search().remove_news([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(instance, **kwargs):
+    get_search().index_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(instance, **kwargs):
+    get_search().remove_comments([instance.pk])
+
+
+@receiver(post_save, sender=News)
+def count_news_month(instance, created, **kwargs):
+    """
+    Переносит новость между счётчиками месяцев. Прежнюю дату News
+    запоминает при загрузке из базы. bulk_create и QuerySet.update
+    сигналов не шлют: после них счётчики пересчитывает
+    manage.py recount_archive.
+    """
+    if 'date' in instance.get_deferred_fields():
+        # Дата не загружалась, а значит, и не менялась.
+        return
+    saved = getattr(instance, '_loaded_date', None)
+    instance._loaded_date = instance.date
+    if not created and saved and month_start(saved) == month_start(
+        instance.date
+    ):
+        return
+    if saved:
+        change_month_count(saved, -1)
+    change_month_count(instance.date, 1)
+    bump_version(ARCHIVE_VERSION)
+
+
+@receiver(post_delete, sender=News)
+def uncount_news_month(instance, **kwargs):
+    change_month_count(instance.date, -1)
+    bump_version(ARCHIVE_VERSION)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(connection, **kwargs):
+    """
+    PRAGMA из настроек для каждого нового соединения с SQLite.
+
+    В ya_news под нагрузкой пишут комментарии: каждый добавляет строку
+    и обновляет счётчик новости, а чтения страниц идут параллельно.
+    WAL и busy_timeout из settings_production позволяют этим записям
+    ждать друг друга, а не падать с «database is locked»; сравнение
+    профилей — в команде load_comments.
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
@@ -1,11 +1,25 @@
+from datetime import date
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.contrib.auth.mixins import AccessMixin, LoginRequiredMixin
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import (
+    Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect
+)
+from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.views import generic
 
+from .archive import get_month_page, get_months
+from .cache import home_page_key
 from .forms import CommentForm
 from .models import Comment, News
+from .fragments import get_comments_html
+from .search import search
+from .write_behind import get_pending, get_queue, remember_pending
 
 
 class NewsList(generic.ListView):
@@ -18,10 +32,107 @@ class NewsList(generic.ListView):
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
+        Количество комментариев берётся из денормализованного
+        поля comments_count, сами комментарии не загружаются.
+        """
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
+
+    def get(self, request, *args, **kwargs):
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        Анонимным пользователям отдаём страницу из кэша.
+
+        Ключ кэша содержит версию, которая меняется при любом
+        изменении новостей и комментариев (см. news.signals).
+        """
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = home_page_key()
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        response.add_post_render_callback(
+            lambda response: cache.set(
+                key, response.content, settings.HOME_PAGE_CACHE_TIMEOUT
+            )
+        )
+        return response
+
+
+class NewsSearch(generic.TemplateView):
+    """
+    Поиск по новостям и, по желанию, по комментариям.
+
+    Сниппеты с подсветкой строит поисковый индекс (см. news.search),
+    тексты новостей целиком не загружаются.
+    """
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        query = self.request.GET.get('q', '').strip()
+        with_comments = bool(self.request.GET.get('comments'))
+        try:
+            page = int(self.request.GET.get('page', '1'))
+        except ValueError:
+            raise Http404('Некорректный номер страницы.')
+        if not 1 <= page <= settings.SEARCH_MAX_PAGES:
+            raise Http404('Некорректный номер страницы.')
+        page_size = settings.SEARCH_PAGE_SIZE
+        hits = search(
+            query, with_comments, page_size + 1, (page - 1) * page_size
+        )
+        next_query = None
+        if len(hits) > page_size:
+            params = self.request.GET.copy()
+            params['page'] = page + 1
+            next_query = params.urlencode()
+        return super().get_context_data(
+            query=query,
+            with_comments=with_comments,
+            hits=hits[:page_size],
+            next_query=next_query,
+            **kwargs
+        )
+
+
+class NewsArchive(generic.TemplateView):
+    """Месяцы, за которые есть новости, — все или за один год."""
+    template_name = 'news/archive.html'
+
+    def get_context_data(self, **kwargs):
+        months = get_months()
+        year = self.kwargs.get('year')
+        if year is not None:
+            months = [item for item in months if item.month.year == year]
+            if not months:
+                raise Http404('За этот год новостей нет.')
+        return super().get_context_data(months=months, **kwargs)
+
+
+class NewsMonthArchive(generic.TemplateView):
+    """
+    Новости за месяц.
+
+    Страницы выбираются keyset-пагинацией по индексу (-date, id),
+    навигация по месяцам берётся из NewsMonthCount.
+    """
+    template_name = 'news/archive_month.html'
+
+    def get_context_data(self, **kwargs):
+        try:
+            month = date(self.kwargs['year'], self.kwargs['month'], 1)
+        except (ValueError, OverflowError):
+            raise Http404('Такого месяца нет.')
+        page, next_cursor = get_month_page(
+            month, self.request.GET.get('cursor')
+        )
+        return super().get_context_data(
+            current_month=month,
+            months=get_months(),
+            object_list=page,
+            next_cursor=next_cursor,
+            **kwargs
+        )
 
 
 class NewsDetail(generic.DetailView):
@@ -29,53 +140,76 @@ class NewsDetail(generic.DetailView):
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
+        obj = get_object_or_404(self.model, pk=self.kwargs['pk'])
         return obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['comment_list'] = get_comments_html(
+            self.object.pk, self.request.user, self.request.GET.get('cursor'),
+            news_checked=True,
+        )
         if self.request.user.is_authenticated:
-            context['form'] = CommentForm()
+            context.setdefault('form', CommentForm())
+            context['pending_comments'] = get_pending(
+                self.request.user, self.object.pk
+            )
         return context
 
 
-class NewsComment(
-        LoginRequiredMixin,
-        generic.detail.SingleObjectMixin,
-        generic.FormView
-):
-    model = News
-    form_class = CommentForm
-    template_name = 'news/detail.html'
+class NewsCommentsPage(generic.View):
+    """Очередная страница комментариев для кнопки «Показать ещё»."""
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(get_comments_html(
+            self.kwargs['pk'], request.user, request.GET.get('cursor')
+        ))
+
+
+class NewsDetailView(AccessMixin, NewsDetail):
+    """
+    Страница новости и отправка комментария к ней.
+
+    GET и POST обрабатывает один экземпляр: новость загружается один
+    раз за запрос, по ней же строится переадресация, а при ошибке
+    в форме страница показывается целиком, вместе с комментариями.
+    """
 
     def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
         self.object = self.get_object()
-        return super().post(request, *args, **kwargs)
+        form = CommentForm(request.POST)
+        if not form.is_valid():
+            return self.render_to_response(
+                self.get_context_data(object=self.object, form=form)
+            )
+        self.save_comment(form)
+        return HttpResponseRedirect(
+            reverse('news:detail', kwargs={'pk': self.object.pk})
+            + '#comments'
+        )
 
-    def form_valid(self, form):
+    def save_comment(self, form):
+        """
+        Сохраняет комментарий сразу или, в режиме отложенной записи,
+        ставит его в очередь (см. news.write_behind).
+        """
+        if settings.COMMENTS_WRITE_BEHIND:
+            entry = get_queue().put(
+                self.object.pk, self.request.user.pk,
+                form.cleaned_data['text']
+            )
+            remember_pending(entry)
+            return
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
-        comment.save()
-        return super().form_valid(form)
-
-    def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
-
-
-class NewsDetailView(generic.View):
-
-    def get(self, request, *args, **kwargs):
-        view = NewsDetail.as_view()
-        return view(request, *args, **kwargs)
-
-    def post(self, request, *args, **kwargs):
-        view = NewsComment.as_view()
-        return view(request, *args, **kwargs)
+        with transaction.atomic():
+            comment.save()
+            News.objects.filter(pk=self.object.pk).update(
+                comments_count=F('comments_count') + 1
+            )
 
 
 class CommentBase(LoginRequiredMixin):
@@ -83,14 +217,20 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
+        """Комментарий уже загружен в self.object, новость не нужна."""
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
-        """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        """
+        Пользователь может работать только со своими комментариями.
+
+        Заголовок новости выводится на страницах правки и удаления.
+        """
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -102,3 +242,75 @@ class CommentUpdate(CommentBase, generic.UpdateView):
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+    def delete(self, request, *args, **kwargs):
+        with transaction.atomic():
+            response = super().delete(request, *args, **kwargs)
+            News.objects.filter(
+                pk=self.object.news_id, comments_count__gt=0
+            ).update(
+                comments_count=F('comments_count') - 1
+            )
+        return response
+
+
+# Асинхронные версии главной и страницы новости для ASGI (см. news.urls).
+# В Django 3.2 ORM синхронный, поэтому все обращения к базе, сессии и кэшу
+# собраны в один вызов sync_to_async на запрос: переход в поток дороже
+# самих запросов. Шаблон рисуется в цикле событий по загруженным данным.
+READ_METHODS = ('GET', 'HEAD')
+post_comment = sync_to_async(NewsDetailView.as_view())
+
+
+@sync_to_async
+def get_news_list_data(request):
+    """Страница из кэша или контекст для её отрисовки."""
+    key = None
+    if not request.user.is_authenticated:
+        key = home_page_key()
+        content = cache.get(key)
+        if content is not None:
+            return key, content, None
+    view = NewsList()
+    view.setup(request)
+    view.object_list = view.get_queryset()
+    # Queryset выполняется здесь и при отрисовке берётся из своего кэша.
+    len(view.object_list)
+    return key, None, view.get_context_data()
+
+
+@sync_to_async
+def get_news_detail_context(request, pk):
+    view = NewsDetail()
+    view.setup(request, pk=pk)
+    view.object = view.get_object()
+    return view.get_context_data(object=view.object)
+
+
+async def news_list(request):
+    """Асинхронная версия NewsList с тем же кэшем для анонимов."""
+    if request.method not in READ_METHODS:
+        return HttpResponseNotAllowed(READ_METHODS)
+    key, content, context = await get_news_list_data(request)
+    if content is not None:
+        return HttpResponse(content)
+    response = render(request, NewsList.template_name, context)
+    if key is not None:
+        await sync_to_async(cache.set)(
+            key, response.content, settings.HOME_PAGE_CACHE_TIMEOUT
+        )
+    return response
+
+
+async def news_detail(request, pk):
+    """
+    Асинхронная версия NewsDetailView.
+
+    Комментарий по-прежнему сохраняет синхронный NewsDetailView в потоке.
+    """
+    if request.method == 'POST':
+        return await post_comment(request, pk=pk)
+    if request.method not in READ_METHODS:
+        return HttpResponseNotAllowed(READ_METHODS + ('POST',))
+    context = await get_news_detail_context(request, pk)
+    return render(request, NewsDetail.template_name, context)
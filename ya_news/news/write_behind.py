@@ -0,0 +1,317 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .cache import HOME_PAGE_VERSION, bump_version, thread_version_key
+from .models import Comment, News
+from .search import get_search
+
+logger = logging.getLogger(__name__)
+# Кэш комментариев, ждущих записи; общий для процессов сервера.
+PENDING_CACHE = 'pending'
+
+
+def save_comments(entries):
+    """
+    Сохраняет пачку комментариев одним bulk_create.
+
+    bulk_create не отправляет сигналы, поэтому счётчики, поисковый
+    индекс и версии кэша обновляются здесь. Комментарии к удалённым
+    новостям и от удалённых пользователей отбрасываются.
+    """
+    news_ids = set(News.objects.filter(
+        pk__in={entry['news_id'] for entry in entries}
+    ).values_list('pk', flat=True))
+    author_ids = set(get_user_model().objects.filter(
+        pk__in={entry['author_id'] for entry in entries}
+    ).values_list('pk', flat=True))
+    entries = [
+        entry for entry in entries
+        if entry['news_id'] in news_ids and entry['author_id'] in author_ids
+    ]
+    if not entries:
+        return 0
+    counts = Counter(entry['news_id'] for entry in entries)
+    with transaction.atomic():
+        last_id = Comment.objects.aggregate(last=Max('id'))['last'] or 0
+        Comment.objects.bulk_create(
+            Comment(
+                news_id=entry['news_id'],
+                author_id=entry['author_id'],
+                text=entry['text'],
+            )
+            for entry in entries
+        )
+        for news_id, count in counts.items():
+            News.objects.filter(pk=news_id).update(
+                comments_count=F('comments_count') + count
+            )
+        # SQLite не возвращает id из bulk_create. Индекс заменяет записи
+        # по rowid, поэтому лишние комментарии, созданные параллельно,
+        # просто переиндексируются.
+        get_search().index_comments(
+            Comment.objects.filter(pk__gt=last_id).only('id', 'news', 'text')
+        )
+    for news_id in counts:
+        bump_version(thread_version_key(news_id))
+    bump_version(HOME_PAGE_VERSION)
+    return len(entries)
+
+
+class CommentQueue:
+    """
+    Очередь комментариев с отложенной записью.
+
+    Комментарий сначала дописывается в журнал процесса (JSON Lines
+    с fsync), затем фоновый поток пачками сохраняет очередь через
+    save_comments. Сохранённые пачки отмечаются в журнале, а пустая
+    очередь его обнуляет.
+
+    Журнал заблокирован flock, пока процесс жив. Журналы без блокировки
+    остались от упавших процессов: их забирает следующая созданная
+    очередь. Комментарий сохраняется хотя бы один раз — при падении
+    между записью пачки и отметкой о ней он будет сохранён повторно.
+    """
+
+    def __init__(self, directory, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.worker = None
+        # flock есть только в Unix; без очереди проект работает и без него.
+        import fcntl
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f'{os.getpid()}-{uuid.uuid4().hex}'
+        self.path = directory / f'{name}.jsonl'
+        # Журнал появляется под своим именем уже заблокированным: иначе
+        # другой процесс успел бы забрать его как брошенный.
+        temporary = directory / f'{name}.tmp'
+        self.journal = open(temporary, 'a', encoding='utf-8')
+        fcntl.flock(self.journal, fcntl.LOCK_EX)
+        os.rename(temporary, self.path)
+        for path in sorted(directory.glob('*.jsonl')):
+            if path != self.path:
+                self.adopt(path)
+
+    def adopt(self, path):
+        """Забирает комментарии из журнала завершившегося процесса."""
+        import fcntl
+
+        try:
+            orphan = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            # Журнал уже забрал другой процесс.
+            return
+        with orphan:
+            try:
+                fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            if os.fstat(orphan.fileno()).st_nlink == 0:
+                # Забран и удалён, пока этот процесс ждал блокировку.
+                return
+            entries = read_journal(orphan)
+            with self.lock:
+                self._write(entries)
+                self.pending.extend(entries)
+            path.unlink(missing_ok=True)
+
+    def put(self, news_id, author_id, text):
+        entry = {
+            'key': uuid.uuid4().hex,
+            'news_id': news_id,
+            'author_id': author_id,
+            'text': text,
+            'queued': timezone.now().isoformat(),
+        }
+        with self.lock:
+            if self.stopped.is_set():
+                raise RuntimeError('Очередь комментариев остановлена.')
+            self._write([entry])
+            self.pending.append(entry)
+            if self.worker is None:
+                self.worker = threading.Thread(
+                    target=self._run, name='comment-queue', daemon=True
+                )
+                self.worker.start()
+            if len(self.pending) >= self.batch_size:
+                self.wakeup.set()
+        return entry
+
+    def flush(self):
+        """Сохраняет всю очередь пачками, возвращает число комментариев."""
+        saved = 0
+        with self.flush_lock:
+            while True:
+                with self.lock:
+                    batch = self.pending[:self.batch_size]
+                if not batch:
+                    return saved
+                saved += save_comments(batch)
+                with self.lock:
+                    # Сохраняет только этот поток, а put дописывает
+                    # в конец, поэтому пачка всё ещё в начале очереди.
+                    del self.pending[:len(batch)]
+                    if self.pending:
+                        self._write([{'ack': [e['key'] for e in batch]}])
+                    else:
+                        self.journal.truncate(0)
+
+    def close(self):
+        """Останавливает поток и сохраняет остаток очереди."""
+        with self.lock:
+            self.stopped.set()
+            self.wakeup.set()
+            worker = self.worker
+        if worker is not None:
+            worker.join()
+        try:
+            self.flush()
+        finally:
+            with self.lock:
+                empty = not self.pending
+                self.journal.close()
+            if empty:
+                self.path.unlink(missing_ok=True)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if self.stopped.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                # Пачка останется в очереди и журнале до следующей попытки.
+                logger.exception('Не удалось сохранить комментарии.')
+
+    def _write(self, records):
+        if not records:
+            return
+        self.journal.write(''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records
+        ))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+
+def read_journal(file):
+    """Комментарии из журнала, ещё не отмеченные как сохранённые."""
+    entries, saved = {}, set()
+    for line in file:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Строка, которую процесс не успел дописать.
+            continue
+        if 'ack' in record:
+            saved.update(record['ack'])
+        else:
+            entries[record['key']] = record
+    return [entry for key, entry in entries.items() if key not in saved]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Очередь текущего процесса; остаток сохраняется при выходе."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = CommentQueue(
+                settings.COMMENTS_QUEUE_DIR,
+                settings.COMMENTS_QUEUE_BATCH_SIZE,
+                settings.COMMENTS_QUEUE_INTERVAL,
+            )
+            atexit.register(close_queue)
+        return _queue
+
+
+def close_queue():
+    global _queue
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is not None:
+        queue.close()
+
+
+def pending_key(user_id, news_id):
+    return f'news:pending:{user_id}:{news_id}'
+
+
+def remember_pending(entry):
+    """
+    Запоминает комментарий автора до сохранения.
+
+    Список хранится в общем кэше PENDING_CACHE, а не в сессии:
+    сохранение сессии — та же запись в базу, от которой очередь
+    избавляет запрос.
+    """
+    pending = caches[PENDING_CACHE]
+    key = pending_key(entry['author_id'], entry['news_id'])
+    pending.set(
+        key, pending.get(key, []) + [entry], settings.COMMENTS_PENDING_TIMEOUT
+    )
+
+
+def get_pending(user, news_id):
+    """
+    Ещё не сохранённые комментарии пользователя к новости.
+
+    Каждому комментарию из очереди сопоставляется свой сохранённый:
+    с тем же текстом и created не раньше постановки в очередь — пачки
+    записываются в порядке очереди. Одинаковые комментарии поэтому
+    не закрывают друг друга. Сопоставленные комментарии забываются.
+    """
+    pending = caches[PENDING_CACHE]
+    key = pending_key(user.pk, news_id)
+    entries = pending.get(key)
+    if not entries:
+        return []
+    saved = defaultdict(list)
+    for text, created in Comment.objects.filter(
+        news_id=news_id,
+        author=user,
+        created__gte=min(
+            datetime.fromisoformat(entry['queued']) for entry in entries
+        ),
+        text__in={entry['text'] for entry in entries},
+    ).order_by('-created', '-id').values_list('text', 'created'):
+        saved[text].append(created)
+    waiting = []
+    for entry in entries:
+        # Списки идут от поздних к ранним: ранние снимаются с конца.
+        times = saved[entry['text']]
+        queued = datetime.fromisoformat(entry['queued'])
+        while times and times[-1] < queued:
+            times.pop()
+        if times:
+            times.pop()
+        else:
+            waiting.append(entry)
+    if len(waiting) != len(entries):
+        pending.set(key, waiting, settings.COMMENTS_PENDING_TIMEOUT)
+    return waiting
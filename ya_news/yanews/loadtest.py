@@ -0,0 +1,201 @@
+"""
+Нагрузочный прогон поверх asyncio без сторонних библиотек.
+
+HttpClient держит одно keep-alive соединение и cookie, как браузер
+одного пользователя. run_load запускает клиентов, каждый выбирает
+действия по весам профиля, и собирает время ответа по действиям.
+
+Модуль одинаков в ya_news и ya_note: общего пакета у проектов нет,
+совпадение копий проверяет test_shared_modules_match в ya_news.
+"""
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from statistics import quantiles
+from urllib.parse import urlencode, urlsplit
+
+CSRF_COOKIE = 'csrftoken'
+
+
+class HttpClient:
+    """Клиент HTTP/1.1 с keep-alive и cookie."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def request(self, method, path, data=None):
+        """Возвращает статус и тело ответа; переадресации не выполняет."""
+        body = urlencode(data).encode() if data is not None else b''
+        headers = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            f'Content-Length: {len(body)}',
+        ]
+        if data is not None:
+            headers.append('Content-Type: application/x-www-form-urlencoded')
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            ))
+        message = ('\r\n'.join(headers) + '\r\n\r\n').encode() + body
+        reused = self.writer is not None
+        if not reused:
+            await self.connect()
+        try:
+            self.writer.write(message)
+            await self.writer.drain()
+            return await self.read_response()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+        # Сервер закрыл простаивавшее соединение: запрос до него не дошёл.
+        await self.connect()
+        self.writer.write(message)
+        await self.writer.drain()
+        return await self.read_response()
+
+    async def login(self, path, username, password):
+        await self.request('GET', path)
+        status, _ = await self.request('POST', path, self.with_csrf({
+            'username': username,
+            'password': password,
+        }))
+        return status == 302
+
+    def with_csrf(self, data):
+        """Данные формы с CSRF-токеном из cookie."""
+        return {'csrfmiddlewaretoken': self.cookies.get(CSRF_COOKIE), **data}
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+    async def read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Сервер закрыл соединение.')
+        version, status = status_line.split()[:2]
+        headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+            else:
+                headers[name] = value
+        if 'content-length' in headers:
+            body = await self.reader.readexactly(
+                int(headers['content-length'])
+            )
+        elif headers.get('transfer-encoding') == 'chunked':
+            body = await self.read_chunked()
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection') == 'close' or version == b'HTTP/1.0':
+            await self.close()
+        return int(status), body
+
+    async def read_chunked(self):
+        chunks = []
+        while size := int((await self.reader.readline()).split(b';')[0], 16):
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+        while await self.reader.readline() not in (b'\r\n', b''):
+            pass
+        return b''.join(chunks)
+
+
+class LoadStats:
+    """Время ответа и ошибки по действиям."""
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.errors = Counter()
+
+    def add(self, action, seconds, ok):
+        self.timings[action].append(seconds * 1000)
+        if not ok:
+            self.errors[action] += 1
+
+    def report(self, elapsed):
+        lines = []
+        everything = []
+        for action, timings in sorted(self.timings.items()):
+            everything += timings
+            lines.append(self.line(action, timings, self.errors[action]))
+        lines.append(self.line('всего', everything, sum(
+            self.errors.values()
+        )))
+        lines.append(f'{len(everything) / elapsed:.0f} запросов/с')
+        return lines
+
+    @staticmethod
+    def line(action, timings, errors):
+        if len(timings) > 1:
+            cuts = quantiles(timings, n=100)
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = timings[0] if timings else 0
+        return (
+            f'{action:<10} запросов {len(timings):>7}, ошибок {errors:>5}, '
+            f'p50 {p50:7.1f} мс, p95 {p95:7.1f} мс, p99 {p99:7.1f} мс'
+        )
+
+
+async def run_load(start_client, clients, duration, seed):
+    """
+    Гоняет клиентов duration секунд и возвращает статистику и время.
+
+    start_client(number, rng) готовит клиента (например, входит
+    на сайт) и возвращает его и профиль: словарь «действие: (вес,
+    корутина от клиента и rng, возвращающая True при успехе)».
+    Подготовка в статистику не входит.
+    """
+    rngs = [
+        random.Random(seed * 100_003 + number) for number in range(clients)
+    ]
+    started = await asyncio.gather(*(
+        start_client(number, rng) for number, rng in enumerate(rngs)
+    ))
+    stats = LoadStats()
+    start = time.monotonic()
+    deadline = start + duration
+
+    async def worker(rng, client, profile):
+        actions = list(profile)
+        weights = [profile[action][0] for action in actions]
+        try:
+            while time.monotonic() < deadline:
+                action = rng.choices(actions, weights)[0]
+                sent = time.perf_counter()
+                try:
+                    ok = await profile[action][1](client, rng)
+                except (OSError, asyncio.IncompleteReadError):
+                    ok = False
+                stats.add(action, time.perf_counter() - sent, ok)
+        finally:
+            await client.close()
+
+    await asyncio.gather(*(
+        worker(rng, *client) for rng, client in zip(rngs, started)
+    ))
+    return stats, time.monotonic() - start
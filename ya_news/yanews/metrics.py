@@ -0,0 +1,297 @@
+"""
+Стоимость запросов по именам URL: SQL, шаблоны, размер ответа.
+
+MetricsMiddleware замеряет долю METRICS_SAMPLE_RATE запросов, добавляет
+к ответу заголовок Server-Timing и копит гистограмму в памяти процесса.
+Её отдаёт metrics_view в текстовом формате Prometheus, а команда
+manage.py metrics сводит в таблицу. При METRICS_SAMPLE_RATE = 0 Django
+не подключает middleware вовсе, и запросы ничего не платят.
+
+Гистограмма своя у каждого процесса. Если сервер запущен несколькими
+рабочими процессами, /metrics/ отвечает тот, кому достался запрос, и
+показывает только его долю трафика. Номер процесса стоит в строке
+«# process» ответа и в выводе manage.py metrics; для полной картины
+сервер замеряют одним процессом или складывают ответы всех процессов.
+
+Модуль одинаков в ya_news и ya_note: общего пакета у проектов нет,
+совпадение копий проверяет test_shared_modules_match в ya_news.
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+# Верхние границы корзин гистограммы времени ответа, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNRESOLVED = 'unresolved'
+# Имя счётчика, поле ViewStats, описание.
+COUNTERS = (
+    ('queries_total', 'queries', 'Число SQL-запросов.'),
+    ('sql_seconds_total', 'sql', 'Время SQL-запросов.'),
+    ('template_seconds_total', 'template', 'Время отрисовки шаблонов.'),
+    ('response_bytes_total', 'size', 'Размер тел ответов.'),
+)
+PREFIX = 'django_view'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SAMPLE_LINE = re.compile(
+    r'^(?P<name>\w+)\{view="(?P<view>[^"]*)"(?:,le="(?P<le>[^"]+)")?\} '
+    r'(?P<value>\S+)$'
+)
+PROCESS_LINE = re.compile(r'^# process (?P<pid>\d+)$', re.MULTILINE)
+
+# Замер текущего запроса; None — запрос не попал в выборку.
+current_sample = ContextVar('metrics_sample', default=None)
+
+
+class Sample:
+    """SQL и шаблоны одного запроса."""
+
+    __slots__ = ('queries', 'sql', 'template')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = self.template = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.sql += time.perf_counter() - start
+
+
+def instrument_connections(**kwargs):
+    """
+    Обёртка ставится на соединения навсегда, замер она находит через
+    contextvar. request_started и под ASGI приходит в тот поток,
+    где представления работают с базой.
+    """
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'duration', 'queries', 'sql',
+                 'template', 'size')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = self.queries = self.size = 0
+        self.duration = self.sql = self.template = 0.0
+
+
+class Registry:
+    """Накопленные замеры по именам URL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+
+    def add(self, view, duration, sample, size):
+        with self.lock:
+            stats = self.views[view]
+            stats.buckets[bisect_left(BUCKETS, duration)] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += sample.queries
+            stats.sql += sample.sql
+            stats.template += sample.template
+            stats.size += size
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def prometheus(self):
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                f'# process {os.getpid()}',
+                f'# HELP {PREFIX}_duration_seconds Время ответа.',
+                f'# TYPE {PREFIX}_duration_seconds histogram',
+            ]
+            for view, stats in views:
+                total = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), stats.buckets):
+                    total += count
+                    lines.append(
+                        f'{PREFIX}_duration_seconds_bucket'
+                        f'{{view="{view}",le="{bound}"}} {total}'
+                    )
+                lines.append(
+                    f'{PREFIX}_duration_seconds_sum{{view="{view}"}} '
+                    f'{stats.duration}'
+                )
+                lines.append(
+                    f'{PREFIX}_duration_seconds_count{{view="{view}"}} '
+                    f'{stats.count}'
+                )
+            for name, field, help_text in COUNTERS:
+                lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+                lines.append(f'# TYPE {PREFIX}_{name} counter')
+                lines.extend(
+                    f'{PREFIX}_{name}{{view="{view}"}} '
+                    f'{getattr(stats, field)}'
+                    for view, stats in views
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def server_timing(sample, duration, size):
+    return (
+        f'sql;dur={sample.sql * 1000:.1f};desc="{sample.queries} queries", '
+        f'tpl;dur={sample.template * 1000:.1f}, '
+        f'size;desc="{size} bytes", '
+        f'total;dur={duration * 1000:.1f}'
+    )
+
+
+class MetricsMiddleware:
+    """
+    Замеряет запрос целиком, поэтому стоит первой в MIDDLEWARE.
+
+    Время шаблонов видно у ответов TemplateResponse: они отрисовываются
+    после process_template_response. Представления, которые рисуют
+    шаблон сами через render, попадают только в общее время.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.rate = settings.METRICS_SAMPLE_RATE
+        if not self.rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        request_started.connect(instrument_connections)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if random.random() >= self.rate:
+            return self.get_response(request)
+        sample = Sample()
+        token = current_sample.set(sample)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    async def __acall__(self, request):
+        if random.random() >= self.rate:
+            return await self.get_response(request)
+        sample = Sample()
+        token = current_sample.set(sample)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    def process_template_response(self, request, response):
+        sample = current_sample.get()
+        if sample is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                sample.template += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def finish(request, response, sample, start):
+        duration = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        size = 0 if response.streaming else len(response.content)
+        response['Server-Timing'] = server_timing(sample, duration, size)
+        registry.add(
+            match.view_name if match else UNRESOLVED, duration, sample, size
+        )
+        return response
+
+
+def metrics_view(request):
+    """Метрики процесса в формате Prometheus; только для INTERNAL_IPS."""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(registry.prometheus(), content_type=CONTENT_TYPE)
+
+
+def quantile(bounds, counts, share):
+    """Верхняя граница корзины, в которую попадает доля share ответов."""
+    needed = share * counts[-1]
+    for bound, total in zip(bounds, counts):
+        if total >= needed:
+            return bound
+    return bounds[-1]
+
+
+def process_id(text):
+    """Номер процесса, который отдал вывод metrics_view."""
+    match = PROCESS_LINE.search(text)
+    return int(match['pid']) if match else None
+
+
+def summarize(text):
+    """
+    Строки таблицы по выводу metrics_view: средние на один запрос,
+    медиана и p95 — с точностью до корзины гистограммы.
+    """
+    buckets = defaultdict(list)
+    values = defaultdict(dict)
+    for line in text.splitlines():
+        match = SAMPLE_LINE.match(line)
+        if not match:
+            continue
+        name = match['name'][len(PREFIX) + 1:]
+        if match['le']:
+            buckets[match['view']].append(
+                (float(match['le']), int(match['value']))
+            )
+        else:
+            values[match['view']][name] = float(match['value'])
+    lines = [
+        f'{"URL":<24}{"запросов":>9}{"p50 мс":>9}{"p95 мс":>9}'
+        f'{"SQL":>6}{"SQL мс":>9}{"шабл. мс":>9}{"КиБ":>8}'
+    ]
+    for view, stats in sorted(
+        values.items(), key=lambda item: -item[1]['duration_seconds_sum']
+    ):
+        count = stats['duration_seconds_count']
+        bounds, counts = zip(*buckets[view])
+        lines.append(
+            f'{view:<24}{count:>9.0f}'
+            f'{quantile(bounds, counts, 0.5) * 1000:>9.0f}'
+            f'{quantile(bounds, counts, 0.95) * 1000:>9.0f}'
+            f'{stats["queries_total"] / count:>6.1f}'
+            f'{stats["sql_seconds_total"] / count * 1000:>9.1f}'
+            f'{stats["template_seconds_total"] / count * 1000:>9.1f}'
+            f'{stats["response_bytes_total"] / count / 1024:>8.1f}'
+        )
+    return lines
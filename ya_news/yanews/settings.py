@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -10,6 +11,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1']
 
+# С этих адресов открывается /metrics/.
+INTERNAL_IPS = ['127.0.0.1']
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -21,7 +25,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanews.metrics.MetricsMiddleware',
+    'yanews.querylog.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yanews.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -47,6 +54,20 @@ TEMPLATES = [
         },
     },
 ]
+# Главная и страница новости на Jinja2 (шаблоны в jinja2/); движок
+# стоит первым, остальные шаблоны он не находит и уступает Django.
+NEWS_JINJA2_TEMPLATES = os.environ.get('NEWS_JINJA2_TEMPLATES') == '1'
+JINJA2_ENGINE = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [BASE_DIR / 'jinja2'],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'yanews.templating.environment',
+        'context_processors': TEMPLATES[0]['OPTIONS']['context_processors'],
+    },
+}
+if NEWS_JINJA2_TEMPLATES:
+    TEMPLATES.insert(0, JINJA2_ENGINE)
 
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
@@ -58,6 +79,63 @@ DATABASES = {
     }
 }
 
+# Реплика только для чтения включается переменной окружения с путём
+# к копии базы; локально копию обновляет manage.py sync_replica.
+REPLICA_DATABASE = None
+if os.environ.get('REPLICA_DB_NAME'):
+    REPLICA_DATABASE = 'replica'
+    DATABASES[REPLICA_DATABASE] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['REPLICA_DB_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['yanews.replicas.PrimaryReplicaRouter']
+# Сколько секунд после изменяющего запроса клиент читает из основной базы.
+REPLICA_PIN_SECONDS = 5
+# PRAGMA для каждого нового соединения с SQLite (см. settings_production).
+SQLITE_PRAGMAS = {}
+# Доля запросов, которые замеряет yanews.metrics.MetricsMiddleware;
+# 0 — middleware отключена.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0))
+# Журнал медленных и повторяющихся SQL-запросов (см. yanews.querylog);
+# None — журнал выключен.
+QUERY_LOG_FILE = os.environ.get('QUERY_LOG_FILE')
+QUERY_LOG_SLOW_MS = 100
+# Столько одинаковых по структуре запросов за HTTP-запрос — вероятный N+1.
+QUERY_LOG_DUPLICATES = 3
+# Снимки тяжёлых тестовых данных (см. yanews.snapshots).
+TEST_SNAPSHOTS_DIR = Path(os.environ.get(
+    'TEST_SNAPSHOTS_DIR', BASE_DIR / '.test_snapshots'
+))
+# Компилировать шаблоны при старте (см. yanews.templating).
+TEMPLATES_WARM_UP = False
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Версии кэша страниц, комментариев и списка запрещённых слов
+    # (см. news.cache). Память LocMemCache у каждого процесса своя,
+    # поэтому версии лежат в общем для процессов сервера файле SQLite
+    # (см. yanews.sqlitecache): правка в одном процессе сбрасывает кэш
+    # во всех.
+    'versions': {
+        'BACKEND': 'yanews.sqlitecache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'VERSIONS_CACHE_FILE', str(BASE_DIR / '.cache' / 'versions.db')
+        ),
+    },
+    # Комментарии из очереди отложенной записи, которые автор видит
+    # до их сохранения (см. news.write_behind), — тоже общие: следующий
+    # запрос автора может попасть в другой процесс.
+    'pending': {
+        'BACKEND': 'yanews.sqlitecache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'PENDING_CACHE_FILE', str(BASE_DIR / '.cache' / 'pending.db')
+        ),
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +158,25 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+HOME_PAGE_CACHE_TIMEOUT = 60 * 5
+# Асинхронные главная и страница новости; yanews.asgi включает их сам.
+NEWS_ASYNC_VIEWS = os.environ.get('NEWS_ASYNC_VIEWS') == '1'
+
+COMMENTS_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 10
+# Глубже выдача не листается: каждая страница заново ранжирует все
+# совпадения, а дальние номера страниц — это перебор, а не чтение.
+SEARCH_MAX_PAGES = 100
+ARCHIVE_PAGE_SIZE = 20
+ARCHIVE_CACHE_TIMEOUT = 60 * 60
+COMMENTS_CACHE_TIMEOUT = 60 * 15
+# Отложенная запись комментариев пачками (см. news.write_behind).
+COMMENTS_WRITE_BEHIND = False
+COMMENTS_QUEUE_DIR = BASE_DIR / 'comment_queue'
+COMMENTS_QUEUE_BATCH_SIZE = 500
+COMMENTS_QUEUE_INTERVAL = 0.5
+COMMENTS_PENDING_TIMEOUT = 60 * 60
+
+# Файл с дополнительными запрещёнными словами, по одному в строке.
+BAD_WORDS_FILE = None
+BAD_WORDS_WHOLE_WORDS = False
@@ -0,0 +1,115 @@
+"""
+Кэш, общий для процессов сервера, в отдельном файле SQLite.
+
+FileBasedCache на каждой записи обходит весь каталог (_cull), поэтому
+с ростом числа ключей — по версии ветки на каждую новость — запись
+дорожает. Здесь ключ — первичный ключ таблицы: запись — один
+INSERT … ON CONFLICT, чтение — поиск по индексу, и их цена от числа
+ключей почти не зависит. Просроченные строки удаляются при записи
+по индексу на expires, целиком таблица не читается никогда.
+
+Файл не связан с базой проекта: запросы к нему не попадают
+в транзакции и счётчики запросов Django.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+# Строка жива, если срок не задан или ещё не наступил.
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    """Кэш Django в таблице SQLite; LOCATION — путь к файлу."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = Path(location)
+        self.local = threading.local()
+
+    def connection(self):
+        """Своё соединение у каждого потока и у каждого процесса."""
+        pid, connection = getattr(self.local, 'connection', (None, None))
+        if pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self.local.connection = os.getpid(), connection
+        return connection
+
+    def get(self, key, default=None, version=None):
+        row = self.connection().execute(
+            f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+            (self._key(key, version), time.time())
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        connection = self.connection()
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,)
+        )
+        connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires',
+            self._row(key, value, timeout, version)
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает значение, только если ключа нет или он просрочен."""
+        cursor = self.connection().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            f'expires = excluded.expires WHERE NOT {ALIVE}',
+            self._row(key, value, timeout, version) + (time.time(),)
+        )
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection().execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version), time.time(),
+            )
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        cursor = self.connection().execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+        return cursor.rowcount > 0
+
+    def clear(self):
+        self.connection().execute('DELETE FROM cache')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key, value, timeout, version):
+        return (
+            self._key(key, version),
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self.get_backend_timeout(timeout),
+        )
@@ -0,0 +1,47 @@
+import csv
+import json
+from itertools import islice
+
+FIELDS = ('title', 'text', 'slug', 'author')
+FORMATS = ('jsonl', 'csv')
+
+
+def guess_format(path):
+    return 'csv' if str(path).lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(file, file_format):
+    """
+    Построчно читает заметки, не загружая файл в память целиком.
+
+    Вместо строки JSON Lines, которую не удалось разобрать, отдаётся
+    ошибка разбора: одна битая запись не прерывает импорт.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield error
+
+
+def get_writer(file, file_format):
+    """Возвращает функцию, которая дописывает в файл одну заметку."""
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        return writer.writerow
+
+    def write(row):
+        file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    return write
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
@@ -0,0 +1,133 @@
+import random
+import statistics
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from notes.models import Note, SearchTerm
+from notes.search import TermIndex, get_index, search_notes
+from ._formats import batched
+
+User = get_user_model()
+BENCH_USERNAME = 'bench_search'
+CYRILLIC_SYLLABLES = (
+    'ка', 'ро', 'ми', 'на', 'те', 'до', 'лу', 'ве', 'за', 'пи', 'сто', 'гра',
+)
+CYRILLIC_ENDINGS = ('', 'а', 'ы', 'ов', 'ами', 'ого')
+LATIN_SYLLABLES = (
+    'ba', 'ro', 'mi', 'na', 'te', 'do', 'lu', 've', 'za', 'pi', 'sto', 'gra',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу заметками тестового пользователя, замеряет '
+        'время поиска (p50/p95) и удаляет созданные данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.words = self.make_vocabulary(rng, options['vocabulary'])
+        # Частоты слов в текстах убывают по закону Ципфа.
+        self.cum_weights = list(accumulate(
+            1 / rank for rank in range(1, len(self.words) + 1)
+        ))
+        User.objects.bulk_create(
+            User(username=f'{BENCH_USERNAME}{number}')
+            for number in range(options['authors'])
+        )
+        users = User.objects.filter(username__startswith=BENCH_USERNAME)
+        author_ids = list(users.values_list('id', flat=True))
+        try:
+            start = time.perf_counter()
+            self.seed(
+                author_ids, rng, options['notes'], options['batch_size']
+            )
+            self.stdout.write(
+                f'{options["notes"]} заметок проиндексировано '
+                f'({type(get_index()).__name__}) за '
+                f'{time.perf_counter() - start:.1f} с'
+            )
+            self.measure(author_ids, rng, options['queries'])
+        finally:
+            self.cleanup(users)
+
+    def make_vocabulary(self, rng, size):
+        words = set()
+        while len(words) < size:
+            if rng.random() < 0.7:
+                words.add(''.join(
+                    rng.choices(CYRILLIC_SYLLABLES, k=rng.randint(2, 4))
+                ) + rng.choice(CYRILLIC_ENDINGS))
+            else:
+                words.add(''.join(
+                    rng.choices(LATIN_SYLLABLES, k=rng.randint(2, 4))
+                ))
+        words = sorted(words)
+        rng.shuffle(words)
+        return words
+
+    def text(self, rng, length):
+        return ' '.join(rng.choices(
+            self.words, cum_weights=self.cum_weights, k=length
+        ))
+
+    def seed(self, author_ids, rng, count, batch_size):
+        for batch in batched(range(count), batch_size):
+            notes = [
+                Note(
+                    title=self.text(rng, 4),
+                    text=self.text(rng, 40),
+                    slug=f'{BENCH_USERNAME}-{number}',
+                    author_id=rng.choice(author_ids),
+                )
+                for number in batch
+            ]
+            with transaction.atomic():
+                Note.objects.bulk_create(notes)
+                get_index().add(
+                    Note.objects.filter(slug__in=[n.slug for n in notes])
+                )
+
+    def measure(self, author_ids, rng, count):
+        timings = []
+        for _ in range(count):
+            query = self.text(rng, rng.randint(1, 2))
+            start = time.perf_counter()
+            search_notes(rng.choice(author_ids), query, limit=50)
+            timings.append((time.perf_counter() - start) * 1000)
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(self.style.SUCCESS(
+            f'Поиск: p50 {percentiles[49]:.1f} мс, '
+            f'p95 {percentiles[94]:.1f} мс, max {max(timings):.1f} мс'
+        ))
+
+    def cleanup(self, users):
+        """Удаление без сигналов и каскада Django — иначе оно дольше."""
+        notes = Note.objects.filter(author__in=users)
+        with transaction.atomic():
+            if isinstance(get_index(), TermIndex):
+                SearchTerm.objects.filter(note__in=notes).delete()
+            else:
+                get_index().remove(
+                    notes.values_list('id', flat=True).iterator()
+                )
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {Note._meta.db_table} WHERE author_id IN '
+                    f'(SELECT id FROM {User._meta.db_table} '
+                    'WHERE username LIKE %s)',
+                    (BENCH_USERNAME + '%',)
+                )
+            users.delete()
@@ -0,0 +1,60 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from pytils.translit import slugify
+
+from notes.slugs import _make_slug, make_slug
+
+CYRILLIC_WORDS = (
+    'заметка', 'подробности', 'список', 'покупок', 'встреча', 'идеи',
+    'проект', 'отчёт', 'планы', 'неделю', 'рецепт', 'борща',
+)
+ASCII_WORDS = (
+    'note', 'todo', 'meeting', 'ideas', 'project', 'report', 'plans',
+    'recipe', 'shopping', 'list', 'weekly', 'review',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает pytils.translit.slugify и notes.slugs.make_slug '
+        'на заголовках, часть которых повторяется, как при импорте.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=100000)
+        parser.add_argument('--unique', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        unique = [
+            ' '.join(rng.choices(
+                rng.choice((CYRILLIC_WORDS, ASCII_WORDS)), k=3
+            )) + f' {index}'
+            for index in range(options['unique'])
+        ]
+        titles = rng.choices(unique, k=options['titles'])
+        ascii_titles = [title for title in unique if title.isascii()]
+
+        def run(function, sample):
+            _make_slug.cache_clear()
+            seconds = timeit.timeit(
+                lambda: [function(title) for title in sample], number=1
+            )
+            return seconds / len(sample) * 1e6
+
+        rows = (
+            ('повторы', titles),
+            ('уникальные', unique),
+            ('уникальные ASCII', ascii_titles),
+        )
+        self.stdout.write(
+            f'{"заголовки":<18} {"pytils, мкс":>12} {"make_slug, мкс":>15}'
+        )
+        for name, sample in rows:
+            self.stdout.write(
+                f'{name:<18} {run(slugify, sample):>12.2f} '
+                f'{run(make_slug, sample):>15.2f}'
+            )
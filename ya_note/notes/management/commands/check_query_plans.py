@@ -0,0 +1,69 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+from notes.views import NoteDetail, NotesList
+
+# Признаки полного просмотра таблицы и сортировки без индекса.
+BAD_PLAN_PATTERNS = {
+    'sqlite': (
+        re.compile(r'\bSCAN (TABLE )?\w+$', re.MULTILINE),
+        re.compile(r'TEMP B-TREE'),
+    ),
+    'postgresql': (
+        re.compile(r'Seq Scan'),
+        re.compile(r'\bSort\b'),
+    ),
+}
+
+
+def get_view_queries():
+    """Запросы, которые выполняют вьюхи приложения, по именам URL."""
+    user = get_user_model()(pk=1)
+    request = RequestFactory().get('/')
+    request.user = user
+    next_page_request = RequestFactory().get('/', {'cursor': 1})
+    next_page_request.user = user
+    list_view = NotesList()
+    list_view.setup(request)
+    next_page_view = NotesList()
+    next_page_view.setup(next_page_request)
+    detail_view = NoteDetail()
+    detail_view.setup(request, slug='slug')
+    return {
+        'notes:list': list_view.get_queryset()[:1],
+        'notes:list?cursor': next_page_view.get_queryset()[:1],
+        'notes:detail': detail_view.get_queryset().filter(slug='slug'),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запросов вьюх и завершается ошибкой, '
+        'если какой-то из них читает всю таблицу или сортирует без индекса.'
+    )
+
+    def handle(self, *args, **options):
+        patterns = BAD_PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(
+                f'Планы запросов для {connection.vendor} не поддерживаются.'
+            )
+        failed = []
+        for name, queryset in get_view_queries().items():
+            plan = queryset.explain()
+            if any(pattern.search(plan) for pattern in patterns):
+                failed.append(name)
+                self.stderr.write(f'{name}:\n{plan}')
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'{name}:\n{plan}')
+        if failed:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(failed)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Все запросы используют индексы.')
+        )
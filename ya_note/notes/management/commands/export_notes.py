@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+from ._formats import FIELDS, FORMATS, get_writer, guess_format
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заметки в файл JSON Lines или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--author', help='Выгрузить только его заметки.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        notes = Note.objects.order_by('id').values_list(
+            'title', 'text', 'slug', 'author__username'
+        )
+        if options['author']:
+            notes = notes.filter(author__username=options['author'])
+        file_format = options['format'] or guess_format(options['path'])
+        total = 0
+        start = time.perf_counter()
+        with open(options['path'], 'w', newline='', encoding='utf-8') as file:
+            write = get_writer(file, file_format)
+            for note in notes.iterator(chunk_size=options['chunk_size']):
+                write(dict(zip(FIELDS, note)))
+                total += 1
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено заметок: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
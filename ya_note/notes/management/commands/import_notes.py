@@ -0,0 +1,156 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from notes.models import SLUG_ATTEMPTS, Note
+from notes.search import get_index
+from notes.slugs import allocate_slugs, make_slug
+from ._formats import FIELDS, FORMATS, batched, guess_format, read_rows
+
+User = get_user_model()
+DEFAULT_TITLE = Note._meta.get_field('title').default
+# Поля, которые проверяются валидаторами модели: формат slug и длина.
+CHECKED_FIELDS = ('title', 'slug')
+# Сколько slug искать одним запросом: SQLite старше 3.32 принимает
+# не больше 999 параметров.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def row_errors(row):
+    """Ошибки записи: разбор, типы полей и валидаторы модели."""
+    if isinstance(row, json.JSONDecodeError):
+        return [f'некорректный JSON: {row}']
+    if not isinstance(row, dict):
+        return ['запись должна быть объектом JSON']
+    errors = [
+        f'{name}: ожидается строка' for name in FIELDS
+        if row.get(name) is not None and not isinstance(row[name], str)
+    ]
+    for name in CHECKED_FIELDS:
+        value = row.get(name)
+        if not value or not isinstance(value, str):
+            continue
+        try:
+            Note._meta.get_field(name).run_validators(value)
+        except ValidationError as error:
+            errors.extend(f'{name}: {message}' for message in error.messages)
+    return errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает заметки из файла JSON Lines или CSV с полями title, '
+        'text, slug и author (имя пользователя). Пустой или занятый slug '
+        'подбирается автоматически. Битые записи, поля не строкового '
+        'типа, недопустимый slug и слишком длинный заголовок '
+        'пропускаются и перечисляются по номерам записей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument(
+            '--author', help='Автор для строк, где поле author не заполнено.'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.authors = {}
+        self.default_author_id = None
+        self.rejected = 0
+        if options['author']:
+            self.default_author_id = self.get_author_ids(
+                {options['author']}
+            )[options['author']]
+        file_format = options['format'] or guess_format(options['path'])
+        total = 0
+        start = time.perf_counter()
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            rows = enumerate(read_rows(file, file_format), start=1)
+            for batch in batched(rows, options['batch_size']):
+                total += self.import_batch(self.valid_rows(batch))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано заметок: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
+        if self.rejected:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено строк с ошибками: {self.rejected}'
+            ))
+
+    def valid_rows(self, numbered_rows):
+        """Строки, которые можно импортировать; ошибки — в stderr."""
+        rows = []
+        for number, row in numbered_rows:
+            errors = row_errors(row)
+            if errors:
+                self.rejected += 1
+                self.stderr.write(
+                    f'Запись {number} пропущена: ' + '; '.join(errors)
+                )
+            else:
+                rows.append(row)
+        return rows
+
+    def get_author_ids(self, usernames):
+        """Пользователи, ещё не встречавшиеся в файле, читаются пачкой."""
+        missing = usernames - self.authors.keys()
+        if missing:
+            self.authors.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+        unknown = missing - self.authors.keys()
+        if unknown:
+            raise CommandError(
+                'Нет пользователей: ' + ', '.join(sorted(unknown))
+            )
+        return self.authors
+
+    def import_batch(self, rows):
+        if not rows:
+            return 0
+        author_ids = self.get_author_ids(
+            {row['author'] for row in rows if row.get('author')}
+        )
+        notes = []
+        for row in rows:
+            author_id = (
+                author_ids[row['author']] if row.get('author')
+                else self.default_author_id
+            )
+            if author_id is None:
+                raise CommandError(
+                    f'У заметки «{row.get("title")}» не указан автор, '
+                    'задайте --author.'
+                )
+            notes.append(Note(
+                title=row.get('title') or DEFAULT_TITLE,
+                text=row.get('text') or '',
+                author_id=author_id,
+            ))
+        bases = [
+            row.get('slug') or make_slug(note.title)
+            for row, note in zip(rows, notes)
+        ]
+        max_length = Note._meta.get_field('slug').max_length
+        for attempt in range(SLUG_ATTEMPTS):
+            slugs = allocate_slugs(bases, Note.objects.all(), max_length)
+            for note, slug in zip(notes, slugs):
+                note.slug = slug
+            try:
+                with transaction.atomic():
+                    Note.objects.bulk_create(notes)
+                    # bulk_create не шлёт post_save и не везде
+                    # возвращает id, поэтому индексируем пачку сами.
+                    for chunk in batched(slugs, LOOKUP_CHUNK_SIZE):
+                        get_index().add(Note.objects.filter(slug__in=chunk))
+                return len(notes)
+            except IntegrityError:
+                # Slug успели занять параллельно — подбираем заново.
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
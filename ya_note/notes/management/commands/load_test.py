@@ -0,0 +1,129 @@
+import asyncio
+import random
+from http import HTTPStatus
+from itertools import accumulate
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+
+from notes.models import Note
+from yanote.loadtest import HttpClient, run_load
+
+User = get_user_model()
+# Действие: вес.
+PROFILE = {'list': 30, 'detail': 35, 'search': 15, 'add': 10, 'edit': 10}
+# Сколько заметок клиента брать в выборку для чтения и правки.
+SAMPLE_NOTES = 1000
+SAMPLE_USERS = 10_000
+
+
+class Traffic:
+    """Действия одного пользователя над своими заметками."""
+
+    def __init__(self, notes):
+        self.notes = notes
+
+    def profile(self):
+        return {
+            action: (weight, getattr(self, action))
+            for action, weight in PROFILE.items()
+        }
+
+    @staticmethod
+    async def get(client, url):
+        status, _ = await client.request('GET', url)
+        return status == HTTPStatus.OK
+
+    @staticmethod
+    async def post(client, url, data):
+        status, _ = await client.request('POST', url, client.with_csrf(data))
+        return status == HTTPStatus.FOUND
+
+    async def list(self, client, rng):
+        return await self.get(client, reverse('notes:list'))
+
+    async def detail(self, client, rng):
+        slug, _ = rng.choice(self.notes)
+        return await self.get(client, reverse('notes:detail', args=(slug,)))
+
+    async def search(self, client, rng):
+        _, title = rng.choice(self.notes)
+        return await self.get(client, reverse('notes:search') + '?' + (
+            urlencode({'q': rng.choice(title.split())})
+        ))
+
+    async def add(self, client, rng):
+        return await self.post(client, reverse('notes:add'), {
+            'title': f'Нагрузка {rng.random()}',
+            'text': 'Текст заметки',
+            'slug': '',
+        })
+
+    async def edit(self, client, rng):
+        slug, title = rng.choice(self.notes)
+        return await self.post(
+            client, reverse('notes:edit', args=(slug,)),
+            {'title': title, 'text': f'Правка {rng.random()}', 'slug': slug}
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер YaNote: каждый клиент входит '
+        'под пользователем из команды seed (чем больше у него заметок, '
+        'тем вероятнее) и читает, ищет, создаёт и правит свои заметки. '
+        'Выводит p50/p95/p99 по действиям.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default='seed-password')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(
+            username__startswith=options['prefix']
+        ).annotate(notes=Count('note')).filter(notes__gt=0).order_by(
+            '-notes'
+        ).values_list('pk', 'username', 'notes')[:SAMPLE_USERS])
+        if not users:
+            raise CommandError('Сначала наполните базу командой seed.')
+        # Пользователи клиентов и их заметки выбираются заранее: внутри
+        # цикла событий синхронный ORM недоступен.
+        rng = random.Random(options['seed'])
+        weights = list(accumulate(notes for *_, notes in users))
+        clients = []
+        for user_id, username, _ in rng.choices(
+            users, cum_weights=weights, k=options['clients']
+        ):
+            clients.append((username, Traffic(list(
+                Note.objects.filter(author_id=user_id).order_by(
+                    'id'
+                ).values_list('slug', 'title')[:SAMPLE_NOTES]
+            ))))
+        login_url = reverse('users:login')
+
+        async def start_client(number, rng):
+            username, traffic = clients[number]
+            client = HttpClient(options['url'])
+            if not await client.login(
+                login_url, username, options['password']
+            ):
+                raise CommandError(
+                    'Не удалось войти: проверьте --prefix и --password.'
+                )
+            return client, traffic.profile()
+
+        stats, elapsed = asyncio.run(run_load(
+            start_client, options['clients'], options['duration'],
+            options['seed']
+        ))
+        self.stdout.write(f'{options["clients"]} клиентов, {elapsed:.0f} с')
+        for line in stats.report(elapsed):
+            self.stdout.write(line)
@@ -0,0 +1,34 @@
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yanote.metrics import process_id, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка метрик запущенного сервера по именам URL: число замеров, '
+        'p50/p95 времени ответа, SQL-запросы и их время, время шаблонов '
+        'и размер ответа. Сервер собирает метрики, если задан '
+        'METRICS_SAMPLE_RATE больше нуля. Метрики копит каждый рабочий '
+        'процесс сервера отдельно, и сводка относится к одному из них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000/metrics/'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with urlopen(options['url']) as response:
+                text = response.read().decode()
+        except URLError as error:
+            raise CommandError(f'Не удалось получить метрики: {error}')
+        self.stdout.write(
+            f'Процесс {process_id(text)}: у других рабочих процессов '
+            'сервера свои метрики, в сводку они не входят.'
+        )
+        for line in summarize(text):
+            self.stdout.write(line)
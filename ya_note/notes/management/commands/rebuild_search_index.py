@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notes.models import Note
+from notes.search import get_index
+from ._formats import batched
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает поисковый индекс заметок целиком. Нужен после '
+        'миграции 0003 для уже существующих заметок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        index = get_index()
+        notes = Note.objects.only(
+            'id', 'title', 'text', 'author_id'
+        ).iterator(chunk_size=options['batch_size'])
+        total = 0
+        with transaction.atomic():
+            index.clear()
+            for batch in batched(notes, options['batch_size']):
+                index.add(batch)
+                total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано заметок: {total} ({type(index).__name__})'
+        ))
@@ -0,0 +1,108 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from notes.models import Note
+from notes.search import get_index
+from ._formats import batched
+
+User = get_user_model()
+SYLLABLES = (
+    'ка', 'ро', 'ми', 'на', 'те', 'до', 'лу', 'ве', 'за', 'пи', 'сто', 'гра',
+)
+VOCABULARY_SIZE = 20000
+
+
+def zipf_cum_weights(size):
+    """Накопленные веса закона Ципфа: k-й по популярности — в k раз реже."""
+    return list(accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу пользователями и заметками. Данные зависят '
+        'только от --seed. Заметки распределены между авторами по закону '
+        'Ципфа: у немногих пользователей тысячи заметок, у большинства — '
+        'единицы. Заметки вставляются и индексируются пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--notes', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Начало имён пользователей и slug заметок.'
+        )
+        parser.add_argument(
+            '--password', default='seed-password',
+            help='Пароль всех создаваемых пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с именами на «{prefix}» уже есть, '
+                'укажите другой --prefix.'
+            )
+        rng = random.Random(options['seed'])
+        words = set()
+        while len(words) < VOCABULARY_SIZE:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        self.words = sorted(words)
+        self.word_weights = zipf_cum_weights(len(self.words))
+        start = time.perf_counter()
+        user_ids = self.seed_users(rng, options, prefix)
+        self.seed_notes(rng, options, prefix, user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, заметок: '
+            f'{options["notes"]} за {time.perf_counter() - start:.0f} с'
+        ))
+
+    def text(self, rng, length):
+        return ' '.join(rng.choices(
+            self.words, cum_weights=self.word_weights, k=length
+        ))
+
+    def seed_users(self, rng, options, prefix):
+        """Хэш пароля считается один раз: он медленный намеренно."""
+        password = make_password(options['password'])
+        for batch in batched(range(options['users']), options['batch_size']):
+            User.objects.bulk_create(
+                User(username=f'{prefix}{number}', password=password)
+                for number in batch
+            )
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+        # Самые активные пользователи — случайные, а не первые по id.
+        rng.shuffle(user_ids)
+        return user_ids
+
+    def seed_notes(self, rng, options, prefix, user_ids):
+        user_weights = zipf_cum_weights(len(user_ids))
+        for batch in batched(range(options['notes']), options['batch_size']):
+            authors = rng.choices(
+                user_ids, cum_weights=user_weights, k=len(batch)
+            )
+            notes = [
+                Note(
+                    title=self.text(rng, rng.randint(2, 6)),
+                    text=self.text(rng, rng.randint(10, 120)),
+                    slug=f'{prefix}-{number}',
+                    author_id=author_id,
+                )
+                for number, author_id in zip(batch, authors)
+            ]
+            with transaction.atomic():
+                Note.objects.bulk_create(notes)
+                get_index().add(
+                    Note.objects.filter(slug__in=[n.slug for n in notes])
+                )
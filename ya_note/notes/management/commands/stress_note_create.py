@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from notes.models import Note
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт заметки с одинаковым заголовком из нескольких потоков '
+        'через NoteCreate и проверяет, что все slug получились разными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--notes', type=int, default=200)
+        parser.add_argument('--title', default='Подробности')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='stress_note_create')
+        url = reverse('notes:add')
+
+        def create(index):
+            client = Client()
+            client.force_login(user)
+            try:
+                return client.post(url, data={
+                    'title': options['title'], 'text': f'Заметка {index}'
+                }).status_code
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as pool:
+            statuses = list(pool.map(create, range(options['notes'])))
+        elapsed = time.perf_counter() - start
+
+        slugs = list(
+            Note.objects.filter(author=user).values_list('slug', flat=True)
+        )
+        Note.objects.filter(author=user).delete()
+        user.delete()
+
+        failed = sum(status != HTTPStatus.FOUND for status in statuses)
+        self.stdout.write(
+            f'Заметок: {len(slugs)}, уникальных slug: {len(set(slugs))}, '
+            f'ошибок: {failed}, {len(statuses) / elapsed:.0f} запросов/с'
+        )
+        duplicates = len(slugs) - len(set(slugs))
+        if failed or duplicates or len(slugs) != len(statuses):
+            raise CommandError('Параллельное создание заметок не удалось.')
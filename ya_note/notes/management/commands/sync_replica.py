@@ -0,0 +1,46 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплику через backup API. '
+        'Заменяет настоящую репликацию при локальной проверке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование через столько секунд.'
+        )
+
+    def handle(self, *args, **options):
+        replica = settings.REPLICA_DATABASE
+        if not replica:
+            raise CommandError(
+                'Реплика не настроена: задайте REPLICA_DB_NAME.'
+            )
+        aliases = (DEFAULT_DB_ALIAS, replica)
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError('Копирование поддерживается только для SQLite.')
+        source, target = (
+            connections[alias].settings_dict['NAME'] for alias in aliases
+        )
+        while True:
+            start = time.perf_counter()
+            with closing(sqlite3.connect(source)) as primary, closing(
+                sqlite3.connect(target)
+            ) as copy:
+                primary.backup(copy)
+            self.stdout.write(
+                f'Реплика обновлена за '
+                f'{(time.perf_counter() - start) * 1000:.0f} мс'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
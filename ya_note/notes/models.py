@@ -1,7 +1,10 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
-from pytils.translit import slugify
+from .slugs import allocate_slug, make_slug
+
+# Сколько раз подбирать slug заново, если его занял параллельный запрос.
+SLUG_ATTEMPTS = 10
 
 
 class Note(models.Model):
@@ -28,11 +31,52 @@ class Note(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
+        """
+        Если slug не задан, подбирает свободный по заголовку.
+
+        Запись идёт в отдельной точке сохранения: нарушение уникальности
+        slug не ломает внешнюю транзакцию, и подбор можно повторить.
+        """
+        allocate = not self.slug
+        if allocate:
+            base = make_slug(self.title)
             max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+            others = Note.objects.exclude(pk=self.pk)
+        for attempt in range(SLUG_ATTEMPTS):
+            if allocate:
+                self.slug = allocate_slug(
+                    base, others, max_slug_length, spread=2 ** attempt
+                )
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if not allocate or attempt == SLUG_ATTEMPTS - 1:
+                    raise
+
+
+class SearchTerm(models.Model):
+    """Терм обратного индекса, если FTS5 в базе недоступен."""
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    term = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('term', 'note'), name='searchterm_term_note_idx'
+            ),
+        )
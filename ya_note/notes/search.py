@@ -0,0 +1,187 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import OuterRef, Q, Subquery, Sum
+from pytils.translit import translify
+
+from .models import Note, SearchTerm
+
+FTS_TABLE = 'notes_note_fts'
+# Поиск по заголовку важнее, чем по тексту.
+FTS_RANK = f'bm25({FTS_TABLE}, 2.0, 1.0)'
+TERM_MAX_LENGTH = SearchTerm._meta.get_field('term').max_length
+WORD = re.compile(r'\w+')
+NON_LATIN = re.compile(r'[^a-z0-9]')
+MIN_STEM_LENGTH = 3
+TERM_CACHE_SIZE = 65536
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ость', 'ости', 'ует', 'уют', 'ает', 'ают', 'яет', 'яют',
+    'ия', 'ие', 'ий', 'ый', 'ой', 'ая', 'яя', 'ое', 'ее', 'ые', 'ых',
+    'их', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев', 'ей', 'ок', 'ек',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+LATIN_ENDINGS = sorted(
+    {translify(ending, strict=False) for ending in ENDINGS} - {"'"},
+    key=len, reverse=True,
+)
+
+
+def stem(word, endings):
+    """Отбрасывает окончание, если от слова остаётся достаточно."""
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= (
+            MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def get_term(word):
+    """Терм для одного слова; словарь текстов невелик, поэтому кэшируем."""
+    if word.isascii():
+        word = stem(word, LATIN_ENDINGS)
+    else:
+        word = translify(stem(word, ENDINGS), strict=False)
+    return NON_LATIN.sub('', word)[:TERM_MAX_LENGTH]
+
+
+def get_terms(text):
+    """
+    Превращает текст в поисковые термы.
+
+    Слова приводятся к нижнему регистру, ё заменяется на е, окончания
+    отбрасываются, а кириллица транслитерируется — поэтому «Заметки»,
+    «заметок» и «zametki» дают один и тот же терм.
+    """
+    terms = []
+    for word in WORD.findall(text.lower().replace('ё', 'е')):
+        term = get_term(word)
+        if term:
+            terms.append(term)
+    return terms
+
+
+class FTS5Index:
+    """
+    Индекс в виртуальной таблице SQLite FTS5 (см. миграцию 0003).
+
+    Каждый терм хранится с префиксом id автора: списки документов
+    у каждого пользователя свои, и частое слово не заставляет FTS5
+    перебирать заметки всех пользователей.
+    """
+
+    def add(self, notes):
+        rows = [
+            (
+                note.pk,
+                self.scope(note.author_id, get_terms(note.title)),
+                self.scope(note.author_id, get_terms(note.text)),
+            )
+            for note in notes
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body) '
+                'VALUES (%s, %s, %s)',
+                rows
+            )
+
+    @staticmethod
+    def scope(author_id, terms):
+        return ' '.join(f'{author_id}x{term}' for term in terms)
+
+    def remove(self, note_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(note_id,) for note_id in note_ids]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, author_id, terms, limit, offset=0):
+        query = ' AND '.join(
+            f'"{term}"*' for term in self.scope(author_id, terms).split()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s ORDER BY {FTS_RANK} '
+                'LIMIT %s OFFSET %s',
+                (query, limit, offset)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class TermIndex:
+    """
+    Обратный индекс в обычной таблице SearchTerm для любой СУБД.
+
+    Префиксы ищутся по диапазону индекса (term, note), ранг — сумма
+    вхождений найденных термов.
+    """
+
+    def add(self, notes):
+        notes = list(notes)
+        self.remove(note.pk for note in notes)
+        SearchTerm.objects.bulk_create(
+            SearchTerm(note_id=note.pk, term=term, count=count)
+            for note in notes
+            for term, count in Counter(
+                get_terms(note.title) * 2 + get_terms(note.text)
+            ).items()
+        )
+
+    def remove(self, note_ids):
+        SearchTerm.objects.filter(note_id__in=list(note_ids)).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def search(self, author_id, terms, limit, offset=0):
+        notes = Note.objects.filter(author_id=author_id)
+        any_term = Q()
+        for term in terms:
+            prefix = Q(term__gte=term, term__lt=term + '{')
+            notes = notes.filter(
+                pk__in=SearchTerm.objects.filter(prefix).values('note_id')
+            )
+            any_term |= prefix
+        rank = SearchTerm.objects.filter(
+            any_term, note=OuterRef('pk')
+        ).values('note').annotate(total=Sum('count')).values('total')
+        return list(notes.annotate(rank=Subquery(rank)).order_by(
+            '-rank', '-pk'
+        ).values_list('pk', flat=True)[offset:offset + limit])
+
+
+@lru_cache(maxsize=None)
+def _has_fts_table(database_name):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_index():
+    """FTS5, если миграция смогла создать таблицу, иначе SearchTerm."""
+    if connection.vendor == 'sqlite' and _has_fts_table(
+        connection.settings_dict['NAME']
+    ):
+        return FTS5Index()
+    return TermIndex()
+
+
+def search_notes(author_id, query, limit, offset=0):
+    """Id заметок автора по запросу, от самых подходящих."""
+    terms = list(dict.fromkeys(get_terms(query)))
+    if not terms:
+        return []
+    return get_index().search(author_id, terms, limit, offset)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Note
+from .search import get_index
+
+
+@receiver(post_save, sender=Note)
+def index_note(instance, **kwargs):
+    get_index().add([instance])
+
+
+@receiver(post_delete, sender=Note)
+def unindex_note(instance, **kwargs):
+    get_index().remove([instance.pk])
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(connection, **kwargs):
+    """
+    PRAGMA из настроек для каждого нового соединения с SQLite.
+
+    В ya_note одновременные записи — это создание заметок: вставка
+    повторяется с новым slug при конфликте, и без busy_timeout из
+    settings_production такой повтор получал бы «database is locked».
+    Под нагрузкой профиль проверяют команды stress_note_create и
+    load_test.
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
@@ -0,0 +1,129 @@
+import random
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.db.models import Q
+from pytils.translit import ALPHABET, slugify
+
+# Сколько символов оставить под суффикс вида «-12345».
+SUFFIX_LENGTH = 10
+# Сколько основ slug проверять одним запросом при массовом подборе.
+QUERY_CHUNK_SIZE = 100
+# Сколько последних заголовков помнить вместе с их slug.
+SLUG_CACHE_SIZE = 4096
+
+ASCII_ALPHABET = frozenset(char for char in ALPHABET if char.isascii())
+AMPERSAND = re.compile(r'&amp;|&')
+SEPARATORS = re.compile(r'[-\s]+')
+WHITESPACE = re.compile(r'\s+')
+NON_WORD = re.compile(r'[^\w\s-]')
+
+
+def ascii_slugify(title):
+    """
+    То же, что pytils.translit.slugify, для заголовка только из ASCII.
+
+    Такому заголовку не нужна транслитерация, на которую у pytils
+    уходит полторы сотни замен подстрок.
+    """
+    title = SEPARATORS.sub('-', AMPERSAND.sub(' and ', title.lower()))
+    title = ''.join(char for char in title if char in ASCII_ALPHABET)
+    return NON_WORD.sub('', title).strip()
+
+
+@lru_cache(maxsize=SLUG_CACHE_SIZE)
+def _make_slug(title):
+    return ascii_slugify(title) if title.isascii() else slugify(title)
+
+
+def make_slug(title):
+    """
+    Slug по заголовку заметки с кэшированием результата.
+
+    Регистр и повторяющиеся пробелы на результат не влияют,
+    поэтому кэш ключуется по нормализованному заголовку.
+    """
+    return _make_slug(WHITESPACE.sub(' ', title.lower()))
+
+
+def _taken_condition(base, max_length):
+    """Условие на base и все base-N по диапазону уникального индекса."""
+    stem = base[:max_length - SUFFIX_LENGTH]
+    return Q(slug=base) | Q(slug__gt=f'{stem}-', slug__lt=f'{stem}.')
+
+
+def _last_suffixes(slugs):
+    """Наибольший числовой суффикс для каждой основы среди slugs."""
+    last = {}
+    for slug in slugs:
+        stem, _, suffix = slug.rpartition('-')
+        if suffix.isdigit():
+            last[stem] = max(last.get(stem, 1), int(suffix))
+    return last
+
+
+def allocate_slug(base, queryset, max_length, spread=1):
+    """
+    Возвращает первый свободный slug: base, base-2, base-3, …
+
+    Занятые варианты выбираются одним запросом по диапазону значений
+    уникального индекса, поэтому он работает и там, где LIKE 'base%'
+    индекс не использует. Свободный на момент запроса slug может занять
+    параллельный запрос — вызывающий код повторяет попытку при
+    IntegrityError.
+
+    При spread > 1 номер выбирается случайно среди spread следующих
+    за последним занятым: так параллельные запросы, проигравшие гонку
+    за один и тот же номер, при повторе реже сталкиваются снова.
+    """
+    base = base[:max_length]
+    taken = set(queryset.filter(
+        _taken_condition(base, max_length)
+    ).values_list('slug', flat=True))
+    if base and base not in taken and spread == 1:
+        return base
+    stem = base[:max_length - SUFFIX_LENGTH]
+    suffix = _last_suffixes(taken).get(stem, 1) + 1 + random.randrange(spread)
+    return f'{stem}-{suffix}'
+
+
+def allocate_slugs(bases, queryset, max_length):
+    """
+    Подбирает свободные slug для пачки заметок.
+
+    Сначала одним запросом на QUERY_CHUNK_SIZE основ проверяется,
+    заняты ли сами основы, и только для занятых и повторяющихся
+    читаются их варианты с суффиксами. Совпадения внутри пачки
+    разрешаются в памяти.
+    """
+    bases = [base[:max_length] for base in bases]
+    distinct = list(dict.fromkeys(bases))
+    taken = set()
+    for chunk in _chunks(distinct):
+        taken.update(
+            queryset.filter(slug__in=chunk).values_list('slug', flat=True)
+        )
+    counts = Counter(bases)
+    suffixed = [base for base in distinct if base in taken or counts[base] > 1]
+    for chunk in _chunks(suffixed):
+        taken.update(queryset.filter(Q(
+            *(_taken_condition(base, max_length) for base in chunk),
+            _connector=Q.OR,
+        )).values_list('slug', flat=True))
+    last = _last_suffixes(taken)
+    slugs = []
+    for base in bases:
+        slug = base
+        stem = base[:max_length - SUFFIX_LENGTH]
+        while not slug or slug in taken:
+            last[stem] = last.get(stem, 1) + 1
+            slug = f'{stem}-{last[stem]}'
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _chunks(items):
+    for start in range(0, len(items), QUERY_CHUNK_SIZE):
+        yield items[start:start + QUERY_CHUNK_SIZE]
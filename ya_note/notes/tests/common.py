@@ -11,6 +11,7 @@ NOTES_HOME_URL = reverse('notes:home')
 NOTES_LIST_URL = reverse('notes:list')
 NOTES_ADD_URL = reverse('notes:add')
 NOTES_SUCCESS_URL = reverse('notes:success')
+NOTES_SEARCH_URL = reverse('notes:search')
 SIGN_UP_URL = reverse('users:signup')
 LOGIN_URL = reverse('users:login')
 LOGOUT_URL = reverse('users:logout')
@@ -1,8 +1,11 @@
+from django.test import override_settings
+
 from .common import (
     TestBaseClass, NOTES_ADD_URL,
-    NOTES_LIST_URL, EDIT_SLUG_URL
+    NOTES_LIST_URL, NOTES_SEARCH_URL, EDIT_SLUG_URL
 )
 from notes.forms import NoteForm
+from notes.models import Note
 
 
 class TestNotesContent(TestBaseClass):
@@ -26,6 +29,56 @@ class TestNotesContent(TestBaseClass):
         response_other = self.auth_other_user.get(NOTES_LIST_URL)
         self.assertNotIn(self.note, response_other.context['object_list'])
 
+    @override_settings(NOTES_PAGE_SIZE=2)
+    def test_notes_list_keyset_pagination(self):
+        """
+        Проверяем, что список выводится страницами по курсору
+        и без текста заметок.
+        """
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {index}', text='Текст',
+                 slug=f'note-{index}', author=self.author)
+            for index in range(4)
+        )
+        shown = []
+        params = {}
+        while True:
+            response = self.auth_author.get(NOTES_LIST_URL, params)
+            page = response.context['object_list']
+            self.assertLessEqual(len(page), 2)
+            self.assertTrue(all(
+                'text' in note.get_deferred_fields() for note in page
+            ))
+            shown.extend(page)
+            if not response.context['next_cursor']:
+                break
+            params = {'cursor': response.context['next_cursor']}
+        self.assertEqual(
+            shown, list(Note.objects.filter(author=self.author).order_by('id'))
+        )
+
+    @override_settings(NOTES_PAGE_SIZE=1)
+    def test_search_results_paginated(self):
+        """
+        Проверяем, что поиск показывает только заметки автора
+        страницами по NOTES_PAGE_SIZE.
+        """
+        second_note = Note.objects.create(
+            title='Другая заметка', text='Текст', author=self.author
+        )
+        Note.objects.create(
+            title='Чужая заметка', text='Текст', author=self.other_user
+        )
+        shown = []
+        params = {'q': 'заметки'}
+        while True:
+            response = self.auth_author.get(NOTES_SEARCH_URL, params)
+            shown.extend(response.context['object_list'])
+            if not response.context['next_page']:
+                break
+            params['page'] = response.context['next_page']
+        self.assertCountEqual(shown, [self.note, second_note])
+
     def test_create_note_page_contains_form(self):
         """
         Проверяем, что на странице
@@ -1,12 +1,42 @@
 from http import HTTPStatus
-
+import json
+import os
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.db import connection
+from django.conf import settings
+from django.template import Context, Template, engines
+from django.test import (
+    Client, LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from pytils.translit import slugify
 
 from notes.models import Note
 from notes.forms import WARNING
+from notes.search import FTS5Index, TermIndex, search_notes
+from notes.slugs import _make_slug, allocate_slug, make_slug
+from yanote.metrics import registry, summarize
+from yanote.querylog import (
+    QueryLogMiddleware, fingerprint, instrument_connections
+)
+from yanote.replicas import (
+    PIN_COOKIE, PrimaryReplicaRouter, ReplicaMiddleware, replica_reads
+)
+from yanote.templating import warm_up
 from .common import (
     TestBaseClass, NOTES_SUCCESS_URL, NOTES_ADD_URL,
-    LOGIN_URL, EDIT_SLUG_URL, DELETE_SLUG_URL
+    LOGIN_URL, EDIT_SLUG_URL, DELETE_SLUG_URL, DETAIL_SLUG_URL, SLUG, User,
+    NOTES_LIST_URL
 )
 
 
@@ -82,6 +112,40 @@ class TestNoteFunctionality(TestBaseClass):
         self.assertIsNotNone(new_note)
         self.assertEqual(new_note.slug, expected_slug)
 
+    def test_fill_slug_adds_suffix(self):
+        """Проверяет, что совпавший slug получает свободный суффикс."""
+        for _ in range(3):
+            self.auth_author.post(
+                NOTES_ADD_URL, data={'title': 'Подробности', 'text': 'Текст'}
+            )
+        self.assertEqual(
+            set(Note.objects.values_list('slug', flat=True)),
+            {SLUG, f'{SLUG}-2', f'{SLUG}-3', f'{SLUG}-4'}
+        )
+        self.assertEqual(
+            len(search_notes(self.author.pk, 'подробности', limit=10)), 4
+        )
+
+    def test_fill_slug_retries_after_race(self):
+        """
+        Проверяет, что slug, занятый между подбором и записью,
+        подбирается заново, а не приводит к ошибке.
+        """
+        calls = []
+
+        def stale_then_fresh(*args, **kwargs):
+            calls.append(args)
+            return SLUG if len(calls) == 1 else allocate_slug(*args, **kwargs)
+
+        with mock.patch('notes.models.allocate_slug', stale_then_fresh):
+            response = self.auth_author.post(
+                NOTES_ADD_URL, data={'title': 'Подробности', 'text': 'Текст'}
+            )
+        self.assertRedirects(response, NOTES_SUCCESS_URL)
+        self.assertEqual(len(calls), 2)
+        new_note = Note.objects.exclude(id=self.note.id).get()
+        self.assertRegex(new_note.slug, rf'^{SLUG}-\d+$')
+
     def test_author_can_edit_note(self):
         """Проверяет, что автор может редактировать свою заметку."""
         notes_count_before = Note.objects.count()
@@ -150,3 +214,430 @@ class TestNoteFunctionality(TestBaseClass):
         self.assertEqual(updated_note.text, self.note.text)
         self.assertEqual(updated_note.slug, self.note.slug)
         self.assertEqual(updated_note.author, self.note.author)
+
+
+class TestQueryPlans(TestCase):
+
+    def test_view_queries_use_indexes(self):
+        """Проверяет, что запросы вьюх не читают таблицы целиком."""
+        call_command('check_query_plans', stdout=StringIO())
+
+
+class TestMakeSlug(SimpleTestCase):
+
+    def test_matches_pytils(self):
+        """Проверяет, что кэшированный slug совпадает с pytils."""
+        titles = (
+            'Form title', 'Tom & Jerry: 2 серии', '  Подробности  дня ',
+            'Ёжик в тумане', '«Кавычки» — и тире', 'C++ / Rust?', '',
+        )
+        for title in titles:
+            with self.subTest(title=title):
+                self.assertEqual(make_slug(title), slugify(title))
+
+    def test_normalized_titles_share_cache_entry(self):
+        """Проверяет, что регистр и пробелы не создают новых записей."""
+        _make_slug.cache_clear()
+        make_slug('Список покупок')
+        make_slug('СПИСОК   покупок')
+        self.assertEqual(_make_slug.cache_info().hits, 1)
+
+
+class TestNotesTransfer(TestBaseClass):
+
+    def test_export_import_round_trip(self):
+        """
+        Проверяет, что выгруженные заметки загружаются обратно,
+        а занятые slug получают суффиксы.
+        """
+        for file_name in ('notes.jsonl', 'notes.csv'):
+            with self.subTest(file_name=file_name):
+                with TemporaryDirectory() as directory:
+                    path = Path(directory) / file_name
+                    call_command('export_notes', path, stdout=StringIO())
+                    call_command('import_notes', path, stdout=StringIO())
+                imported = Note.objects.get(slug=f'{SLUG}-2')
+                self.assertEqual(imported.title, self.note.title)
+                self.assertEqual(imported.text, self.note.text)
+                self.assertEqual(imported.author, self.author)
+                imported.delete()
+
+    def test_import_deduplicates_slugs_in_batch(self):
+        """Проверяет подбор slug для одинаковых заголовков в одной пачке."""
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'notes.jsonl'
+            path.write_text(''.join(
+                json.dumps({
+                    'title': 'Подробности', 'text': 'Текст',
+                    'author': self.author.username,
+                }) + '\n'
+                for _ in range(3)
+            ), encoding='utf-8')
+            call_command('import_notes', path, stdout=StringIO())
+        self.assertEqual(
+            set(Note.objects.values_list('slug', flat=True)),
+            {SLUG, f'{SLUG}-2', f'{SLUG}-3', f'{SLUG}-4'}
+        )
+        self.assertEqual(
+            len(search_notes(self.author.pk, 'подробности', limit=10)), 4
+        )
+
+    def test_import_rejects_invalid_rows(self):
+        """
+        Строки с недопустимым slug или длинным заголовком не попадают
+        в базу и перечисляются в stderr, остальные импортируются.
+        """
+        rows = (
+            {'title': 'Годная', 'slug': 'good-slug'},
+            {'title': 'Кривой адрес', 'slug': 'a b/c'},
+            {'title': 'Д' * 101},
+            {'title': 'Тоже годная'},
+        )
+        errors = StringIO()
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'notes.jsonl'
+            path.write_text(''.join(
+                json.dumps({
+                    **row, 'text': 'Текст', 'author': self.author.username
+                }) + '\n'
+                for row in rows
+            ), encoding='utf-8')
+            with mock.patch(
+                'notes.management.commands.import_notes.LOOKUP_CHUNK_SIZE', 1
+            ):
+                call_command(
+                    'import_notes', path, stdout=StringIO(), stderr=errors
+                )
+        self.assertEqual(
+            set(Note.objects.values_list('title', flat=True)),
+            {self.note.title, 'Годная', 'Тоже годная'}
+        )
+        self.assertEqual(
+            [line.split(':')[0] for line in errors.getvalue().splitlines()],
+            ['Запись 2 пропущена', 'Запись 3 пропущена']
+        )
+        self.assertEqual(
+            len(search_notes(self.author.pk, 'годная', limit=10)), 2
+        )
+        response = self.auth_author.get(NOTES_LIST_URL)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_import_skips_malformed_records(self):
+        """
+        Битый JSON, запись не-объект и поля не строкового типа
+        пропускаются с номером записи, остальные строки импортируются.
+        """
+        good = {'title': 'Годная', 'text': 'Текст'}
+        lines = (
+            json.dumps(good),
+            '{"title": "Обрыв',
+            '[1, 2]',
+            json.dumps({**good, 'title': 5}),
+            json.dumps({**good, 'author': ['список']}),
+            '',
+            json.dumps({**good, 'title': 'Тоже годная'}),
+        )
+        errors, out = StringIO(), StringIO()
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'notes.jsonl'
+            path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+            call_command(
+                'import_notes', path, author=self.author.username,
+                stdout=out, stderr=errors
+            )
+        self.assertEqual(
+            set(Note.objects.values_list('title', flat=True)),
+            {self.note.title, 'Годная', 'Тоже годная'}
+        )
+        self.assertEqual(
+            [line.split(':')[0] for line in errors.getvalue().splitlines()],
+            [f'Запись {number} пропущена' for number in (2, 3, 4, 5)]
+        )
+        self.assertIn('Пропущено строк с ошибками: 4', out.getvalue())
+
+
+class TestNoteSearch(TestBaseClass):
+    INDEXES = (FTS5Index(), TermIndex())
+
+    def search(self, index, query, author=None):
+        """Ищет по заданному индексу, перестроив его целиком."""
+        index.clear()
+        index.add(Note.objects.all())
+        with mock.patch('notes.search.get_index', return_value=index):
+            return search_notes((author or self.author).pk, query, limit=10)
+
+    def test_word_forms_and_transliteration(self):
+        """Проверяет поиск по формам слова, префиксу и транслиту."""
+        queries = (
+            ('заметок', [self.note.pk]),
+            ('ZAMETKI', [self.note.pk]),
+            ('Название подробн', [self.note.pk]),
+            ('название отпуск', []),
+            ('', []),
+        )
+        for index in self.INDEXES:
+            for query, expected in queries:
+                with self.subTest(index=index, query=query):
+                    self.assertEqual(self.search(index, query), expected)
+            with self.subTest(index=index, author=self.other_user):
+                self.assertEqual(
+                    self.search(index, 'заметка', self.other_user), []
+                )
+
+    def test_title_matches_ranked_first(self):
+        """Проверяет, что совпадение в заголовке важнее, чем в тексте."""
+        in_text = Note.objects.create(
+            title='Планы', text='Отпуск в горах', author=self.author
+        )
+        in_title = Note.objects.create(
+            title='Отпуск', text='Горы', author=self.author
+        )
+        for index in self.INDEXES:
+            with self.subTest(index=index):
+                self.assertEqual(
+                    self.search(index, 'отпуска'), [in_title.pk, in_text.pk]
+                )
+
+    def test_index_follows_note_changes(self):
+        """Проверяет, что индекс обновляется при сохранении и удалении."""
+        self.note.title = 'Отпуск'
+        self.note.save()
+        self.assertEqual(
+            search_notes(self.author.pk, 'отпуск', limit=10), [self.note.pk]
+        )
+        self.assertEqual(
+            search_notes(self.author.pk, 'название', limit=10), []
+        )
+        self.note.delete()
+        self.assertEqual(search_notes(self.author.pk, 'отпуск', limit=10), [])
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class TestReplicaRouting(SimpleTestCase):
+
+    def test_router_reads_from_replica_only_when_allowed(self):
+        """Чтение с реплики — только в разрешённом запросе и не для auth."""
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Note), 'default')
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Note), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Note), 'default')
+        finally:
+            replica_reads.reset(token)
+
+    def test_replica_pinned_after_post(self):
+        """После POST клиент какое-то время читает из основной базы."""
+        seen = []
+
+        def view(request):
+            seen.append(replica_reads.get())
+            return HttpResponse()
+
+        factory = RequestFactory()
+        middleware = ReplicaMiddleware(view)
+        middleware(factory.get('/'))
+        response = middleware(factory.post('/'))
+        pinned_request = factory.get('/')
+        pinned_request.COOKIES[PIN_COOKIE] = response.cookies[
+            PIN_COOKIE
+        ].value
+        middleware(pinned_request)
+        self.assertEqual(seen, [True, False, False])
+
+
+class TestMetrics(TestBaseClass):
+    METRICS_URL = reverse('metrics')
+
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_metrics_middleware(self):
+        """
+        Замер попадает в Server-Timing и в гистограмму по имени URL,
+        а команда metrics сводит гистограмму в таблицу.
+        """
+        client = Client()
+        client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(DETAIL_SLUG_URL)
+        count = len(queries)
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{count} queries"', timing)
+        self.assertIn(f'desc="{len(response.content)} bytes"', timing)
+        text = client.get(self.METRICS_URL).content.decode()
+        self.assertIn(
+            'django_view_duration_seconds_count{view="notes:detail"} 1', text
+        )
+        self.assertIn(
+            f'django_view_queries_total{{view="notes:detail"}} {count}', text
+        )
+        self.assertEqual(
+            client.get(self.METRICS_URL, REMOTE_ADDR='10.0.0.1').status_code,
+            HTTPStatus.NOT_FOUND
+        )
+        out = StringIO()
+        with mock.patch(
+            'notes.management.commands.metrics.urlopen',
+            return_value=mock.MagicMock(**{
+                '__enter__.return_value.read.return_value': text.encode()
+            })
+        ):
+            call_command('metrics', stdout=out)
+        note, *table = out.getvalue().splitlines()
+        self.assertTrue(note.startswith(f'Процесс {os.getpid()}: '))
+        self.assertEqual(table, summarize(text))
+        self.assertTrue(any(
+            line.startswith('notes:detail ') for line in summarize(text)
+        ))
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_metrics_disabled(self):
+        """Без выборки middleware не подключается и заголовка нет."""
+        response = Client().get(DETAIL_SLUG_URL)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.views, {})
+
+
+class TestQueryLog(TestBaseClass):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'queries.jsonl'
+
+    def read_log(self):
+        return [
+            json.loads(line) for line in self.path.read_text().splitlines()
+        ]
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT 1 FROM "t" WHERE "id" IN (%s, %s) LIMIT 21'),
+            'SELECT ? FROM "t" WHERE "id" IN (...) LIMIT ?'
+        )
+
+    def test_n_plus_one(self):
+        """
+        Автор каждой заметки в цикле шаблона — одна запись журнала
+        со строкой шаблона и местом в коде.
+        """
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {index}', text='Текст', slug=f'n-{index}',
+                 author=self.author)
+            for index in range(5)
+        )
+        template = Template(
+            '{% for note in notes %}\n{{ note.author.username }}{% endfor %}'
+        )
+
+        def view(request):
+            return HttpResponse(template.render(Context({
+                'notes': Note.objects.all()
+            })))
+
+        with self.settings(QUERY_LOG_FILE=self.path, QUERY_LOG_SLOW_MS=1e4):
+            middleware = QueryLogMiddleware(view)
+            # Обработчик Django вызывает это по сигналу request_started.
+            instrument_connections()
+            middleware(RequestFactory().get('/'))
+            out = StringIO()
+            call_command('query_log', stdout=out)
+        entries = self.read_log()
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertEqual(
+            (entry['kind'], entry['count'], entry['template']),
+            ('duplicate', Note.objects.count(), '<unknown source>:2')
+        )
+        self.assertTrue(
+            entry['code'].startswith('notes/tests/test_logic.py:')
+        )
+        self.assertTrue(out.getvalue().startswith(
+            f'duplicate {entry["view"]}: записей 1, запросов {entry["count"]}'
+        ))
+
+    def test_slow_queries(self):
+        """Медленные запросы пишутся с именем URL."""
+        with self.settings(QUERY_LOG_FILE=self.path, QUERY_LOG_SLOW_MS=0):
+            self.auth_author.get(NOTES_LIST_URL)
+        entries = self.read_log()
+        self.assertTrue(entries)
+        self.assertEqual(
+            {(entry['kind'], entry['view']) for entry in entries},
+            {('slow', 'notes:list')}
+        )
+
+
+class TestTemplateWarmUp(SimpleTestCase):
+
+    def test_warm_up_fills_cached_loader(self):
+        """Прогрев кладёт в кэш загрузчика все шаблоны проекта."""
+        engine, = settings.TEMPLATES
+        cached = {
+            **engine, 'APP_DIRS': False,
+            'OPTIONS': {**engine['OPTIONS'], 'loaders': [(
+                'django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ],
+            )]},
+        }
+        directory = settings.BASE_DIR / 'templates'
+        templates = {
+            path.relative_to(directory).as_posix()
+            for path in directory.rglob('*.html')
+        }
+        with self.settings(TEMPLATES=[cached]):
+            self.assertEqual(warm_up(), len(templates))
+            loader, = engines['django'].engine.template_loaders
+            self.assertLessEqual(templates, set(loader.get_template_cache))
+
+
+class TestSeedAndLoad(LiveServerTestCase):
+    """Наполнение базы и нагрузочный прогон против живого сервера."""
+
+    def test_seed_is_skewed_and_deterministic(self):
+        call_command(
+            'seed', users=20, notes=500, batch_size=100, seed=1,
+            stdout=StringIO()
+        )
+        counts = sorted(User.objects.annotate(
+            notes=Count('note')
+        ).values_list('notes', flat=True), reverse=True)
+        self.assertEqual(sum(counts), 500)
+        # У самого активного автора во много раз больше заметок,
+        # чем в среднем.
+        self.assertGreater(counts[0], 500 / 20 * 3)
+        note = Note.objects.first()
+        self.assertIn(note.pk, search_notes(
+            note.author_id, note.title.split()[0], limit=500
+        ))
+        call_command(
+            'seed', users=20, notes=500, batch_size=100, seed=1,
+            prefix='again', stdout=StringIO()
+        )
+        self.assertEqual(
+            list(Note.objects.filter(slug__startswith='seed-').order_by(
+                'id'
+            ).values_list('title', flat=True)),
+            list(Note.objects.filter(slug__startswith='again-').order_by(
+                'id'
+            ).values_list('title', flat=True)),
+        )
+        with self.assertRaises(CommandError):
+            call_command('seed', users=1, notes=1, stdout=StringIO())
+
+    def test_load_test_against_live_server(self):
+        call_command(
+            'seed', users=5, notes=50, batch_size=20, stdout=StringIO()
+        )
+        out = StringIO()
+        call_command(
+            'load_test', url=self.live_server_url, clients=1, duration=1,
+            stdout=out
+        )
+        self.assertRegex(out.getvalue(), r'всего .*ошибок\s+0, .*p99')
@@ -0,0 +1,158 @@
+"""
+Бюджеты SQL-запросов и времени ответа для всех именованных URL.
+
+Страницы открываются от имени автора тысячи заметок среди ста тысяч
+заметок всех пользователей, поэтому N+1 или потерянный индекс заметны
+и по числу запросов, и по времени. С pytest-xdist этот модуль
+запускают отдельно и в одном процессе (как в run_tests.sh): каждый
+процесс держал бы в памяти свою копию снимка данных.
+"""
+import os
+import random
+import time
+from http import HTTPStatus
+from statistics import median
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from notes.models import Note
+from notes.search import get_index
+from yanote.snapshots import DatabaseSnapshot
+
+User = get_user_model()
+NOTES_COUNT = 100_000
+AUTHORS_COUNT = 100
+VOCABULARY_SIZE = 5000
+SYLLABLES = (
+    'ба', 'ве', 'го', 'ду', 'же', 'за', 'ки', 'ло', 'ма', 'ны',
+    'по', 'ре', 'са', 'ту', 'фе', 'хо', 'цу', 'че', 'ша', 'эр',
+)
+REPEATS = 3
+SLUG_URLS = ('notes:edit', 'notes:detail', 'notes:delete')
+
+# Имя URL: (SQL-запросов не больше, миллисекунд не больше). Сессия
+# и пользователь в число запросов не входят. Время — с запасом
+# в несколько раз к замерам на машине разработчика; оно зависит
+# от загрузки машины, поэтому проверяется только при
+# PERF_CHECK_LATENCY=1, а число запросов — всегда.
+CHECK_LATENCY = os.environ.get('PERF_CHECK_LATENCY') == '1'
+BUDGETS = {
+    'notes:home': (0, 30),
+    'notes:add': (0, 30),
+    'notes:edit': (1, 50),
+    'notes:detail': (1, 30),
+    'notes:delete': (1, 30),
+    'notes:list': (1, 50),
+    'notes:search': (2, 60),
+    'notes:success': (0, 30),
+    'users:login': (0, 30),
+    'users:logout': (0, 30),
+    'users:signup': (0, 30),
+}
+
+
+def build_volume():
+    """Сто тысяч заметок ста авторов и их поисковый индекс."""
+    rng = random.Random(100)
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    words = sorted(words)
+    User.objects.bulk_create(
+        User(username=f'perf{index}') for index in range(AUTHORS_COUNT)
+    )
+    authors = list(User.objects.filter(
+        username__startswith='perf'
+    ).order_by('pk').values_list('pk', flat=True))
+    Note.objects.bulk_create(
+        Note(
+            title=' '.join(rng.choices(words, k=3)),
+            text=' '.join(rng.choices(words, k=30)),
+            slug=f'perf-{index}',
+            author_id=authors[index % AUTHORS_COUNT],
+        )
+        for index in range(NOTES_COUNT)
+    )
+    get_index().add(Note.objects.all())
+
+
+class TestPerformance(TestCase):
+    """Бюджеты страниц на большом объёме данных."""
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Данные берутся из снимка (см. yanote.snapshots) и строятся
+        с нуля, только если его ещё нет.
+        """
+        cls.volume = DatabaseSnapshot(
+            'notes-volume', (NOTES_COUNT, AUTHORS_COUNT), build_volume
+        )
+        cls.volume.load()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.volume.release()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.volume.release()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.get(username='perf0')
+        cls.note = Note.objects.filter(author=cls.author).last()
+        cls.query = cls.note.title.split()[0]
+
+    def get_url(self, name):
+        if name in SLUG_URLS:
+            return reverse(name, args=(self.note.slug,))
+        url = reverse(name)
+        if name == 'notes:search':
+            url += f'?q={self.query}'
+        return url
+
+    def test_every_url_has_budget(self):
+        """Новый URL без бюджета не должен проходить незамеченным."""
+        resolver = get_resolver()
+        names = {
+            f'{namespace}:{name}'
+            for namespace in ('notes', 'users')
+            for name in resolver.namespace_dict[namespace][1].reverse_dict
+            if isinstance(name, str)
+        }
+        self.assertEqual(names, set(BUDGETS))
+
+    def test_url_budgets(self):
+        """
+        Число запросов и, при PERF_CHECK_LATENCY=1, медиана времени
+        ответа в пределах бюджета.
+        """
+        for name, (max_queries, max_ms) in BUDGETS.items():
+            with self.subTest(name=name):
+                client = Client()
+                client.force_login(self.author)
+                url = self.get_url(name)
+                timings = []
+                for _ in range(REPEATS):
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = client.get(url)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                queries = [
+                    query['sql'] for query in queries.captured_queries
+                    if 'django_session' not in query['sql']
+                    and 'FROM "auth_user"' not in query['sql']
+                ]
+                self.assertLessEqual(
+                    len(queries), max_queries, '\n'.join(queries)
+                )
+                if CHECK_LATENCY:
+                    self.assertLessEqual(median(timings), max_ms)
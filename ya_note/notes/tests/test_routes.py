@@ -1,8 +1,10 @@
 from http import HTTPStatus
 
+from django.conf import settings
+
 from .common import (
     NOTES_HOME_URL, NOTES_LIST_URL,
-    NOTES_ADD_URL,
+    NOTES_ADD_URL, NOTES_SEARCH_URL,
     NOTES_SUCCESS_URL, DETAIL_SLUG_URL,
     EDIT_SLUG_URL, DELETE_SLUG_URL,
     TestBaseClass, REDIRECT_URL
@@ -21,6 +23,7 @@ class NoteAccessTest(TestBaseClass):
             (NOTES_LIST_URL, self.auth_author, HTTPStatus.OK),
             (NOTES_ADD_URL, self.auth_author, HTTPStatus.OK),
             (NOTES_SUCCESS_URL, self.auth_author, HTTPStatus.OK),
+            (NOTES_SEARCH_URL, self.auth_author, HTTPStatus.OK),
             (DETAIL_SLUG_URL, self.auth_author, HTTPStatus.OK),
             (EDIT_SLUG_URL, self.auth_author, HTTPStatus.OK),
             (DELETE_SLUG_URL, self.auth_author, HTTPStatus.OK),
@@ -30,6 +33,7 @@ class NoteAccessTest(TestBaseClass):
             (NOTES_LIST_URL, self.client, HTTPStatus.FOUND),
             (NOTES_ADD_URL, self.client, HTTPStatus.FOUND),
             (NOTES_SUCCESS_URL, self.client, HTTPStatus.FOUND),
+            (NOTES_SEARCH_URL, self.client, HTTPStatus.FOUND),
             (DETAIL_SLUG_URL, self.client, HTTPStatus.FOUND),
             (EDIT_SLUG_URL, self.client, HTTPStatus.FOUND),
             (DELETE_SLUG_URL, self.client, HTTPStatus.FOUND),
@@ -47,8 +51,30 @@ class NoteAccessTest(TestBaseClass):
             (DETAIL_SLUG_URL, self.client),
             (NOTES_LIST_URL, self.client),
             (NOTES_ADD_URL, self.client),
-            (NOTES_SUCCESS_URL, self.client)
+            (NOTES_SUCCESS_URL, self.client),
+            (NOTES_SEARCH_URL, self.client),
         )
         for url, user in parametrized_options:
             with self.subTest(url=url, user=user):
                 self.assertRedirects(user.get(url), REDIRECT_URL + url)
+
+    def test_malformed_cursor(self):
+        """Проверяет ответ 404 на некорректный курсор списка заметок."""
+        for cursor in ('abc', '-1', '²', '9' * 30):
+            with self.subTest(cursor=cursor):
+                response = self.auth_author.get(
+                    NOTES_LIST_URL, {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_malformed_search_page(self):
+        """Проверяет ответ 404 на некорректный номер страницы поиска."""
+        for page in (
+            '0', '-1', 'abc', '²', '9' * 19,
+            str(settings.SEARCH_MAX_PAGES + 1),
+        ):
+            with self.subTest(page=page):
+                response = self.auth_author.get(
+                    NOTES_SEARCH_URL, {'q': 'заметка', 'page': page}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
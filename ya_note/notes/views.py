@@ -1,9 +1,16 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import IntegrityError
+from django.http import Http404
 from django.urls import reverse_lazy
 from django.views import generic
 
-from .forms import NoteForm
+from .forms import WARNING, NoteForm
 from .models import Note
+from .search import search_notes
+
+# Наибольшее целое в SQLite; больших первичных ключей не бывает.
+MAX_PK = 2 ** 63 - 1
 
 
 class Home(generic.TemplateView):
@@ -26,22 +33,30 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class NoteFormBase(NoteBase):
+    """Базовый класс для создания и редактирования заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        """Занятый slug обнаруживается по нарушению уникальности в БД."""
+        try:
+            return super().form_valid(form)
+        except IntegrityError:
+            form.add_error('slug', form.instance.slug + WARNING)
+            return self.form_invalid(form)
+
+
+class NoteCreate(NoteFormBase, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteFormBase, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
@@ -50,9 +65,74 @@ class NoteDelete(NoteBase, generic.DeleteView):
 
 
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """
+    Список заметок пользователя.
+
+    Заметки выводятся страницами по NOTES_PAGE_SIZE с keyset-пагинацией
+    по (author, id): курсор — id последней показанной заметки.
+    """
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        queryset = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                cursor = int(cursor)
+            except ValueError:
+                raise Http404('Некорректный курсор.')
+            if not 0 <= cursor <= MAX_PK:
+                raise Http404('Некорректный курсор.')
+            queryset = queryset.filter(id__gt=cursor)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        page_size = settings.NOTES_PAGE_SIZE
+        page = list(self.object_list[:page_size + 1])
+        next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_cursor = page[-1].id
+        return super().get_context_data(
+            object_list=page, next_cursor=next_cursor, **kwargs
+        )
+
+
+class NoteSearch(NoteBase, generic.TemplateView):
+    """
+    Поиск по заметкам пользователя.
+
+    Порядок результатов задаёт поисковый индекс, сами заметки читаются
+    одним запросом по найденным id.
+    """
+    template_name = 'notes/search.html'
+
+    def get_context_data(self, **kwargs):
+        query = self.request.GET.get('q', '').strip()
+        try:
+            page = int(self.request.GET.get('page', '1'))
+        except ValueError:
+            raise Http404('Некорректный номер страницы.')
+        if not 1 <= page <= settings.SEARCH_MAX_PAGES:
+            raise Http404('Некорректный номер страницы.')
+        page_size = settings.NOTES_PAGE_SIZE
+        ids = search_notes(
+            self.request.user.pk, query, page_size + 1,
+            (page - 1) * page_size
+        )
+        notes = self.get_queryset().only('id', 'slug', 'title').in_bulk(
+            ids[:page_size]
+        )
+        return super().get_context_data(
+            query=query,
+            page=page,
+            object_list=[notes[pk] for pk in ids[:page_size] if pk in notes],
+            next_page=page + 1 if len(ids) > page_size else None,
+            **kwargs
+        )
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
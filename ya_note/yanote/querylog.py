@@ -0,0 +1,217 @@
+"""
+Журнал медленных и повторяющихся SQL-запросов.
+
+QueryLogMiddleware включается настройкой QUERY_LOG_FILE. В файл
+в формате JSON Lines пишутся запросы дольше QUERY_LOG_SLOW_MS и
+запросы, которые за один HTTP-запрос повторились QUERY_LOG_DUPLICATES
+раз с точностью до значений, — вероятные N+1. У каждой записи есть имя
+URL, место в коде проекта и строка шаблона, откуда пришёл запрос.
+Параметры запросов не пишутся: в них бывают личные данные. Сводку
+по журналу печатает manage.py query_log.
+
+Модуль одинаков в ya_news и ya_note: общего пакета у проектов нет,
+совпадение копий проверяет test_shared_modules_match в ya_news.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.template.base import Node
+from django.utils import timezone
+
+UNRESOLVED = 'unresolved'
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+PACKAGE_DIR = os.path.dirname(__file__) + os.sep
+# По этому коду в стеке опознаётся отрисовка узла шаблона.
+RENDER_CODE = Node.render_annotated.__code__
+
+current_log = ContextVar('query_log', default=None)
+write_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    """Запрос без значений: IN-списки любой длины и литералы совпадают."""
+    return LITERAL.sub('?', IN_LIST.sub('IN (...)', sql))
+
+
+def find_source():
+    """
+    Ближайшие к запросу строка шаблона и строка кода проекта; middleware
+    из этого пакета и сторонние библиотеки пропускаются.
+    """
+    template = code = None
+    base_dir = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None and (template is None or code is None):
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code is RENDER_CODE:
+            node = frame.f_locals['self']
+            origin = node.origin
+            template = (
+                f'{origin.template_name or origin.name}:{node.token.lineno}'
+            )
+        elif (
+            code is None and filename.startswith(base_dir)
+            and not filename.startswith(PACKAGE_DIR)
+            and 'site-packages' not in filename
+        ):
+            code = f'{filename[len(base_dir):]}:{frame.f_lineno}'
+        frame = frame.f_back
+    return template, code
+
+
+class RequestLog:
+    """Запросы одного HTTP-запроса."""
+
+    def __init__(self):
+        self.entries = []
+        self.counts = Counter()
+        self.duration = Counter()
+        self.sources = {}
+
+    def add(self, sql, duration):
+        key = fingerprint(sql)
+        self.counts[key] += 1
+        self.duration[key] += duration
+        if duration * 1000 >= settings.QUERY_LOG_SLOW_MS:
+            template, code = find_source()
+            self.entries.append({
+                'kind': 'slow', 'sql': key, 'ms': round(duration * 1000, 1),
+                'template': template, 'code': code,
+            })
+        # Место второго повтора — то же, что у всех следующих в цикле.
+        if self.counts[key] == 2:
+            self.sources[key] = find_source()
+
+    def duplicates(self):
+        for key, count in self.counts.items():
+            if count >= settings.QUERY_LOG_DUPLICATES:
+                template, code = self.sources.get(key, (None, None))
+                yield {
+                    'kind': 'duplicate', 'sql': key, 'count': count,
+                    'ms': round(self.duration[key] * 1000, 1),
+                    'template': template, 'code': code,
+                }
+
+    def findings(self):
+        """Записи для журнала: медленные запросы и повторы."""
+        return self.entries + list(self.duplicates())
+
+
+def log_query(execute, sql, params, many, context):
+    log = current_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.add(sql, time.perf_counter() - start)
+
+
+def instrument_connections(**kwargs):
+    """Как в metrics: обёртка остаётся на соединениях потока."""
+    for connection in connections.all():
+        if log_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(log_query)
+
+
+class QueryLogMiddleware:
+    """Собирает запросы к базе и дописывает находки в журнал разом."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_LOG_FILE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        request_started.connect(instrument_connections)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        log = RequestLog()
+        token = current_log.set(log)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_log.reset(token)
+        self.write(request, log.findings())
+        return response
+
+    async def __acall__(self, request):
+        log = RequestLog()
+        token = current_log.set(log)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_log.reset(token)
+        entries = log.findings()
+        if entries:
+            # Запись в файл блокирует, поэтому идёт в потоке, а не в
+            # цикле событий; без находок поток не нужен.
+            await sync_to_async(self.write)(request, entries)
+        return response
+
+    @staticmethod
+    def write(request, entries):
+        if not entries:
+            return
+        match = getattr(request, 'resolver_match', None)
+        common = {
+            'time': timezone.now().isoformat(timespec='seconds'),
+            'view': match.view_name if match else UNRESOLVED,
+            'method': request.method,
+            'path': request.path,
+        }
+        lines = ''.join(
+            json.dumps({**common, **entry}, ensure_ascii=False) + '\n'
+            for entry in entries
+        )
+        with write_lock, open(
+            settings.QUERY_LOG_FILE, 'a', encoding='utf-8'
+        ) as file:
+            file.write(lines)
+
+
+def summarize(entries, top):
+    """
+    Строки сводки по записям журнала: находки одного вида с одним
+    запросом на одном URL сгруппированы, первыми — самые затратные.
+    """
+    groups = defaultdict(lambda: {
+        'hits': 0, 'queries': 0, 'ms': 0.0, 'sources': Counter()
+    })
+    for entry in entries:
+        group = groups[entry['kind'], entry['view'], entry['sql']]
+        group['hits'] += 1
+        group['queries'] += entry.get('count', 1)
+        group['ms'] += entry['ms']
+        group['sources'][entry['template'], entry['code']] += 1
+    lines = []
+    for (kind, view, sql), group in sorted(
+        groups.items(), key=lambda item: -item[1]['ms']
+    )[:top]:
+        (template, code), _ = group['sources'].most_common(1)[0]
+        lines += [
+            f'{kind} {view}: записей {group["hits"]}, запросов '
+            f'{group["queries"]}, {group["ms"]:.0f} мс',
+            f'    {sql}',
+            f'    шаблон: {template or "—"}, код: {code or "—"}',
+        ]
+    return lines
@@ -0,0 +1,112 @@
+"""
+Чтение с реплики SQLite в безопасных запросах.
+
+PrimaryReplicaRouter отправляет запись в основную базу, а чтение в
+запросах, которые пропустил ReplicaMiddleware, — в REPLICA_DATABASE.
+После записи middleware ставит cookie PIN_COOKIE, и ещё
+REPLICA_PIN_SECONDS пользователь читает из основной базы.
+
+Модуль одинаков в ya_news и ya_note: общего пакета у проектов нет,
+совпадение копий проверяет test_shared_modules_match в ya_news.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'replica_pin'
+# Пользователи и сессии всегда читаются из основной базы: иначе сразу
+# после входа реплика может ещё не знать о новой сессии.
+PRIMARY_ONLY_APPS = ('auth', 'sessions')
+
+# Чтение с реплики разрешается только внутри запроса, который пропустил
+# ReplicaMiddleware. Команды manage.py и всё остальное читают из основной
+# базы.
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+class PrimaryReplicaRouter:
+    """Запись — в основную базу, чтение в безопасных запросах — с реплики."""
+
+    def db_for_read(self, model, **hints):
+        replica = settings.REPLICA_DATABASE
+        if (
+            replica and replica_reads.get()
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+        ):
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        """Схема попадает на реплику вместе с данными."""
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Решает, можно ли запросу читать с реплики.
+
+    Изменяющие запросы целиком работают с основной базой, включая
+    чтения в form_valid. После них клиент получает cookie, и ещё
+    REPLICA_PIN_SECONDS его чтения тоже идут в основную базу — так
+    пользователь видит свои изменения, даже если реплика отстаёт.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так же Django помечает MiddlewareMixin: под ASGI цепочка
+            # остаётся асинхронной и не переходит в поток ради middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = self.allow_replica(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = self.allow_replica(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin(request, response)
+
+    def allow_replica(self, request):
+        return replica_reads.set(
+            request.method in SAFE_METHODS and not self.is_pinned(request)
+        )
+
+    @staticmethod
+    def pin(request, response):
+        if request.method not in SAFE_METHODS and settings.REPLICA_DATABASE:
+            pin_seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time()) + pin_seconds),
+                max_age=pin_seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+    @staticmethod
+    def is_pinned(request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -10,6 +11,9 @@ DEBUG = False
 
 ALLOWED_HOSTS = ['*']
 
+# С этих адресов открывается /metrics/.
+INTERNAL_IPS = ['127.0.0.1']
+
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -22,7 +26,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanote.metrics.MetricsMiddleware',
+    'yanote.querylog.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yanote.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,6 +66,37 @@ DATABASES = {
     }
 }
 
+# Реплика только для чтения включается переменной окружения с путём
+# к копии базы; локально копию обновляет manage.py sync_replica.
+REPLICA_DATABASE = None
+if os.environ.get('REPLICA_DB_NAME'):
+    REPLICA_DATABASE = 'replica'
+    DATABASES[REPLICA_DATABASE] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['REPLICA_DB_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['yanote.replicas.PrimaryReplicaRouter']
+# Сколько секунд после изменяющего запроса клиент читает из основной базы.
+REPLICA_PIN_SECONDS = 5
+# PRAGMA для каждого нового соединения с SQLite (см. settings_production).
+SQLITE_PRAGMAS = {}
+# Доля запросов, которые замеряет yanote.metrics.MetricsMiddleware;
+# 0 — middleware отключена.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0))
+# Журнал медленных и повторяющихся SQL-запросов (см. yanote.querylog);
+# None — журнал выключен.
+QUERY_LOG_FILE = os.environ.get('QUERY_LOG_FILE')
+QUERY_LOG_SLOW_MS = 100
+# Столько одинаковых по структуре запросов за HTTP-запрос — вероятный N+1.
+QUERY_LOG_DUPLICATES = 3
+# Снимки тяжёлых тестовых данных (см. yanote.snapshots).
+TEST_SNAPSHOTS_DIR = Path(os.environ.get(
+    'TEST_SNAPSHOTS_DIR', BASE_DIR / '.test_snapshots'
+))
+# Компилировать шаблоны при старте (см. yanote.templating).
+TEMPLATES_WARM_UP = False
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +125,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_PAGE_SIZE = 50
+# Глубже поиск по заметкам не листается: каждая страница заново
+# ранжирует все совпадения, и огромный номер дал бы смещение, которое
+# SQLite не принимает.
+SEARCH_MAX_PAGES = 100
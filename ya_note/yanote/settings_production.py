@@ -0,0 +1,46 @@
+"""
+Профиль для работы под нагрузкой на SQLite.
+
+Рассчитан на заметки: каждый пользователь читает свои списки, а
+записи — это создание и правка заметок с подбором уникального slug.
+Включается через DJANGO_SETTINGS_MODULE=yanote.settings_production;
+под нагрузкой его проверяют команды stress_note_create и load_test.
+"""
+from .settings import *  # noqa: F401, F403
+from .settings import DATABASES, TEMPLATES
+
+DEBUG = False
+
+for database in DATABASES.values():
+    # Соединение живёт между запросами, PRAGMA не выполняются заново.
+    database['CONN_MAX_AGE'] = 60
+
+SQLITE_PRAGMAS = {
+    # Читатели не блокируют писателя и друг друга.
+    'journal_mode': 'WAL',
+    # В режиме WAL база остаётся целой и без fsync на каждую транзакцию.
+    'synchronous': 'NORMAL',
+    # Отрицательное значение — размер в КиБ: 64 МиБ страничного кэша.
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    # Писатель ждёт освобождения блокировки, а не получает ошибку.
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# Шаблоны Django читаются и разбираются один раз на процесс, независимо
+# от DEBUG; при старте они сразу компилируются все.
+TEMPLATES = [
+    {
+        **engine,
+        'APP_DIRS': False,
+        'OPTIONS': {**engine['OPTIONS'], 'loaders': [(
+            'django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        )]},
+    } if engine['BACKEND'].endswith('DjangoTemplates') else engine
+    for engine in TEMPLATES
+]
+TEMPLATES_WARM_UP = True
@@ -0,0 +1,91 @@
+"""
+Снимки тестовой базы SQLite для тяжёлых наборов данных.
+
+Наполнить базу миллионом строк — десятки секунд, а скопировать готовый
+файл в базу встроенным в SQLite backup — секунда-другая. Снимок
+строится при первом прогоне и кладётся в TEST_SNAPSHOTS_DIR; имя файла
+зависит от ключа данных и схемы базы, поэтому новая миграция или другие
+параметры данных сами приводят к пересборке.
+
+Модуль одинаков в ya_news и ya_note: общего пакета у проектов нет,
+совпадение копий проверяет test_shared_modules_match в ya_news.
+"""
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+class DatabaseSnapshot:
+    """
+    Подменяет содержимое базы снимком, а после release возвращает
+    прежнее. Снимок заменяет базу целиком, поэтому данные, созданные
+    до load, на время работы со снимком не видны.
+    """
+
+    def __init__(self, name, key, build, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.key = key
+        self.build = build
+        self.connection = connections[using]
+        self.saved = None
+
+    def __enter__(self):
+        self.load()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @property
+    def raw(self):
+        self.connection.ensure_connection()
+        return self.connection.connection
+
+    def path(self):
+        schema = self.raw.execute(
+            'SELECT sql FROM sqlite_master WHERE sql IS NOT NULL '
+            'ORDER BY name'
+        ).fetchall()
+        digest = hashlib.sha1(
+            repr((self.key, schema)).encode()
+        ).hexdigest()[:12]
+        return settings.TEST_SNAPSHOTS_DIR / f'{self.name}-{digest}.sqlite3'
+
+    def load(self):
+        """Копирует снимок в базу, при необходимости сначала строит его."""
+        self.saved = sqlite3.connect(':memory:')
+        self.raw.backup(self.saved)
+        path = self.path()
+        if path.exists():
+            with closing(sqlite3.connect(path)) as snapshot:
+                snapshot.backup(self.raw)
+            return
+        # Одна транзакция: иначе каждая пачка вставки — отдельный коммит.
+        with transaction.atomic(using=self.connection.alias):
+            self.build()
+        self.save(path)
+
+    def save(self, path):
+        """
+        Файл пишется под временным именем и переименовывается: так
+        параллельные процессы pytest-xdist не прочтут его недописанным.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in path.parent.glob(f'{self.name}-*.sqlite3'):
+            stale.unlink(missing_ok=True)
+        temporary = path.with_suffix(f'.{os.getpid()}.tmp')
+        with closing(sqlite3.connect(temporary)) as snapshot:
+            self.raw.backup(snapshot)
+        os.replace(temporary, path)
+
+    def release(self):
+        """Возвращает базе состояние, которое было до load."""
+        if self.saved is None:
+            return
+        self.saved.backup(self.raw)
+        self.saved.close()
+        self.saved = None
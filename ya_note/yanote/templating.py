@@ -0,0 +1,21 @@
+"""
+Прогрев кэша шаблонов.
+
+В settings_production шаблоны Django загружаются через кэширующий
+загрузчик, и warm_up при старте сервера компилирует всё из каталогов
+DIRS, чтобы первый запрос к странице не платил за чтение и разбор.
+"""
+from pathlib import Path
+
+from django.template import engines
+
+
+def warm_up():
+    """Компилирует шаблоны из DIRS всех движков; возвращает их число."""
+    count = 0
+    for engine in engines.all():
+        for directory in map(Path, engine.dirs):
+            for path in sorted(directory.rglob('*.html')):
+                engine.get_template(path.relative_to(directory).as_posix())
+                count += 1
+    return count